@@ -10,14 +10,25 @@
 #                                                                                                 #
 ###################################################################################################
 
-import json
+import hmac
 import os
 import pathlib
-
-import pandas as pd
-import plotly.express as px
-from dash import Dash, dcc, html, Input, Output
-from pycountry_convert import country_name_to_country_alpha3
+import threading
+import time
+import urllib.parse
+
+import flask
+from dash import ClientsideFunction, Dash, dcc, html, Input, Output, State
+from dash.exceptions import PreventUpdate
+
+from compression import DEFAULT_CACHE_MAX_BYTES, DEFAULT_CACHE_MAX_ENTRIES, BodyCache, enable_compression
+from figcache import DEFAULT_MAX_BYTES, DEFAULT_MAX_ENTRIES, FigureCache, canonical_key
+from figures import EMPTY_SELECTION, LARGE_SELECTION, MAX_POINTS, TOP_COUNTRIES, client_store, render_map, render_selected_data
+from geo import load_geojson
+from metrics import METRICS, PROFILER, instrument
+from refresh import DEFAULT_REFRESH_INTERVAL
+from registry import DEFAULT_MAX_BYTES as DEFAULT_DATASETS_MAX_BYTES, DatasetRegistry, parse_sources
+from renderpool import DEFAULT_REQUEST_THREADS, DEFAULT_THREADS, DEFAULT_TIMEOUT, OverloadedError, RenderPool, default_queue
 
 ###################################################################################################
 #                                                                                                 #
@@ -30,169 +41,62 @@ app = Dash(
     meta_tags=[
         {"name": "viewport", "content": "width=device-width, initial-scale=1.0"}
     ],
+    compress=False,
 )
 app.title = "Fit or Fat? (Europe's Edition)"
 
 server = app.server
 
-# Dictionary to parse countries
-COUNTRY_TRANSLATION = {
-    'BE': 'Belgium',
-    'BG': 'Bulgaria',
-    'CZ': 'Czechia',
-    'DK': 'Denmark',
-    'DE': 'Germany',
-    'EE': 'Estonia',
-    'IE': 'Ireland',
-    'EL': 'Greece',
-    'ES': 'Spain',
-    'FR': 'France',
-    'HR': 'Croatia',
-    'IT': 'Italy',
-    'CY': 'Cyprus',
-    'LV': 'Latvia',
-    'LT': 'Lithuania',
-    'LU': 'Luxembourg',
-    'HU': 'Hungary',
-    'MT': 'Malta',
-    'NL': 'Netherlands',
-    'AT': 'Austria',
-    'PL': 'Poland',
-    'PT': 'Portugal',
-    'RO': 'Romania',
-    'SI': 'Slovenia',
-    'SK': 'Slovakia',
-    'FI': 'Finland',
-    'SE': 'Sweden',
-    'IS': 'Iceland',
-    'NO': 'Norway',
-    'UK': 'United Kingdom',
-    'RS': 'Serbia',
-    'TR': 'Turkey'
-}
-
-# Dictionary to parse gender
-GENDER_TRANSLATION = {
-    'F': 'Female',
-    'M': 'Male',
-    'T': 'Total'
-}
-
-# Dictionary to parse BMI levels
-BMI_TRANSLATION = {
-    'BMI_LT18P5': 'Underweight',
-    'BMI18P5-24': 'Normal',
-    'BMI_GE25': 'Overweight',
-    'BMI25-29': 'Pre-obese',
-    'BMI_GE30': 'Obese'
-}
-
-EDUCATION_TRANSLATION = {
-    'ED0-2': 'Primary',
-    'ED3_4': 'Secondary',
-    'ED5-8': 'Tertiary',
-    'TOTAL': 'Total'
-}
-
-AGE_TRANSLATION = {
-    'Y15-24': '15-24',
-    'Y25-34': '25-34',
-    'Y35-44': '35-44',
-    'Y45-54': '45-54',
-    'Y55-64': '55-64',
-    'Y65-74': '65-74',
-    'Y_GE75': '75+',
-    'TOTAL': 'Total'
-}
+# Share the data between the gunicorn workers through a memory-mapped file (SHARED_DATA=0 disables it)
+SHARED_DATA = os.environ.get("SHARED_DATA", "1") != "0"
 
-###################################################################################################
-#                                                                                                 #
-#                                            FUNCTIONS                                            #
-#                                                                                                 #
-###################################################################################################
+# Bounds of the cache of figures built by the callbacks
+FIGURE_CACHE_MAX_ENTRIES = int(os.environ.get("FIGURE_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+FIGURE_CACHE_MAX_BYTES = int(os.environ.get("FIGURE_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
 
-def translate_value(code:str, translator:dict) -> str:
-    """This function is meant to translate the value found
-    within the original dataset to a human readable one.
+# Build every map at startup (PREWARM_FIGURES=1 enables it)
+PREWARM_FIGURES = os.environ.get("PREWARM_FIGURES", "0") == "1"
 
-    Args:
-        code (str): Value to be translated
-        translator (dict): Dictionary to use for the translation
+# Ship the data to the browser and update the map title and the charts there (CLIENTSIDE_CALLBACKS=1 enables it)
+CLIENTSIDE_CALLBACKS = os.environ.get("CLIENTSIDE_CALLBACKS", "0") == "1"
 
-    Raises:
-        ValueError: Raised if the code is not found within the translator dictionary
+# Seconds between two checks of the data file for a new release (REFRESH_INTERVAL=0 disables them)
+REFRESH_INTERVAL = float(os.environ.get("REFRESH_INTERVAL", DEFAULT_REFRESH_INTERVAL))
 
-    Returns:
-        str: Transalted value.
-    """
-    if code in translator.keys():
-        translated = translator[code]
-    else:
-        raise ValueError("The code '{:s}' could not be found within the translation dictionary!!".format(code))
-    return translated
-
-def format_data(data:pd.DataFrame) -> pd.DataFrame:
-    """This function will format the original data to be easy
-    to read and analyse.
-
-    Args:
-        data (pd.DataFrame): Our data before parsing.
-
-    Returns:
-        pd.DataFrame: Our data ready to be used.
-    """
-
-    # Drop the NA values
-    data = data.dropna(subset=['OBS_VALUE'])
-
-    # Drop the agregated values
-    data = data[data.geo != 'EU27_2020']
-    data = data[data.geo != 'EU28']
-
-    # Drop non standard age groups
-    data = data[data.age != 'Y_GE65']
-    data = data[data.age != 'Y15-19']
-    data = data[data.age != 'Y15-29']
-    data = data[data.age != 'Y25-29']
-    data = data[data.age != 'Y25-64']
-    data = data[data.age != 'Y15-64']
-    data = data[data.age != 'Y18-24']
-    data = data[data.age != 'Y18-29']
-    data = data[data.age != 'Y18-44']
-    data = data[data.age != 'Y18-64']
-    data = data[data.age != 'Y_GE18']
-    data = data[data.age != 'Y20-24']
-    data = data[data.age != 'Y45-64']
-
-    # Value Parsing
-    data['sex'] = data.sex.apply(lambda x: translate_value(x, GENDER_TRANSLATION))
-    data['bmi'] = data.bmi.apply(lambda x: translate_value(x, BMI_TRANSLATION))
-    data['isced11'] = data.isced11.apply(lambda x: translate_value(x, EDUCATION_TRANSLATION))
-    data['age'] = data.age.apply(lambda x: translate_value(x, AGE_TRANSLATION))
-    data['country'] = data.geo.apply(lambda x: translate_value(x, COUNTRY_TRANSLATION))
-    data['alpha3'] = data.country.apply(lambda x: country_name_to_country_alpha3(x))
-    data = data.drop(['geo'], axis=1)
-    return data
-
-
-def read_data(data_file:str="hlth_ehis_bm1e_linear.csv") -> pd.DataFrame:
-    """This function is meant to used to read the data file and prepare it to be used
-    within our dashboard
-
-    Args:
-        file (str, optional): The path to our data source file. Defaults to "hlth_ehis_bm1e_linear.csv".
-
-    Returns:
-        pd.DataFrame: The data ready to be used.
-    """
-    if os.path.isfile(data_file):
-        my_data = pd.read_csv(data_file)
-        my_data = my_data.drop(['DATAFLOW', 'LAST UPDATE', 'OBS_FLAG', 'freq', 'unit'], axis=1)
-        my_data = format_data(my_data)
-    else:
-        raise FileNotFoundError("The path given as parameter is not a file!!")
+# Figures built at once by each worker (RENDER_THREADS=0 builds them within the callbacks), figures
+# waiting for a thread before new ones are answered with a 503 (by default, below the request threads
+# of the gunicorn worker so that they can run out) and seconds a callback waits for its figure
+RENDER_THREADS = int(os.environ.get("RENDER_THREADS", DEFAULT_THREADS))
+RENDER_QUEUE = int(os.environ.get("RENDER_QUEUE", default_queue(int(os.environ.get("GUNICORN_THREADS", DEFAULT_REQUEST_THREADS)), RENDER_THREADS)))
+RENDER_TIMEOUT = float(os.environ.get("RENDER_TIMEOUT", DEFAULT_TIMEOUT))
 
-    return my_data
+# Seconds the browser is asked to wait before retrying a rejected request
+RETRY_AFTER = int(os.environ.get("RETRY_AFTER", 1))
+
+# Compress the responses with Brotli or gzip (COMPRESSION=0 disables it)
+COMPRESSION = os.environ.get("COMPRESSION", "1") != "0"
+
+# Bound of the cache of compressed bodies (COMPRESSION_CACHE_MAX_BYTES=0 disables it)
+COMPRESSION_CACHE_MAX_BYTES = int(os.environ.get("COMPRESSION_CACHE_MAX_BYTES", DEFAULT_CACHE_MAX_BYTES))
+
+# Countries above which the charts only draw the top TOP_COUNTRIES ones (the other ones averaged
+# into an 'Others' bucket), the trend is drawn with unstacked WebGL lines and a chart has at most MAX_POINTS points.
+# Disabled by default (LARGE_SELECTION=0) and in clientside mode, whose charts draw every country
+LARGE_SELECTION = 0 if CLIENTSIDE_CALLBACKS else int(os.environ.get("LARGE_SELECTION", LARGE_SELECTION))
+TOP_COUNTRIES = int(os.environ.get("TOP_COUNTRIES", TOP_COUNTRIES))
+MAX_POINTS = int(os.environ.get("MAX_POINTS", MAX_POINTS))
+
+# Load the data in the background, the app serves requests meanwhile and /ready answers
+# with a 503 until the data is loaded (BACKGROUND_LOAD=1 enables it)
+BACKGROUND_LOAD = os.environ.get("BACKGROUND_LOAD", "0") == "1"
+
+# Bound of the memory taken by the datasets loaded, the least recently used ones are evicted beyond it
+DATASETS_MAX_BYTES = int(os.environ.get("DATASETS_MAX_BYTES", DEFAULT_DATASETS_MAX_BYTES))
+
+# Routes turning the profiler of the callbacks on and off at runtime (PROFILER_ROUTES=1 enables them),
+# answered to local clients only unless they send PROFILER_TOKEN as a bearer token
+PROFILER_ROUTES = os.environ.get("PROFILER_ROUTES", "0") == "1"
+PROFILER_TOKEN = os.environ.get("PROFILER_TOKEN", "")
 
 ###################################################################################################
 #                                                                                                 #
@@ -202,11 +106,31 @@ def read_data(data_file:str="hlth_ehis_bm1e_linear.csv") -> pd.DataFrame:
 
 APP_PATH = str(pathlib.Path(__file__).parent.resolve())
 
-full_data = read_data(os.path.join(APP_PATH, "hlth_ehis_bm1e_linear.csv"))
-
-YEARS = full_data.TIME_PERIOD.unique()
-
-BMI_VALUES = full_data.bmi.unique()
+DATA_FILE = os.environ.get("DATA_FILE", os.path.join(APP_PATH, "hlth_ehis_bm1e_linear.csv"))
+
+# Datasets served, files shaped as any of the BMI indicators of data.INDICATORS given as 'name=path' entries separated by commas
+# (the first one is the default one), each one ending with ':max_bytes' if its memory is bounded, selected with the dropdown
+# of the page or its 'dataset' URL parameter
+DATASETS, DATASETS_BUDGETS = parse_sources(os.environ.get("DATASETS", "{0}={1}".format(pathlib.Path(DATA_FILE).stem, DATA_FILE)))
+
+# Figures already built by the callbacks
+figure_cache = FigureCache(FIGURE_CACHE_MAX_ENTRIES, FIGURE_CACHE_MAX_BYTES)
+
+# Threads building the figures missing from the cache
+render_pool = RenderPool(RENDER_THREADS, RENDER_QUEUE, RENDER_TIMEOUT)
+
+# Versions of each dataset (cube used to slice it without scanning it and map geometry),
+# swapped in the background when its data file changes
+datasets = DatasetRegistry(
+    DATASETS,
+    load_geojson(os.path.join(APP_PATH, "europe.geo.json")),
+    max_bytes=DATASETS_MAX_BYTES,
+    budgets=DATASETS_BUDGETS,
+    shared=SHARED_DATA,
+    interval=REFRESH_INTERVAL,
+    on_swap=lambda dataset: figure_cache.clear(),
+    background=BACKGROUND_LOAD,
+)
 
 DEFAULT_COLORSCALE = [
     "#69e7c0",
@@ -224,144 +148,195 @@ DEFAULT_COLORSCALE = [
 
 DEFAULT_OPACITY = 0.8
 
+# Eurostat page of each BMI indicator
+DATA_SOURCE = "https://ec.europa.eu/eurostat/databrowser/view/{0}/default/table?lang=en"
+
 ###################################################################################################
 #                                                                                                 #
 #                                           APP LAYOUT                                            #
 #                                                                                                 #
 ###################################################################################################
 
-app.layout = html.Div(
-    id="root",
-    children=[
-        # HEADER
-        html.Div(
-            id="header",
-            children=[
-                html.H2(children="Fit or Fat? (Europe's Edition)"),
-                html.P(
-                    id="description",
-                    children="This simple dashboard will allow the \
-                        user to answer several questions related to \
-                        the health condition of the European population \
-                        such as 'Which country has a greater problem \
-                        with overweight?' or 'Are young germans healthier \
-                        than their elders?'",
-                ),
-            ],
-        ),
-        # BODY
-        html.Div(
-            id="app-container",
-            children=[
-                html.Div(
-                    id="left-column",
-                    children=[
-                        html.Div(
-                            id="slider-container",
-                            children=[
-                                html.P(
-                                    id="year-text",
-                                    children="Select the year:"
+# Charts of the dropdown, the third one breaks the data down by the column of its indicator
+def chart_options(schema):
+    return [
+        {
+            "label": "Percentage of people with selected BMI by sex",
+            "value": 1,
+        },
+        {
+            "label": "Percentage of people with selected BMI by age",
+            "value": 2,
+        },
+        {
+            "label": "Percentage of people with selected BMI by {0} level".format(schema.label if schema is not None else "indicator"),
+            "value": 3,
+        },
+        {
+            "label": "Evolution of the percentage of people with selected BMI",
+            "value": 4,
+        },
+        {
+            "label": "Wind Rose Chart",
+            "value": 5,
+        },
+    ]
+
+# Layout of a version of the data, with every component but no data when there is none (e.g. while it loads)
+def build_layout(dataset):
+    years = dataset.years.tolist() if dataset is not None else []
+    bmi_values = dataset.bmi_values.tolist() if dataset is not None else []
+    year, bmi = (min(years), min(bmi_values)) if dataset is not None else (None, None)
+    schema = dataset.cube.schema if dataset is not None else datasets.schemas[datasets.default]
+    return html.Div(
+        id="root",
+        children=[
+            # HEADER
+            html.Div(
+                id="header",
+                children=[
+                    html.H2(children="Fit or Fat? (Europe's Edition)"),
+                    html.P(
+                        id="description",
+                        children="This simple dashboard will allow the \
+                            user to answer several questions related to \
+                            the health condition of the European population \
+                            such as 'Which country has a greater problem \
+                            with overweight?' or 'Are young germans healthier \
+                            than their elders?'",
+                    ),
+                ],
+            ),
+            # BODY
+            html.Div(
+                id="app-container",
+                children=[
+                    html.Div(
+                        id="left-column",
+                        children=[
+                            # Only shown when several datasets are served
+                            html.Div(
+                                id="dataset-container",
+                                style={} if len(datasets.names) > 1 else {"display": "none"},
+                                children=[
+                                    html.P(
+                                        id="dataset-text",
+                                        children="Select the dataset:"
                                     ),
-                                dcc.RadioItems(
-                                    id='years-radio',
-                                    options=YEARS,
-                                    value=min(YEARS),
-                                    inline=True
+                                    dcc.Dropdown(
+                                        id="dataset-dropdown",
+                                        options=datasets.names,
+                                        value=datasets.default,
+                                        clearable=False,
                                     ),
-                                html.P(
-                                    id="bmi-text",
-                                    children="Select the BMI:"
-                                ),
-                                dcc.RadioItems(
-                                    id='bmi-radio',
-                                    options=BMI_VALUES,
-                                    value=min(BMI_VALUES),
-                                    inline=True
+                                ],
+                            ),
+                            html.Div(
+                                id="slider-container",
+                                children=[
+                                    html.P(
+                                        id="year-text",
+                                        children="Select the year:"
+                                        ),
+                                    dcc.RadioItems(
+                                        id='years-radio',
+                                        options=years,
+                                        value=year,
+                                        inline=True
+                                        ),
+                                    html.P(
+                                        id="bmi-text",
+                                        children="Select the BMI:"
+                                    ),
+                                    dcc.RadioItems(
+                                        id='bmi-radio',
+                                        options=bmi_values,
+                                        value=bmi,
+                                        inline=True
+                                        ),
+                                ],
+                            ),
+                            html.Div(
+                                id="map-container",
+                                children=[
+                                    html.H3(
+                                        id="map-title",
+                                        children="This heatmap shows the percentage of '{0}' people for each country for the year {1}".format(bmi.lower(), year) if dataset is not None else ""
+                                    ),
+                                    dcc.Graph(id="map"),
+                                ],
+                            ),
+                        ],
+                    ),
+                    html.Div(
+                        id="graph-container",
+                        children=[
+                            html.P(id="chart-selector", children="Select chart:"),
+                            dcc.Dropdown(
+                                options=chart_options(schema),
+                                value=1,
+                                id="chart-dropdown",
+                            ),
+                            dcc.Graph(
+                                id="selected-data",
+                                figure=dict(
+                                    data=[dict(x=0, y=0)],
+                                    layout=dict(
+                                        paper_bgcolor="#F4F4F8",
+                                        plot_bgcolor="#F4F4F8",
+                                        autofill=True,
+                                        margin=dict(t=75, r=50, b=100, l=50),
                                     ),
-                            ],
-                        ),
-                        html.Div(
-                            id="map-container",
-                            children=[
-                                html.H3(
-                                    id="map-title",
-                                    children="This heatmap shows the percentage of '{0}' people for each country for the year {1}".format(min(BMI_VALUES).lower(), min(YEARS))
-                                ),
-                                dcc.Graph(id="map"),
-                            ],
-                        ),
-                    ],
-                ),
-                html.Div(
-                    id="graph-container",
-                    children=[
-                        html.P(id="chart-selector", children="Select chart:"),
-                        dcc.Dropdown(
-                            options=[
-                                {
-                                    "label": "Percentage of people with selected BMI by sex",
-                                    "value": 1,
-                                },
-                                {
-                                    "label": "Percentage of people with selected BMI by age",
-                                    "value": 2,
-                                },
-                                {
-                                    "label": "Percentage of people with selected BMI by education level",
-                                    "value": 3,
-                                },
-                                {
-                                    "label": "Evolution of the percentage of people with selected BMI",
-                                    "value": 4,
-                                },
-                                {
-                                    "label": "Wind Rose Chart",
-                                    "value": 5,
-                                },
-                            ],
-                            value=1,
-                            id="chart-dropdown",
-                        ),
-                        dcc.Graph(
-                            id="selected-data",
-                            figure=dict(
-                                data=[dict(x=0, y=0)],
-                                layout=dict(
-                                    paper_bgcolor="#F4F4F8",
-                                    plot_bgcolor="#F4F4F8",
-                                    autofill=True,
-                                    margin=dict(t=75, r=50, b=100, l=50),
                                 ),
                             ),
-                        ),
-                    ],
-                ),
-            ],
-        ),
-    # FOOTER
-    html.Div(
-            id="footer",
-            children=[
-                html.A(
-                    html.Button("Data Source", className="button"),
-                    href="https://ec.europa.eu/eurostat/databrowser/view/HLTH_EHIS_BM1E/default/table?lang=en",
-                ),
-                html.A(
-                    html.Button("Map Source", className="link-button"),
-                    href="https://geojson-maps.ash.ms/",
-                ),
-                html.A(
-                    html.Button("Organization", className="link-button"),
-                    href="https://www.uoc.edu/portal/es/index.html",
-                ),
-                html.A(
-                    html.Button("Source Code", className="link-button"),
-                    href="https://github.com/rmoyav/PRA2_visualizacion",
-                ),
-            ],
-        ),],
-)
+                        ],
+                    ),
+                ],
+            ),
+        # FOOTER
+        html.Div(
+                id="footer",
+                children=[
+                    html.A(
+                        html.Button("Data Source", className="button"),
+                        id="data-source",
+                        href=DATA_SOURCE.format(schema.name.upper() if schema is not None else "HLTH_EHIS_BM1E"),
+                    ),
+                    html.A(
+                        html.Button("Map Source", className="link-button"),
+                        href="https://geojson-maps.ash.ms/",
+                    ),
+                    html.A(
+                        html.Button("Organization", className="link-button"),
+                        href="https://www.uoc.edu/portal/es/index.html",
+                    ),
+                    html.A(
+                        html.Button("Source Code", className="link-button"),
+                        href="https://github.com/rmoyav/PRA2_visualizacion",
+                    ),
+                ],
+            ),
+        # DATA SHIPPED TO THE CLIENTSIDE CALLBACKS
+        *([dcc.Store(id="data-store", data=data_store(dataset) if dataset is not None else None)] if CLIENTSIDE_CALLBACKS else []),
+        # DATASET SELECTED WITH THE URL
+        dcc.Location(id="url", refresh=False),
+        # CHECKS OF THE VERSION OF THE DATA
+        dcc.Store(id="dataset-version", data=dataset.version if dataset is not None else None),
+        dcc.Interval(id="refresh-interval", interval=max(REFRESH_INTERVAL, 1) * 1000, disabled=REFRESH_INTERVAL <= 0),],
+    )
+
+# Built on each page load from the current version of the data. Dash also builds it on the first
+# request of any route to validate it, only the page loads wait for the data to be loaded
+def serve_layout():
+    if datasets.ready() or (flask.has_request_context() and flask.request.path.endswith("/_dash-layout")):
+        return build_layout(datasets.get())
+    return build_layout(None)
+
+def data_store(dataset):
+    return figure_cache.fetch(canonical_key("data-store", dataset.version), lambda: client_store(dataset.cube))
+
+app.validation_layout = build_layout(None)
+app.layout = serve_layout
 
 ###################################################################################################
 #                                                                                                 #
@@ -371,141 +346,205 @@ app.layout = html.Div(
 
 @app.callback(
     Output("map", "figure"),
-    [Input("bmi-radio", "value"), Input("years-radio", "value")]
+    [Input("bmi-radio", "value"), Input("years-radio", "value"), Input("dataset-dropdown", "value")]
 )
-def display_map(bmi, year):
-    # Reading geojson
-    with open(os.path.join(APP_PATH, "europe.geo.json"), 'r') as euro:
-        countries = json.load(euro)
-    
-    totals = full_data[(full_data.age == 'Total') & (full_data.sex == 'Total') & (full_data.isced11 == 'Total') & (full_data.bmi == bmi) & (full_data.TIME_PERIOD == year)]
-
-    # Creating map
-    fig = px.choropleth(totals, geojson=countries, color="OBS_VALUE", locations="alpha3",
-    featureidkey="properties.iso_a3", range_color=[totals.OBS_VALUE.min(), totals.OBS_VALUE.max()])
-    
-    fig.update_geos(fitbounds="locations", visible=True)
-    fig.update_layout(margin={"r":0,"t":0,"l":0,"b":0}, height=630, paper_bgcolor="#F4F4F8", dragmode="select")
-    return fig
-
-@app.callback(Output("map-title", "children"), [Input("bmi-radio", "value"), Input("years-radio", "value")])
+@instrument("display_map")
+def display_map(bmi, year, name=None):
+    dataset = datasets.get(name)
+    key = canonical_key("map", dataset.version, bmi, year)
+    return figure_cache.fetch(key, lambda: render_pool.run(lambda: render_map(dataset.rollups, dataset.geo_cache, bmi, year)))
+
+@instrument("update_map_title")
 def update_map_title(bmi, year):
     return "This heatmap shows the percentage of '{0}' people for each country for the year {1}".format(bmi.lower(), year)
 
-
-@app.callback(
-    Output("selected-data", "figure"),
-    [
-        Input("map", "selectedData"),
-        Input("chart-dropdown", "value"),
-        Input("years-radio", "value"),
-        Input("bmi-radio", "value"),
-    ],
-)
-def display_selected_data(selectedData, chart_dropdown, year, bmi):
+@instrument("display_selected_data")
+def display_selected_data(selectedData, chart_dropdown, year, bmi, name=None):
     if selectedData is None:
-        response =  dict(
-            data=[dict(x=0, y=0)],
-            layout=dict(
-                title="Drag over the map to select countries",
-                paper_bgcolor="#1f2630",
-                plot_bgcolor="#1f2630",
-                font=dict(color="#05C3DD"),
-                margin=dict(t=75, r=50, b=100, l=75),
-            ),
-        )
+        response = EMPTY_SELECTION
     else:
-        
-        filtered = full_data[full_data.bmi == bmi]
-        
-        sel_countries = []
-        for point in selectedData["points"]:
-            sel_countries.append(point["location"])
-
-        for country in filtered.alpha3.unique():
-            if not country in sel_countries:
-                filtered  = filtered[filtered.alpha3 != country]
-                
-        if chart_dropdown == 1:
-            filtered = filtered[(full_data.TIME_PERIOD == year) & (filtered.isced11 == 'Total') & (filtered.age == 'Total') & (filtered.sex != 'Total')]
-            fig = px.histogram(filtered, x="OBS_VALUE", y="country", color="sex")
-            title = "Percentage of people with '<b>{0}</b>' BMI by sex (<b>{1}</b>)".format(bmi, year)
-        elif chart_dropdown == 2:
-            filtered = filtered[(full_data.TIME_PERIOD == year) & (filtered.sex == 'Total') & (filtered.isced11 == 'Total') & (filtered.age != 'Total')]
-            fig = px.histogram(filtered, x="OBS_VALUE", y="country", color="age")
-            title = "Percentage of people with '<b>{0}</b>' BMI by age (<b>{1}</b>)".format(bmi, year)
-        elif chart_dropdown == 3:
-            filtered = filtered[(full_data.TIME_PERIOD == year) & (filtered.sex == 'Total') & (filtered.age == 'Total') & (filtered.isced11 != 'Total')]
-            fig = px.histogram(filtered, x="OBS_VALUE", y="country", color="isced11")
-            title = "Percentage of people with '<b>{0}</b>' BMI by education (<b>{1}</b>)".format(bmi, year)
-        elif chart_dropdown == 4:
-            filtered = filtered[(filtered.age == 'Total') & (filtered.sex == 'Total') & (filtered.isced11 == 'Total')]
-            fig = px.area(filtered, y="OBS_VALUE", x="TIME_PERIOD", color="country")
-            title = "Trend for people with '<b>{0}</b>' BMI (2014-2019)".format(bmi)
-        elif chart_dropdown == 5:
-            filtered = full_data[(full_data.TIME_PERIOD == year) & (full_data.sex == 'Total') & (full_data.age == 'Total') & (full_data.isced11 == 'Total')]
-            for country in filtered.alpha3.unique():
-                if not country in sel_countries:
-                    filtered  = filtered[filtered.alpha3 != country]
-            title = "Wind rose of all BMIs for year <b>{0}</b>".format(year)
-            fig = px.bar_polar(filtered, r="OBS_VALUE", theta="country", color="bmi", color_discrete_sequence= px.colors.sequential.Plasma_r, title=title)
-            
-        else:
-            response =  dict(
-                data=[dict(x=0, y=0)],
-                layout=dict(
-                    title="Ups! Something's gone wrong... :S",
-                    paper_bgcolor="#1f2630",
-                    plot_bgcolor="#1f2630",
-                    font=dict(color="#05C3DD"),
-                    margin=dict(t=75, r=50, b=100, l=75),
-                ),
-        )
-
-        if fig is not None:
-            fig_layout = fig["layout"]
-            fig_layout["yaxis"]["title"] = title
-            fig_layout["xaxis"]["title"] = ""
-            fig_layout["title"] = "<b>{0}</b> countries selected".format(len(filtered.country.unique()))
-            fig_layout["yaxis"]["fixedrange"] = True
-            fig_layout["xaxis"]["fixedrange"] = False
-            fig_layout["paper_bgcolor"] = "#1f2630"
-            fig_layout["font"]["color"] = "#05C3DD"
-            fig_layout["xaxis"]["tickfont"]["color"] = "#05C3DD"
-            fig_layout["yaxis"]["tickfont"]["color"] = "#05C3DD"
-            fig_layout["xaxis"]["gridcolor"] = "#5b5b5b"
-            fig_layout["yaxis"]["gridcolor"] = "#5b5b5b"
-            fig_layout["font"]["color"] = "#05C3DD"
-            fig_layout["title"]["font"]["color"] = "#05C3DD"
-            fig_layout["hovermode"] = "closest"
-            fig_layout["legend"] = dict(orientation="v")
-            fig_layout["autosize"] = True
-            fig_layout["margin"]["t"] = 75
-            fig_layout["margin"]["r"] = 50
-            fig_layout["margin"]["b"] = 100
-            fig_layout["margin"]["l"] = 50
-
-            if chart_dropdown < 4:
-                fig_data = fig["data"]
-                fig_data[0]["marker"]["color"] = "#05C3DD"
-                fig_data[0]["marker"]["opacity"] = 1
-                fig_data[0]["marker"]["line"]["width"] = 0
-                fig_data[0]["textposition"] = "outside"
-            
-            
-            
-            
-            response = fig
-        elif (fig is not None) and (chart_dropdown == 4):
-            # See plot.ly/python/reference
-
-            
-            
-            
-            response = fig
+        sel_countries = {point["location"] for point in selectedData["points"]}
+
+        dataset = datasets.get(name)
+        key = canonical_key("selected-data", dataset.version, sel_countries, chart_dropdown, year, bmi)
+        build = lambda: render_selected_data(dataset.rollups, sel_countries, chart_dropdown, year, bmi,
+                                             LARGE_SELECTION, TOP_COUNTRIES, MAX_POINTS)
+        response = figure_cache.fetch(key, lambda: render_pool.run(build))
+
+    return response
+
+# Both callbacks run in the browser in clientside mode, see assets/clientside.js
+SELECTED_DATA_INPUTS = [
+    Input("map", "selectedData"),
+    Input("chart-dropdown", "value"),
+    Input("years-radio", "value"),
+    Input("bmi-radio", "value"),
+]
+
+if CLIENTSIDE_CALLBACKS:
+    app.clientside_callback(
+        ClientsideFunction(namespace="fitorfat", function_name="mapTitle"),
+        Output("map-title", "children"),
+        [Input("bmi-radio", "value"), Input("years-radio", "value")],
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace="fitorfat", function_name="selectedData"),
+        Output("selected-data", "figure"),
+        # The store is an input so that the charts are drawn again with another dataset or version
+        SELECTED_DATA_INPUTS + [Input("data-store", "data")],
+    )
+else:
+    app.callback(Output("map-title", "children"), [Input("bmi-radio", "value"), Input("years-radio", "value")])(update_map_title)
+    app.callback(Output("selected-data", "figure"), SELECTED_DATA_INPUTS + [Input("dataset-dropdown", "value")])(display_selected_data)
+
+REFRESH_OUTPUTS = [
+    Output("years-radio", "options"),
+    Output("bmi-radio", "options"),
+    Output("years-radio", "value"),
+    Output("bmi-radio", "value"),
+    Output("chart-dropdown", "options"),
+    Output("data-source", "href"),
+    Output("dataset-version", "data"),
+    *([Output("data-store", "data")] if CLIENTSIDE_CALLBACKS else []),
+]
+
+REFRESH_STATES = [
+    State("dataset-version", "data"),
+    State("years-radio", "value"),
+    State("bmi-radio", "value"),
+]
+
+@app.callback(REFRESH_OUTPUTS, [Input("refresh-interval", "n_intervals"), Input("dataset-dropdown", "value")], REFRESH_STATES)
+@instrument("refresh_options")
+def refresh_options(n_intervals, name, version, year, bmi):
+    # The page is only updated when another dataset is selected or a new version of it was swapped in
+    dataset = datasets.get(name)
+    if dataset.version == version:
+        raise PreventUpdate
+
+    # The selected year and BMI level are kept if the new version has them
+    years, bmi_values = dataset.years.tolist(), dataset.bmi_values.tolist()
+    year = year if year in years else min(years)
+    bmi = bmi if bmi in bmi_values else min(bmi_values)
+    schema = dataset.cube.schema
+    response = [years, bmi_values, year, bmi, chart_options(schema), DATA_SOURCE.format(schema.name.upper()), dataset.version]
+    if CLIENTSIDE_CALLBACKS:
+        response.append(data_store(dataset))
+    return response
 
+@app.callback(Output("dataset-dropdown", "value"), [Input("url", "search")], [State("dataset-dropdown", "value")])
+@instrument("select_dataset")
+def select_dataset(search, name):
+    # A 'dataset' URL parameter naming a registered dataset selects it
+    requested = urllib.parse.parse_qs((search or "").lstrip("?")).get("dataset", [None])[0]
+    if requested not in datasets.names or requested == name:
+        raise PreventUpdate
+    return requested
+
+def prewarm_maps():
+    dataset = datasets.get()
+    for prewarm_year in dataset.years:
+        for prewarm_bmi in dataset.bmi_values:
+            display_map(prewarm_bmi, prewarm_year)
+
+# In background mode the maps are built once the data is loaded, without holding up the boot
+if PREWARM_FIGURES and BACKGROUND_LOAD:
+    threading.Thread(target=prewarm_maps, name="prewarm-maps", daemon=True).start()
+elif PREWARM_FIGURES:
+    prewarm_maps()
+
+###################################################################################################
+#                                                                                                 #
+#                                          SERVER ROUTES                                          #
+#                                                                                                 #
+###################################################################################################
+
+@server.route("/cache-stats")
+def cache_stats():
+    return flask.jsonify(figure_cache.stats())
+
+@server.route("/datasets")
+def dataset_stats():
+    return flask.jsonify(datasets.stats())
+
+@server.route("/ready")
+def ready():
+    # Readiness check, the data is loaded in the background in background mode
+    if not datasets.ready():
+        return flask.jsonify({"ready": False}), 503
+    return flask.jsonify({"ready": True, "version": datasets.get().version})
+
+@server.before_request
+def start_timer():
+    flask.g.request_start = time.perf_counter()
+
+@server.before_request
+def start_refresher():
+    # Each gunicorn worker polls the data file from its own thread
+    datasets.ensure_running()
+
+@server.after_request
+def record_request_time(response):
+    # Only the callback requests are timed, labelled by the output they update
+    if flask.request.path.endswith("/_dash-update-component") and "request_start" in flask.g:
+        body = flask.request.get_json(silent=True) or {}
+        output = body.get("output") if isinstance(body, dict) else None
+        # Anything but a registered output would make a new series per request
+        if not isinstance(output, str) or output not in app.callback_map:
+            output = "other"
+        labels = (("output", output), ("status", response.status_code))
+        METRICS.observe("request_seconds", labels, time.perf_counter() - flask.g.request_start)
     return response
 
+# Registered after the timing hooks so that the time spent compressing is measured
+if COMPRESSION:
+    body_cache = BodyCache(DEFAULT_CACHE_MAX_ENTRIES, COMPRESSION_CACHE_MAX_BYTES) if COMPRESSION_CACHE_MAX_BYTES > 0 else None
+    enable_compression(server, body_cache)
+else:
+    body_cache = None
+
+@server.errorhandler(OverloadedError)
+def overloaded(error):
+    # Fast fail: the Dash renderer does not retry it, the chart keeps its previous figure (and the
+    # error is logged in the browser console) until its inputs change again. Retry-After is for other clients
+    return flask.Response(str(error), status=503, headers={"Retry-After": str(RETRY_AFTER)}, mimetype="text/plain")
+
+@server.route("/metrics")
+def metrics():
+    counters = {"figure_cache_{0}_total".format(name): value for name, value in figure_cache.stats().items() if name in ("hits", "misses", "evictions")}
+    if body_cache is not None:
+        counters.update({"body_cache_{0}_total".format(name): value for name, value in body_cache.stats().items() if name in ("hits", "misses", "evictions")})
+    counters.update({"render_{0}_total".format(name): value for name, value in render_pool.stats().items() if name in ("rejected", "timeouts")})
+    counters.update({"dataset_{0}_total".format(name): value for name, value in datasets.stats().items() if name in ("loads", "evictions")})
+    # Each gunicorn worker has its own series, labelled by its pid
+    return flask.Response(METRICS.prometheus(counters, (("worker", os.getpid()),)), mimetype="text/plain; version=0.0.4")
+
+if PROFILER_ROUTES:
+    @server.before_request
+    def authorize_profiler():
+        if flask.request.path.startswith("/profiler"):
+            if PROFILER_TOKEN:
+                allowed = hmac.compare_digest(flask.request.headers.get("Authorization", ""), "Bearer {0}".format(PROFILER_TOKEN))
+            else:
+                allowed = flask.request.remote_addr in ("127.0.0.1", "::1")
+            if not allowed:
+                flask.abort(403)
+
+    # The profiler of the worker answering is the one turned on and off, its pid is returned
+    @server.route("/profiler/start", methods=["POST"])
+    def start_profiler():
+        PROFILER.start()
+        return flask.jsonify({"active": True, "worker": os.getpid()})
+
+    @server.route("/profiler/stop", methods=["POST"])
+    def stop_profiler():
+        PROFILER.stop()
+        return flask.jsonify({"active": False, "worker": os.getpid()})
+
+    @server.route("/profiler")
+    def profiler_report():
+        return flask.Response("Worker {0}\n{1}".format(os.getpid(), PROFILER.report()), mimetype="text/plain")
+
 ###################################################################################################
 #                                                                                                 #
 #                                              MAIN                                               #
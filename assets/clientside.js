@@ -0,0 +1,159 @@
+/*
+ * Fit or Fat? (Europe's Edition) - Clientside callbacks
+ *
+ * Browser version of update_map_title and display_selected_data, used when the
+ * app runs with CLIENTSIDE_CALLBACKS=1. The charts are drawn from the compact
+ * data stored in the "data-store" component (see figures.client_store) and
+ * follow the same logic as figures.render_selected_data, every selected
+ * country being drawn (the large-selection mode is only available on the
+ * server, app.py disables it in clientside mode). The column of each
+ * histogram and its label come from the schema of the dataset, within the store.
+ */
+
+const AREA_CHART = 4;
+const WIND_ROSE_CHART = 5;
+
+const EMPTY_SELECTION = {
+    data: [{x: 0, y: 0}],
+    layout: {
+        title: "Drag over the map to select countries",
+        paper_bgcolor: "#1f2630",
+        plot_bgcolor: "#1f2630",
+        font: {color: "#05C3DD"},
+        margin: {t: 75, r: 50, b: 100, l: 75},
+    },
+};
+
+const UNKNOWN_CHART = {
+    data: [{x: 0, y: 0}],
+    layout: {
+        title: "Ups! Something's gone wrong... :S",
+        paper_bgcolor: "#1f2630",
+        plot_bgcolor: "#1f2630",
+        font: {color: "#05C3DD"},
+        margin: {t: 75, r: 50, b: 100, l: 75},
+    },
+};
+
+// Value of an edge of the data at the given positions (BMI, column level, country, year)
+function edgeValue(edge, bmi, level, country, year) {
+    const shape = edge.shape;
+    return edge.values[((bmi * shape[1] + level) * shape[2] + country) * shape[3] + year];
+}
+
+// Trace of the group found at the given position of a chart (see ChartTemplate.trace)
+function buildTrace(template, position, name, arrays) {
+    if (position >= template.prototypes.length) {
+        position = (position - 1) % template.cycle + 1;
+    }
+    const prototype = template.prototypes[position];
+    return Object.assign({}, prototype, arrays, {
+        name: name,
+        legendgroup: name,
+        hovertemplate: template.column + "=" + name + prototype.hovertemplate,
+    });
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    fitorfat: {
+        mapTitle: function (bmi, year) {
+            return "This heatmap shows the percentage of '" + bmi.toLowerCase() + "' people for each country for the year " + year;
+        },
+
+        selectedData: function (selectedData, chart_dropdown, year, bmi, store) {
+            if (selectedData === null || selectedData === undefined || !store) {
+                return EMPTY_SELECTION;
+            }
+            if (!(chart_dropdown in store.charts) && chart_dropdown !== AREA_CHART && chart_dropdown !== WIND_ROSE_CHART) {
+                return UNKNOWN_CHART;
+            }
+
+            const levels = store.levels;
+            const selected = new Set(selectedData.points.map(point => point.location));
+            const countries = levels.alpha3.map((code, position) => position).filter(position => selected.has(levels.alpha3[position]));
+            const bmiPosition = levels.bmi.indexOf(bmi);
+            const yearPosition = levels.TIME_PERIOD.indexOf(year);
+            const template = store.templates[chart_dropdown];
+            const drawn = new Set();
+            const traces = [];
+
+            // Each group gets a trace only if it has any value, as with DataFrame.groupby
+            const addGroup = function (name, arrays, countriesDrawn) {
+                if (countriesDrawn.length > 0) {
+                    traces.push(buildTrace(template, traces.length, name, arrays));
+                    countriesDrawn.forEach(country => drawn.add(country));
+                }
+            };
+
+            if (chart_dropdown in store.charts) {
+                const column = store.charts[chart_dropdown];
+                const edge = store.edges[column];
+                if (bmiPosition >= 0 && yearPosition >= 0) {
+                    levels[column].forEach(function (level, levelPosition) {
+                        if (level === store.total) {
+                            return;
+                        }
+                        const x = [], y = [], countriesDrawn = [];
+                        countries.forEach(function (country) {
+                            const value = edgeValue(edge, bmiPosition, levelPosition, country, yearPosition);
+                            if (value !== null) {
+                                x.push(value);
+                                y.push(store.countries[country]);
+                                countriesDrawn.push(country);
+                            }
+                        });
+                        addGroup(level, {x: x, y: y}, countriesDrawn);
+                    });
+                }
+            } else if (chart_dropdown === AREA_CHART) {
+                const edge = store.edges.sex;
+                const total = levels.sex.indexOf(store.total);
+                if (bmiPosition >= 0) {
+                    countries.forEach(function (country) {
+                        const x = [], y = [];
+                        levels.TIME_PERIOD.forEach(function (period, periodPosition) {
+                            const value = edgeValue(edge, bmiPosition, total, country, periodPosition);
+                            if (value !== null) {
+                                x.push(period);
+                                y.push(value);
+                            }
+                        });
+                        addGroup(store.countries[country], {x: x, y: y}, x.length > 0 ? [country] : []);
+                    });
+                }
+            } else {
+                const edge = store.edges.sex;
+                const total = levels.sex.indexOf(store.total);
+                if (yearPosition >= 0) {
+                    levels.bmi.forEach(function (level, levelPosition) {
+                        const r = [], theta = [], countriesDrawn = [];
+                        countries.forEach(function (country) {
+                            const value = edgeValue(edge, levelPosition, total, country, yearPosition);
+                            if (value !== null) {
+                                r.push(value);
+                                theta.push(store.countries[country]);
+                                countriesDrawn.push(country);
+                            }
+                        });
+                        addGroup(level, {r: r, theta: theta}, countriesDrawn);
+                    });
+                }
+            }
+
+            let axisTitle;
+            if (chart_dropdown in store.charts) {
+                const label = store.labels[store.charts[chart_dropdown]];
+                axisTitle = "Percentage of people with '<b>" + bmi + "</b>' BMI by " + label + " (<b>" + year + "</b>)";
+            } else if (chart_dropdown === AREA_CHART) {
+                axisTitle = "Trend for people with '<b>" + bmi + "</b>' BMI (2014-2019)";
+            } else {
+                axisTitle = "Wind rose of all BMIs for year <b>" + year + "</b>";
+            }
+
+            const layout = Object.assign({}, template.layout, {template: store.theme});
+            layout.title = Object.assign({}, layout.title, {text: "<b>" + drawn.size + "</b> countries selected"});
+            layout.yaxis = Object.assign({}, layout.yaxis, {title: {text: axisTitle}});
+            return {data: traces, layout: layout};
+        },
+    },
+});
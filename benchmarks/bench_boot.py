@@ -0,0 +1,171 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - Boot benchmark                                         #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+"""Breaks down the time needed to import the app (python -X importtime, by
+module imported by app.py) and measures the boot of a gunicorn worker loading
+the data within the import against the background load (BACKGROUND_LOAD=1):
+time until the worker answers (any status of /ready), until it is ready and
+until it serves the first page layout. Each boot reads a new copy of the data
+file, so that no binary cache is found.
+
+Usage:
+    python benchmarks/bench_boot.py [--scale 10] [--repeat 3] [--top 10]
+"""
+
+import argparse
+import http.client
+import os
+import pathlib
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from synthetic import write_csv
+
+###################################################################################################
+#                                                                                                 #
+#                                            CONSTANTS                                            #
+#                                                                                                 #
+###################################################################################################
+
+# Environment of each mode
+MODES = [
+    ("eager", {"BACKGROUND_LOAD": "0"}),
+    ("background", {"BACKGROUND_LOAD": "1"}),
+]
+
+# Line of the output of python -X importtime
+IMPORT_TIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)$')
+
+# Modules deferred from the import of the app
+DEFERRED = ['plotly.express', 'pycountry_convert']
+
+###################################################################################################
+#                                                                                                 #
+#                                            FUNCTIONS                                            #
+#                                                                                                 #
+###################################################################################################
+
+def free_port() -> int:
+    """A free port of the loopback interface."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def import_times(root:pathlib.Path, environment:dict) -> tuple:
+    """Cumulative import time (in ms) of app.py and of each module it imports, and the modules imported."""
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=str(root), env=environment,
+                            stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, text=True, check=True).stderr
+    total, children, pending, modules = 0.0, {}, {}, set()
+    for line in output.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match is None:
+            continue
+        cumulative, depth, name = int(match.group(2)) / 1000, len(match.group(3)), match.group(4)
+        modules.add(name)
+        if depth == 3:
+            # The modules imported by a module are listed before it
+            pending[name] = pending.get(name, 0.0) + cumulative
+        elif depth == 1:
+            if name == 'app':
+                total, children = cumulative, pending
+            pending = {}
+    return total, children, modules
+
+
+def status(port:int, path:str) -> int:
+    """Status of a GET request, None if the server does not answer."""
+    try:
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        connection.request("GET", path)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    except OSError:
+        return None
+
+
+def boot(root:pathlib.Path, environment:dict) -> tuple:
+    """Seconds until a gunicorn worker answers, is ready and serves the page layout."""
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', '127.0.0.1:{:d}'.format(port),
+         '--workers', '1', '--log-level', 'warning', 'app:server'],
+        cwd=str(root), env=environment,
+    )
+    try:
+        answered = ready = None
+        while ready is None:
+            if server.poll() is not None:
+                raise ValueError("The server exited before being ready!!")
+            if time.perf_counter() - start > 600:
+                raise ValueError("The server did not answer in time!!")
+            code = status(port, "/ready")
+            if code is not None and answered is None:
+                answered = time.perf_counter() - start
+            if code == 200:
+                ready = time.perf_counter() - start
+            else:
+                time.sleep(0.01)
+        if status(port, "/_dash-layout") != 200:
+            raise ValueError("The server did not serve the layout!!")
+        return answered, ready, time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    root = pathlib.Path(__file__).resolve().parent.parent
+    with tempfile.TemporaryDirectory() as folder:
+        data_file = write_csv(os.path.join(folder, 'synthetic.csv'), args.scale)
+        base = dict(os.environ, REFRESH_INTERVAL="0", PREWARM_FIGURES="0")
+
+        # The data is loaded in the background so that the import alone is measured
+        total, children, modules = import_times(root, dict(base, DATA_FILE=data_file, BACKGROUND_LOAD="1"))
+        print("{:<30} {:>14}".format('import', 'cumulative (ms)'))
+        for name, cumulative in sorted(children.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+            print("{:<30} {:>14.1f}".format(name, cumulative))
+        print("{:<30} {:>14.1f}".format('app (total)', total))
+        for name in DEFERRED:
+            print("{:<30} {:>14}".format(name, 'imported' if name in modules else 'deferred'))
+
+        print()
+        print("{:<11} {:>12} {:>10} {:>15}".format('mode', 'answers (s)', 'ready (s)', 'first page (s)'))
+        for mode, environment in MODES:
+            timings = []
+            for run in range(args.repeat):
+                # A new copy of the data file per boot, without any binary cache
+                copy = os.path.join(folder, '{:s}_{:d}.csv'.format(mode, run))
+                with open(data_file, 'rb') as source, open(copy, 'wb') as target:
+                    target.write(source.read())
+                timings.append(boot(root, dict(base, DATA_FILE=copy, **environment)))
+            answered, ready, first = (statistics.median(column) for column in zip(*timings))
+            print("{:<11} {:>12.3f} {:>10.3f} {:>15.3f}".format(mode, answered, ready, first))
+
+
+if __name__ == '__main__':
+    main()
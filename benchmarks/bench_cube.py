@@ -0,0 +1,94 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - Cube benchmark                                         #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+"""Compares the time needed by the callbacks to slice the data using boolean
+masks over the whole data frame (as the callbacks used to) against the lookups
+over the DataCube, on synthetic extracts enlarged with additional years.
+
+Usage:
+    python benchmarks/bench_cube.py [--scales 1 10 100] [--repeat 50]
+"""
+
+import argparse
+import pathlib
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from cube import DataCube, TOTAL
+from data import format_data
+from synthetic import make_raw, median_time
+
+###################################################################################################
+#                                                                                                 #
+#                                            FUNCTIONS                                            #
+#                                                                                                 #
+###################################################################################################
+
+def mask_slices(data:pd.DataFrame, bmi:str, year:int) -> dict:
+    """Slices used by the callbacks, computed with boolean masks."""
+    return {
+        'map': lambda: data[(data.age == TOTAL) & (data.sex == TOTAL) & (data.isced11 == TOTAL) & (data.bmi == bmi) & (data.TIME_PERIOD == year)],
+        'sex': lambda: data[(data.bmi == bmi) & (data.TIME_PERIOD == year) & (data.isced11 == TOTAL) & (data.age == TOTAL) & (data.sex != TOTAL)],
+        'age': lambda: data[(data.bmi == bmi) & (data.TIME_PERIOD == year) & (data.sex == TOTAL) & (data.isced11 == TOTAL) & (data.age != TOTAL)],
+        'education': lambda: data[(data.bmi == bmi) & (data.TIME_PERIOD == year) & (data.sex == TOTAL) & (data.age == TOTAL) & (data.isced11 != TOTAL)],
+        'trend': lambda: data[(data.bmi == bmi) & (data.age == TOTAL) & (data.sex == TOTAL) & (data.isced11 == TOTAL)],
+        'wind rose': lambda: data[(data.TIME_PERIOD == year) & (data.sex == TOTAL) & (data.age == TOTAL) & (data.isced11 == TOTAL)],
+    }
+
+
+def cube_slices(cube:DataCube, bmi:str, year:int) -> dict:
+    """Slices used by the callbacks, computed with the DataCube."""
+    return {
+        'map': lambda: cube.lookup(bmi=bmi, TIME_PERIOD=year, isced11=TOTAL, sex=TOTAL, age=TOTAL),
+        'sex': lambda: cube.lookup(bmi=bmi, TIME_PERIOD=year, isced11=TOTAL, age=TOTAL, sex=cube.breakdown('sex')),
+        'age': lambda: cube.lookup(bmi=bmi, TIME_PERIOD=year, sex=TOTAL, isced11=TOTAL, age=cube.breakdown('age')),
+        'education': lambda: cube.lookup(bmi=bmi, TIME_PERIOD=year, sex=TOTAL, age=TOTAL, isced11=cube.breakdown('isced11')),
+        'trend': lambda: cube.lookup(bmi=bmi, age=TOTAL, sex=TOTAL, isced11=TOTAL),
+        'wind rose': lambda: cube.lookup(TIME_PERIOD=year, sex=TOTAL, age=TOTAL, isced11=TOTAL),
+    }
+
+
+def same_rows(masked:pd.DataFrame, looked_up:pd.DataFrame) -> bool:
+    """Checks that both slices hold the same observations."""
+    columns = ['bmi', 'isced11', 'sex', 'age', 'alpha3', 'TIME_PERIOD', 'OBS_VALUE']
+    left = masked[columns].astype(str).sort_values(columns).reset_index(drop=True)
+    right = looked_up[columns].astype(str).sort_values(columns).reset_index(drop=True)
+    return left.equals(right)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    print("{:>6} {:>9} {:<10} {:>10} {:>10} {:>8}".format('scale', 'rows', 'slice', 'mask (ms)', 'cube (ms)', 'speedup'))
+    for scale in args.scales:
+        raw = make_raw(scale)
+        data = format_data(raw.drop(['DATAFLOW', 'LAST UPDATE', 'OBS_FLAG', 'freq', 'unit'], axis=1))
+        cube = DataCube(data)
+        bmi, year = cube.levels['bmi'][0], cube.levels['TIME_PERIOD'][0]
+
+        masked, looked_up = mask_slices(data, bmi, year), cube_slices(cube, bmi, year)
+        for name in masked:
+            if not same_rows(masked[name](), looked_up[name]()):
+                raise AssertionError("The slice '{:s}' differs between both implementations!!".format(name))
+            before = median_time(masked[name], args.repeat)
+            after = median_time(looked_up[name], args.repeat)
+            print("{:>6} {:>9} {:<10} {:>10.3f} {:>10.3f} {:>7.1f}x".format(scale, len(data), name, before, after, before / after))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - Figures benchmark                                      #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+"""Compares, for each chart_dropdown option and for the map, the time needed to
+build a figure with plotly express (validating it and mutating its layout key
+by key, as the callbacks used to) and serialize it, against the templates of
+figures.py, which emit plain dictionaries.
+
+Usage:
+    python benchmarks/bench_figures.py [--countries 10] [--repeat 30]
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import sys
+
+import plotly.express as px
+import plotly.io as pio
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from cube import TOTAL, DataCube
+from data import format_data
+from figures import HISTOGRAM_CHARTS, histogram_column, render_map, render_selected_data, style_chart
+from geo import GeoCache, MAP_HEIGHT, load_geojson
+from rollup import Rollups
+from synthetic import CHARTS, make_raw, median_time
+
+###################################################################################################
+#                                                                                                 #
+#                                            FUNCTIONS                                            #
+#                                                                                                 #
+###################################################################################################
+
+def express_map(cube:DataCube, geo_cache:GeoCache, bmi:str, year:int):
+    """The map, built with plotly express."""
+    totals = cube.lookup(bmi=bmi, TIME_PERIOD=year, isced11=TOTAL, sex=TOTAL, age=TOTAL)
+    fig = px.choropleth(totals, geojson=geo_cache.pick(totals.alpha3), color="OBS_VALUE", locations="alpha3",
+    featureidkey="properties.iso_a3", range_color=[totals.OBS_VALUE.min(), totals.OBS_VALUE.max()])
+    fig.update_geos(fitbounds="locations", visible=True)
+    fig.update_layout(margin={"r":0,"t":0,"l":0,"b":0}, height=MAP_HEIGHT, paper_bgcolor="#F4F4F8", dragmode="select")
+    return fig
+
+
+def express_chart(cube:DataCube, sel_countries:list, chart_dropdown:int, year:int, bmi:str):
+    """A chart of the selected countries, built with plotly express."""
+    if chart_dropdown in HISTOGRAM_CHARTS:
+        column = histogram_column(cube, chart_dropdown)
+        selectors = dict(bmi=bmi, TIME_PERIOD=year, isced11=TOTAL, age=TOTAL, sex=TOTAL)
+        selectors[column] = cube.breakdown(column)
+        filtered = cube.lookup(**selectors)
+    elif chart_dropdown == 4:
+        filtered = cube.lookup(bmi=bmi, age=TOTAL, sex=TOTAL, isced11=TOTAL)
+    else:
+        filtered = cube.lookup(TIME_PERIOD=year, sex=TOTAL, age=TOTAL, isced11=TOTAL)
+    filtered = filtered[filtered.alpha3.isin(sel_countries)]
+
+    if chart_dropdown in HISTOGRAM_CHARTS:
+        fig = px.histogram(filtered, x="OBS_VALUE", y="country", color=column)
+    elif chart_dropdown == 4:
+        fig = px.area(filtered, y="OBS_VALUE", x="TIME_PERIOD", color="country")
+    else:
+        fig = px.bar_polar(filtered, r="OBS_VALUE", theta="country", color="bmi", color_discrete_sequence=px.colors.sequential.Plasma_r, title="")
+    style_chart(fig, chart_dropdown)
+    return fig
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--countries', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=30)
+    args = parser.parse_args()
+
+    cube = DataCube(format_data(make_raw(1).drop(['DATAFLOW', 'LAST UPDATE', 'OBS_FLAG', 'freq', 'unit'], axis=1)))
+    rollups = Rollups(cube)
+    geo_cache = GeoCache(load_geojson(os.path.join(pathlib.Path(__file__).resolve().parent.parent, 'europe.geo.json')), cube.levels['alpha3'])
+    sel_countries = list(cube.levels['alpha3'][:args.countries])
+    bmi, year = cube.levels['bmi'][0], cube.levels['TIME_PERIOD'][0]
+
+    renders = {'map': (
+        lambda: pio.to_json(express_map(cube, geo_cache, bmi, year), validate=False),
+        lambda: pio.to_json(render_map(rollups, geo_cache, bmi, year), validate=False),
+    )}
+    for chart_dropdown, name in CHARTS.items():
+        renders[name] = (
+            lambda chart=chart_dropdown: pio.to_json(express_chart(cube, sel_countries, chart, year, bmi), validate=False),
+            lambda chart=chart_dropdown: pio.to_json(render_selected_data(rollups, sel_countries, chart, year, bmi), validate=False),
+        )
+
+    print("{:<10} {:>8} {:>15} {:>15} {:>8}".format('figure', 'traces', 'express (ms)', 'template (ms)', 'speedup'))
+    for name, (express, template) in renders.items():
+        traces = json.loads(template())['data']
+        if [trace.get('name') for trace in json.loads(express())['data']] != [trace.get('name') for trace in traces]:
+            raise AssertionError("The figure '{:s}' differs between both implementations!!".format(name))
+        before, after = median_time(express, args.repeat), median_time(template, args.repeat)
+        print("{:<10} {:>8} {:>15.3f} {:>15.3f} {:>7.1f}x".format(name, len(traces), before, after, before / after))
+
+
+if __name__ == '__main__':
+    main()
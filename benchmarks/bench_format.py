@@ -0,0 +1,91 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - Format benchmark                                       #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+"""Compares the cold start of the dashboard (reading and formatting the extract)
+using the former row by row translation against the vectorized format_data,
+reporting the parse time and the memory used by the resulting data frame.
+
+Usage:
+    python benchmarks/bench_format.py [--scales 1 10 100] [--repeat 3]
+"""
+
+import argparse
+import os
+import pathlib
+import statistics
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from data import (AGE_TRANSLATION, ALPHA3_TRANSLATION, BMI_TRANSLATION, COUNTRY_TRANSLATION, DROPPED_AGES, DROPPED_GEO,
+                  EDUCATION_TRANSLATION, GENDER_TRANSLATION, format_data, translate_value)
+from synthetic import write_csv
+
+###################################################################################################
+#                                                                                                 #
+#                                            FUNCTIONS                                            #
+#                                                                                                 #
+###################################################################################################
+
+def legacy_format_data(data:pd.DataFrame) -> pd.DataFrame:
+    """format_data as it was before being vectorized."""
+    data = data.dropna(subset=['OBS_VALUE'])
+    for geo in DROPPED_GEO:
+        data = data[data.geo != geo]
+    for age in DROPPED_AGES:
+        data = data[data.age != age]
+    data['sex'] = data.sex.apply(lambda x: translate_value(x, GENDER_TRANSLATION))
+    data['bmi'] = data.bmi.apply(lambda x: translate_value(x, BMI_TRANSLATION))
+    data['isced11'] = data.isced11.apply(lambda x: translate_value(x, EDUCATION_TRANSLATION))
+    data['age'] = data.age.apply(lambda x: translate_value(x, AGE_TRANSLATION))
+    data['country'] = data.geo.apply(lambda x: translate_value(x, COUNTRY_TRANSLATION))
+    data['alpha3'] = data.geo.apply(lambda x: translate_value(x, ALPHA3_TRANSLATION))
+    return data.drop(['geo'], axis=1)
+
+
+def load(data_file:str, formatter) -> pd.DataFrame:
+    """read_data using the given formatter."""
+    data = pd.read_csv(data_file)
+    data = data.drop(['DATAFLOW', 'LAST UPDATE', 'OBS_FLAG', 'freq', 'unit'], axis=1)
+    return formatter(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print("{:>6} {:>9} {:<10} {:>10} {:>11}".format('scale', 'rows', 'format', 'parse (s)', 'frame (MB)'))
+    with tempfile.TemporaryDirectory() as folder:
+        for scale in args.scales:
+            data_file = write_csv(os.path.join(folder, 'synthetic_{:d}.csv'.format(scale)), scale)
+            results = {}
+            for name, formatter in [('legacy', legacy_format_data), ('vectorized', format_data)]:
+                timings = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    results[name] = load(data_file, formatter)
+                    timings.append(time.perf_counter() - start)
+                memory = results[name].memory_usage(deep=True).sum() / 2 ** 20
+                print("{:>6} {:>9} {:<10} {:>10.3f} {:>11.2f}".format(scale, len(results[name]), name, statistics.median(timings), memory))
+
+            if not results['legacy'].astype(str).equals(results['vectorized'].astype(str)):
+                raise AssertionError("Both formatters returned different data!!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - HTTP benchmark                                         #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+"""Reports the bytes sent on the wire and the server CPU time (median) per request for
+the figures of the callbacks, without compression (COMPRESSION=0), with
+compression but without the cache of compressed bodies
+(COMPRESSION_CACHE_MAX_BYTES=0) and with both, for a browser accepting Brotli
+and for one accepting gzip only.
+
+The app is started in a subprocess for each mode. Every map (one per year and
+BMI level) and every chart of a selection is requested once without
+compression to fill the figure cache, then twice more: the first pass
+measures the compression of new bodies and the second one the repeated clicks. A conditional request of the
+layout tells whether it is answered with a 304.
+
+Usage:
+    python benchmarks/bench_http.py
+"""
+
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from synthetic import write_csv
+
+###################################################################################################
+#                                                                                                 #
+#                                            CONSTANTS                                            #
+#                                                                                                 #
+###################################################################################################
+
+# Environment and Accept-Encoding header of each mode
+MODES = [
+    ("identity", {"COMPRESSION": "0"}, "gzip, deflate, br"),
+    ("br", {"COMPRESSION": "1", "COMPRESSION_CACHE_MAX_BYTES": "0"}, "gzip, deflate, br"),
+    ("br+cache", {"COMPRESSION": "1"}, "gzip, deflate, br"),
+    ("gzip", {"COMPRESSION": "1", "COMPRESSION_CACHE_MAX_BYTES": "0"}, "gzip"),
+    ("gzip+cache", {"COMPRESSION": "1"}, "gzip"),
+]
+
+# Run within the subprocess, prints the measurements of each pass
+HTTP_SCRIPT = """
+import json, statistics, sys, time
+import app
+
+accept_encoding = sys.argv[1]
+client = app.server.test_client()
+selection = {"points": [{"location": str(code)} for code in app.datasets.get().cube.levels["alpha3"][:8]]}
+
+def value(name, content):
+    return {"id": name.split(".")[0], "property": name.split(".")[1], "value": content}
+
+requests = []
+for year in app.datasets.get().years.tolist():
+    for bmi in app.datasets.get().bmi_values.tolist():
+        requests.append({"output": "map.figure", "outputs": {"id": "map", "property": "figure"},
+                         "inputs": [value("bmi-radio.value", bmi), value("years-radio.value", year), value("dataset-dropdown.value", None)],
+                         "changedPropIds": ["years-radio.value"], "state": []})
+        for chart in range(1, 6):
+            requests.append({"output": "selected-data.figure", "outputs": {"id": "selected-data", "property": "figure"},
+                             "inputs": [value("map.selectedData", selection), value("chart-dropdown.value", chart),
+                                        value("years-radio.value", year), value("bmi-radio.value", bmi),
+                                        value("dataset-dropdown.value", None)],
+                             "changedPropIds": ["chart-dropdown.value"], "state": []})
+
+results = {}
+for name, encoding in [("warm-up", "identity"), ("first", accept_encoding), ("repeated", accept_encoding)]:
+    for figure in ["map", "selected-data"]:
+        sent = [body for body in requests if body["outputs"]["id"] == figure]
+        wire, cpu = 0, []
+        for body in sent:
+            start = time.process_time()
+            response = client.post("/_dash-update-component", json=body, headers={"Accept-Encoding": encoding})
+            cpu.append(time.process_time() - start)
+            assert response.status_code == 200
+            wire += len(response.data)
+        results[name + " " + figure] = {"bytes": wire / len(sent), "cpu": statistics.median(cpu) * 1000}
+
+layout = client.get("/_dash-layout", headers={"Accept-Encoding": accept_encoding})
+etag = layout.headers.get("ETag")
+conditional = client.get("/_dash-layout", headers={"Accept-Encoding": accept_encoding, "If-None-Match": etag or ""})
+results["layout"] = {"bytes": len(layout.data), "status": conditional.status_code}
+print(json.dumps(results))
+"""
+
+###################################################################################################
+#                                                                                                 #
+#                                            FUNCTIONS                                            #
+#                                                                                                 #
+###################################################################################################
+
+def run(data_file:str, environment:dict, accept_encoding:str) -> dict:
+    """Measurements of the app started with the given environment."""
+    environment = dict(os.environ, DATA_FILE=data_file, REFRESH_INTERVAL="0", **environment)
+    output = subprocess.run(
+        [sys.executable, "-c", HTTP_SCRIPT, accept_encoding],
+        cwd=str(pathlib.Path(__file__).resolve().parent.parent), env=environment,
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    with tempfile.TemporaryDirectory() as folder:
+        data_file = write_csv(os.path.join(folder, "synthetic_1.csv"), 1)
+        print("{:<11} {:<14} {:>13} {:>14} {:>15} {:>16}".format(
+            "mode", "figure", "bytes (new)", "cpu ms (new)", "bytes (again)", "cpu ms (again)"))
+        layouts = []
+        for mode, environment, accept_encoding in MODES:
+            result = run(data_file, environment, accept_encoding)
+            for figure in ["map", "selected-data"]:
+                first, repeated = result["first " + figure], result["repeated " + figure]
+                print("{:<11} {:<14} {:>13,.0f} {:>14.3f} {:>15,.0f} {:>16.3f}".format(
+                    mode, figure, first["bytes"], first["cpu"], repeated["bytes"], repeated["cpu"]))
+            layouts.append((mode, result["layout"]))
+
+        print()
+        print("{:<11} {:>13} {:>16}".format("mode", "layout bytes", "conditional GET"))
+        for mode, layout in layouts:
+            print("{:<11} {:>13,} {:>16}".format(mode, layout["bytes"], layout["status"]))
+
+
+if __name__ == "__main__":
+    main()
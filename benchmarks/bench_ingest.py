@@ -0,0 +1,117 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - Ingestion benchmark                                    #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+"""Compares reading the whole extract at once (the former read_data) against the
+chunked stream_data, reporting the peak RSS of the process and the throughput
+(raw rows per second) for growing file sizes. Each run happens in a fresh
+process so that the peaks do not add up.
+
+Usage:
+    python benchmarks/bench_ingest.py [--scales 1 10 50] [--chunksize 100000]
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from data import format_data, stream_data
+from synthetic import write_csv
+
+###################################################################################################
+#                                                                                                 #
+#                                            FUNCTIONS                                            #
+#                                                                                                 #
+###################################################################################################
+
+def whole_data(data_file:str, chunksize:int) -> pd.DataFrame:
+    """read_data as it was before reading the file by chunks."""
+    data = pd.read_csv(data_file)
+    data = data.drop(['DATAFLOW', 'LAST UPDATE', 'OBS_FLAG', 'freq', 'unit'], axis=1)
+    return format_data(data)
+
+
+READERS = {'whole': whole_data, 'stream': stream_data}
+
+
+def peak_rss() -> float:
+    """Peak resident memory (MB) of the current process, from /proc (ru_maxrss survives exec)."""
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 2 ** 10
+    raise ValueError("VmHWM not found within /proc/self/status!!")
+
+
+def run(reader:str, data_file:str, chunksize:int):
+    """Child process: reads the file and prints its measurements as JSON."""
+    start = time.perf_counter()
+    data = READERS[reader](data_file, chunksize)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        'seconds': elapsed,
+        'peak_rss': peak_rss(),
+        'rows': len(data),
+        'checksum': float(data.OBS_VALUE.sum()),
+    }))
+
+
+def measure(reader:str, data_file:str, chunksize:int) -> dict:
+    """Runs a reader in a fresh process and returns its measurements."""
+    output = subprocess.run(
+        [sys.executable, __file__, '--run', reader, data_file, '--chunksize', str(chunksize)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--chunksize', type=int, default=100000)
+    parser.add_argument('--run', nargs=2, metavar=('READER', 'FILE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run(args.run[0], args.run[1], args.chunksize)
+        return
+
+    print("{:>6} {:>10} {:>10} {:<7} {:>9} {:>14} {:>10}".format('scale', 'file (MB)', 'raw rows', 'reader', 'time (s)', 'rows/s', 'peak (MB)'))
+    with tempfile.TemporaryDirectory() as folder:
+        for scale in args.scales:
+            data_file = write_csv(os.path.join(folder, 'synthetic_{:d}.csv'.format(scale)), scale)
+            size = os.path.getsize(data_file) / 2 ** 20
+            with open(data_file, 'rb') as source:
+                raw_rows = sum(1 for _ in source) - 1
+
+            results = {}
+            for reader in READERS:
+                results[reader] = measure(reader, data_file, args.chunksize)
+                print("{:>6} {:>10.1f} {:>10} {:<7} {:>9.2f} {:>14,.0f} {:>10.1f}".format(
+                    scale, size, raw_rows, reader, results[reader]['seconds'],
+                    raw_rows / results[reader]['seconds'], results[reader]['peak_rss']))
+
+            if (results['whole']['rows'], results['whole']['checksum']) != (results['stream']['rows'], results['stream']['checksum']):
+                raise AssertionError("Both readers returned different data!!")
+            os.remove(data_file)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - Large selection benchmark                              #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+"""Compares the charts built for a growing number of selected countries drawing
+every one of them against the large-selection mode of render_selected_data
+(top countries plus an 'Others' bucket, WebGL trend and capped number of
+points): time to build and serialize each chart and size of its JSON payload.
+
+Usage:
+    python benchmarks/bench_large.py [--countries 8 64 256] [--years 10] [--repeat 10]
+"""
+
+import argparse
+import json
+import pathlib
+import sys
+
+import plotly.io as pio
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from cube import DataCube
+from figures import MAX_POINTS, TOP_COUNTRIES, render_selected_data
+from rollup import Rollups
+from synthetic import CHARTS, make_formatted, median_time
+
+###################################################################################################
+#                                                                                                 #
+#                                            CONSTANTS                                            #
+#                                                                                                 #
+###################################################################################################
+
+# Every country drawn at every point
+EXACT = {'large_selection': sys.maxsize, 'max_points': sys.maxsize}
+
+# Countries above which the large-selection mode is used (disabled by default in the app)
+LARGE_SELECTION = 15
+
+# Large-selection mode as enabled with LARGE_SELECTION=15 and the other defaults of the app
+LARGE = {'large_selection': LARGE_SELECTION, 'top_countries': TOP_COUNTRIES, 'max_points': MAX_POINTS}
+
+###################################################################################################
+#                                                                                                 #
+#                                            FUNCTIONS                                            #
+#                                                                                                 #
+###################################################################################################
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--countries', type=int, nargs='+', default=[8, 64, 256])
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    print("{:>9} {:<10} {:>10} {:>10} {:>11} {:>11} {:>8} {:>8}".format(
+        'countries', 'chart', 'exact (ms)', 'large (ms)', 'exact (KB)', 'large (KB)', 'traces', 'points'))
+    for countries in args.countries:
+        cube = DataCube(make_formatted(countries, args.years))
+        rollups = Rollups(cube)
+        sel_countries = set(cube.levels['alpha3'])
+        bmi, year = cube.levels['bmi'][0], cube.levels['TIME_PERIOD'][0]
+
+        for chart_dropdown, name in CHARTS.items():
+            exact = lambda: pio.to_json(render_selected_data(rollups, sel_countries, chart_dropdown, year, bmi, **EXACT), validate=False)
+            large = lambda: pio.to_json(render_selected_data(rollups, sel_countries, chart_dropdown, year, bmi, **LARGE), validate=False)
+
+            traces = json.loads(large())['data']
+            points = sum(len(trace.get('x', trace.get('r', []))) for trace in traces)
+            if points > MAX_POINTS:
+                raise AssertionError("The chart '{:s}' has more than {:d} points!!".format(name, MAX_POINTS))
+            if countries <= LARGE_SELECTION and exact() != large():
+                raise AssertionError("The chart '{:s}' of a small selection differs from the exact one!!".format(name))
+
+            print("{:>9} {:<10} {:>10.3f} {:>10.3f} {:>11.1f} {:>11.1f} {:>8} {:>8}".format(
+                countries, name, median_time(exact, args.repeat), median_time(large, args.repeat),
+                len(exact()) / 1024, len(large()) / 1024, len(traces), points))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - Load test                                              #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+"""Local load test of the app served by gunicorn (with gunicorn.conf.py) on a
+free port of the loopback interface, with the default sync workers and with
+the threaded workers building the figures within the callbacks and with the
+threaded workers and the bounded render pool.
+
+Closed-loop clients send chart requests for random selections of countries
+(so that most figures miss the cache) during a fixed time at increasing
+concurrency. Throughput and latency percentiles are reported for the answered
+requests, along with the share of requests rejected with a 503.
+
+Usage:
+    python benchmarks/bench_load.py [--concurrency 1 4 16 64] [--seconds 5] [--workers 2]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import pathlib
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from synthetic import write_csv
+
+###################################################################################################
+#                                                                                                 #
+#                                            CONSTANTS                                            #
+#                                                                                                 #
+###################################################################################################
+
+# Environment of each mode, the pool one runs with the defaults shipped
+MODES = [
+    ("sync", {"GUNICORN_WORKER_CLASS": "sync", "GUNICORN_THREADS": "1"}),
+    ("gthread", {"GUNICORN_WORKER_CLASS": "gthread", "GUNICORN_THREADS": "8", "RENDER_THREADS": "0"}),
+    ("pool", {}),
+]
+
+# Locations the clients select from
+LOCATIONS = ["BEL", "BGR", "CZE", "DNK", "DEU", "EST", "IRL", "GRC", "ESP", "FRA", "HRV", "ITA", "CYP", "LVA", "LTU", "LUX",
+             "HUN", "MLT", "NLD", "AUT", "POL", "PRT", "ROU", "SVN", "SVK", "FIN", "SWE", "ISL", "NOR", "GBR", "SRB", "TUR"]
+
+###################################################################################################
+#                                                                                                 #
+#                                            FUNCTIONS                                            #
+#                                                                                                 #
+###################################################################################################
+
+def free_port() -> int:
+    """A free port of the loopback interface."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def chart_request(rng:random.Random, years:list, bmi_values:list) -> bytes:
+    """Body of a chart request for a random selection."""
+    def value(name, content):
+        return {"id": name.split(".")[0], "property": name.split(".")[1], "value": content}
+    selection = {"points": [{"location": code} for code in rng.sample(LOCATIONS, rng.randint(2, len(LOCATIONS)))]}
+    return json.dumps({
+        "output": "selected-data.figure",
+        "outputs": {"id": "selected-data", "property": "figure"},
+        "inputs": [value("map.selectedData", selection), value("chart-dropdown.value", rng.randint(1, 5)),
+                   value("years-radio.value", rng.choice(years)), value("bmi-radio.value", rng.choice(bmi_values)),
+                   value("dataset-dropdown.value", None)],
+        "changedPropIds": ["chart-dropdown.value"],
+        "state": [],
+    }).encode()
+
+
+def client(port:int, deadline:float, seed:int, years:list, bmi_values:list, results:list):
+    """Closed-loop client: sends requests until the deadline, recording (status, seconds)."""
+    rng = random.Random(seed)
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    while time.perf_counter() < deadline:
+        body = chart_request(rng, years, bmi_values)
+        start = time.perf_counter()
+        try:
+            connection.request("POST", "/_dash-update-component", body, {"Content-Type": "application/json"})
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+            status = 0
+        results.append((status, time.perf_counter() - start))
+
+
+def wait_ready(port:int, server:subprocess.Popen) -> dict:
+    """Waits for the server to answer and returns its layout."""
+    for _ in range(600):
+        if server.poll() is not None:
+            raise ValueError("The server exited before being ready!!")
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            connection.request("GET", "/_dash-layout")
+            return json.loads(connection.getresponse().read())
+        except OSError:
+            time.sleep(0.1)
+    raise ValueError("The server did not answer in time!!")
+
+
+def find_options(layout, component:str) -> list:
+    """Options of a component of the layout."""
+    if isinstance(layout, dict):
+        if layout.get("props", {}).get("id") == component:
+            return layout["props"]["options"]
+        for child in layout.values():
+            found = find_options(child, component)
+            if found is not None:
+                return found
+    elif isinstance(layout, list):
+        for child in layout:
+            found = find_options(child, component)
+            if found is not None:
+                return found
+    return None
+
+
+def percentile(values:list, quantile:float) -> float:
+    """Percentile of some values (nearest rank)."""
+    ordered = sorted(values)
+    return ordered[min(int(quantile * len(ordered)), len(ordered) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64])
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    root = pathlib.Path(__file__).resolve().parent.parent
+    print("{:<8} {:>11} {:>9} {:>9} {:>9} {:>9} {:>9}".format('mode', 'concurrency', 'req/s', 'p50 (ms)', 'p99 (ms)', '503 (%)', 'errors'))
+    with tempfile.TemporaryDirectory() as folder:
+        data_file = write_csv(os.path.join(folder, 'synthetic_1.csv'), 1)
+        for mode, environment in MODES:
+            port = free_port()
+            environment = dict(os.environ, DATA_FILE=data_file, REFRESH_INTERVAL="0", **environment)
+            server = subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', '127.0.0.1:{:d}'.format(port),
+                 '--workers', str(args.workers), '--log-level', 'warning', 'app:server'],
+                cwd=str(root), env=environment,
+            )
+            try:
+                layout = wait_ready(port, server)
+                years, bmi_values = find_options(layout, 'years-radio'), find_options(layout, 'bmi-radio')
+                for concurrency in args.concurrency:
+                    results = []
+                    deadline = time.perf_counter() + args.seconds
+                    clients = [threading.Thread(target=client, args=(port, deadline, seed, years, bmi_values, results)) for seed in range(concurrency)]
+                    for thread in clients:
+                        thread.start()
+                    for thread in clients:
+                        thread.join()
+
+                    answered = [seconds for status, seconds in results if status == 200]
+                    rejected = sum(1 for status, _ in results if status == 503)
+                    errors = sum(1 for status, _ in results if status not in (200, 503))
+                    print("{:<8} {:>11} {:>9.1f} {:>9.1f} {:>9.1f} {:>9.1f} {:>9}".format(
+                        mode, concurrency, len(answered) / args.seconds,
+                        statistics.median(answered) * 1000 if answered else float('nan'),
+                        percentile(answered, 0.99) * 1000 if answered else float('nan'),
+                        100 * rejected / max(len(results), 1), errors))
+            finally:
+                server.terminate()
+                server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - Dataset registry benchmark                             #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+"""Serves several synthetic datasets (alternately shaped as each BMI indicator,
+with different values) from one DatasetRegistry under a memory budget, cycling
+over them as the callbacks would: time of the requests loading a cold dataset
+and of the ones finding it loaded, evictions and memory taken by the datasets
+loaded. Checks that every cube shares the levels of the dimensions it has in
+common with the others.
+
+Usage:
+    python benchmarks/bench_registry.py [--datasets 6] [--scale 2] [--budget 4] [--rounds 3]
+"""
+
+import argparse
+import os
+import pathlib
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from data import INDICATORS
+from geo import load_geojson
+from registry import DatasetRegistry
+from synthetic import write_csv
+
+###################################################################################################
+#                                                                                                 #
+#                                            FUNCTIONS                                            #
+#                                                                                                 #
+###################################################################################################
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--datasets', type=int, default=6)
+    parser.add_argument('--scale', type=int, default=2)
+    parser.add_argument('--budget', type=int, default=4, help="datasets that fit within the memory budget")
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    root = pathlib.Path(__file__).resolve().parent.parent
+    geojson = load_geojson(os.path.join(root, 'europe.geo.json'))
+    with tempfile.TemporaryDirectory() as folder:
+        indicators = list(INDICATORS)
+        sources = {'indicator-{:d}'.format(number): write_csv(os.path.join(folder, 'indicator_{:d}.csv'.format(number)), args.scale, seed=number,
+                                                              indicator=indicators[number % len(indicators)])
+                   for number in range(args.datasets)}
+
+        # Budget measured over the first dataset, not shared between processes so that every load parses its file
+        probe = DatasetRegistry(sources, geojson, shared=False, interval=0)
+        budget = args.budget * probe.stats()['bytes']
+        registry = DatasetRegistry(sources, geojson, max_bytes=budget, shared=False, interval=0)
+
+        cold, hot = [], []
+        for _ in range(args.rounds):
+            for name in registry.names:
+                loaded = registry.stats()['datasets'][name]['loaded']
+                start = time.perf_counter()
+                dataset = registry.get(name)
+                (hot if loaded else cold).append(time.perf_counter() - start)
+
+                first = registry.get()
+                for dimension in set(dataset.cube.dimensions) & set(first.cube.dimensions):
+                    if dataset.cube.levels[dimension] is not first.cube.levels[dimension]:
+                        raise AssertionError("The levels of '{:s}' are not shared between the cubes!!".format(dimension))
+
+        stats = registry.stats()
+        print("{:>9} {:>8} {:>12} {:>12} {:>10} {:>10} {:>11} {:>11}".format(
+            'datasets', 'budget', 'cold (ms)', 'hot (ms)', 'loads', 'evictions', 'loaded (MB)', 'budget (MB)'))
+        print("{:>9} {:>8} {:>12.2f} {:>12.4f} {:>10} {:>10} {:>11.2f} {:>11.2f}".format(
+            args.datasets, args.budget, statistics.median(cold) * 1000, statistics.median(hot) * 1000 if hot else float('nan'),
+            stats['loads'], stats['evictions'], stats['bytes'] / 2 ** 20, budget / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - Rollups benchmark                                      #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+"""Compares the figures built by slicing the cube on every request (as
+render_map and render_selected_data used to) against the ones built from the
+rollups materialized once per version of the data, reporting the latency for
+the map and each chart_dropdown value.
+
+Both implementations must return the very same figures, which is checked for
+every chart over several selections (including locations unknown to the data,
+an empty selection and BMI levels or years missing from the data).
+
+Usage:
+    python benchmarks/bench_rollups.py [--countries 32 128] [--years 6 20] [--repeat 30]
+"""
+
+import argparse
+import os
+import pathlib
+import sys
+import time
+
+import numpy as np
+import plotly.io as pio
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from cube import TOTAL, DataCube
+from figures import (AREA_CHART, HISTOGRAM_CHARTS, UNKNOWN_CHART, WIND_ROSE_CHART, chart_template, histogram_column,
+                     map_template, render_map, render_selected_data)
+from geo import MAP_HEIGHT, GeoCache, load_geojson
+from rollup import Rollups
+from synthetic import CHARTS, make_formatted, median_time
+
+###################################################################################################
+#                                                                                                 #
+#                                            CONSTANTS                                            #
+#                                                                                                 #
+###################################################################################################
+
+# Every country drawn at every point, as the filter logic does
+EXACT = {'large_selection': sys.maxsize, 'max_points': sys.maxsize}
+
+###################################################################################################
+#                                                                                                 #
+#                                            FUNCTIONS                                            #
+#                                                                                                 #
+###################################################################################################
+
+def filter_map(cube:DataCube, geo_cache:GeoCache, bmi:str, year:int) -> dict:
+    """render_map as it was before the rollups."""
+    totals = cube.lookup(bmi=bmi, TIME_PERIOD=year, isced11=TOTAL, sex=TOTAL, age=TOTAL)
+    countries = geo_cache.pick(totals.alpha3, MAP_HEIGHT)
+    template = map_template()
+    trace = dict(template['data'][0], geojson=countries, locations=totals.alpha3.to_numpy(), z=totals.OBS_VALUE.to_numpy())
+    layout = dict(template['layout'])
+    layout['coloraxis'] = dict(layout['coloraxis'], cmin=totals.OBS_VALUE.min(), cmax=totals.OBS_VALUE.max())
+    return {'data': [trace], 'layout': layout}
+
+
+def filter_chart(cube:DataCube, sel_countries:set, chart_dropdown:int, year:int, bmi:str) -> dict:
+    """render_selected_data as it was before the rollups."""
+    column = None
+    if chart_dropdown in HISTOGRAM_CHARTS:
+        column = histogram_column(cube, chart_dropdown)
+        selectors = dict(bmi=bmi, TIME_PERIOD=year, isced11=TOTAL, age=TOTAL, sex=TOTAL, alpha3=sel_countries)
+        selectors[column] = cube.breakdown(column)
+        filtered = cube.lookup(**selectors)
+    elif chart_dropdown == AREA_CHART:
+        filtered = cube.lookup(bmi=bmi, age=TOTAL, sex=TOTAL, isced11=TOTAL, alpha3=sel_countries)
+    elif chart_dropdown == WIND_ROSE_CHART:
+        filtered = cube.lookup(TIME_PERIOD=year, sex=TOTAL, age=TOTAL, isced11=TOTAL, alpha3=sel_countries)
+    else:
+        return UNKNOWN_CHART
+
+    template = chart_template(chart_dropdown, column)
+    traces = []
+    for position, (name, group) in enumerate(filtered.groupby(template.column, sort=False)):
+        if chart_dropdown in HISTOGRAM_CHARTS:
+            arrays = {'x': group.OBS_VALUE.to_numpy(), 'y': group.country.to_numpy()}
+        elif chart_dropdown == AREA_CHART:
+            arrays = {'x': group.TIME_PERIOD.to_numpy(), 'y': group.OBS_VALUE.to_numpy()}
+        else:
+            arrays = {'r': group.OBS_VALUE.to_numpy(), 'theta': group.country.to_numpy()}
+        traces.append(template.trace(position, name, arrays))
+
+    if chart_dropdown == 1:
+        axis_title = "Percentage of people with '<b>{0}</b>' BMI by sex (<b>{1}</b>)".format(bmi, year)
+    elif chart_dropdown == 2:
+        axis_title = "Percentage of people with '<b>{0}</b>' BMI by age (<b>{1}</b>)".format(bmi, year)
+    elif chart_dropdown == 3:
+        axis_title = "Percentage of people with '<b>{0}</b>' BMI by education (<b>{1}</b>)".format(bmi, year)
+    elif chart_dropdown == AREA_CHART:
+        axis_title = "Trend for people with '<b>{0}</b>' BMI (2014-2019)".format(bmi)
+    else:
+        axis_title = "Wind rose of all BMIs for year <b>{0}</b>".format(year)
+
+    title = "<b>{0}</b> countries selected".format(len(filtered.country.unique()))
+    return template.render(traces, title, axis_title)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--countries', type=int, nargs='+', default=[32, 128])
+    parser.add_argument('--years', type=int, nargs='+', default=[6, 20])
+    parser.add_argument('--repeat', type=int, default=30)
+    args = parser.parse_args()
+
+    geojson = load_geojson(os.path.join(pathlib.Path(__file__).resolve().parent.parent, 'europe.geo.json'))
+
+    print("{:>9} {:>6} {:<10} {:>12} {:>13} {:>8}".format('countries', 'years', 'figure', 'filter (ms)', 'rollup (ms)', 'speedup'))
+    for countries in args.countries:
+        for years in args.years:
+            data = make_formatted(countries, years)
+            # Some observations are missing, as in the Eurostat extracts
+            data = data[np.random.default_rng(0).random(len(data)) > 0.1]
+            cube = DataCube(data)
+            start = time.perf_counter()
+            rollups = Rollups(cube)
+            build = (time.perf_counter() - start) * 1000
+            geo_cache = GeoCache(geojson, cube.levels['alpha3'])
+            codes = list(cube.levels['alpha3'])
+            bmi, year = cube.levels['bmi'][0], cube.levels['TIME_PERIOD'][0]
+
+            # Consistency of every figure with the former filter logic
+            selections = [set(codes[::2]) | {'XXX'}, set(codes[:3]), set(), set(codes), {'XXX'}]
+            for sel_bmi, sel_year in [(bmi, year), (cube.levels['bmi'][-1], cube.levels['TIME_PERIOD'][-1]), ('Unknown', year), (bmi, 1900)]:
+                if pio.to_json(filter_map(cube, geo_cache, sel_bmi, sel_year), validate=False) != pio.to_json(render_map(rollups, geo_cache, sel_bmi, sel_year), validate=False):
+                    raise AssertionError("The map differs from the one of the filter logic!!")
+                for sel_countries in selections:
+                    for chart_dropdown in list(CHARTS) + [0]:
+                        expected = filter_chart(cube, sel_countries, chart_dropdown, sel_year, sel_bmi)
+                        figure = render_selected_data(rollups, sel_countries, chart_dropdown, sel_year, sel_bmi, **EXACT)
+                        if pio.to_json(expected, validate=False) != pio.to_json(figure, validate=False):
+                            raise AssertionError("The chart {:d} differs from the one of the filter logic!!".format(chart_dropdown))
+
+            sel_countries = selections[0]
+            renders = {'map': (
+                lambda: filter_map(cube, geo_cache, bmi, year),
+                lambda: render_map(rollups, geo_cache, bmi, year),
+            )}
+            for chart_dropdown, name in CHARTS.items():
+                renders[name] = (
+                    lambda chart=chart_dropdown: filter_chart(cube, sel_countries, chart, year, bmi),
+                    lambda chart=chart_dropdown: render_selected_data(rollups, sel_countries, chart, year, bmi, **EXACT),
+                )
+
+            for name, (before_render, after_render) in renders.items():
+                before, after = median_time(before_render, args.repeat), median_time(after_render, args.repeat)
+                print("{:>9} {:>6} {:<10} {:>12.3f} {:>13.3f} {:>7.1f}x".format(countries, years, name, before, after, before / after))
+            print("{:>9} {:>6} {:<10} {:>12} {:>13.3f}".format(countries, years, 'build', '', build))
+
+
+if __name__ == '__main__':
+    main()
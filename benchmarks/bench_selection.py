@@ -0,0 +1,77 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - Selection benchmark                                    #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+"""Compares the selection of the countries dragged over the map done by
+removing every unselected country from the slice, one at a time (as
+display_selected_data used to), against the set based selection resolved
+against the country index of the DataCube. Half of the countries of the data
+are selected, plus as many locations unknown to the data (e.g. non EU regions).
+
+Usage:
+    python benchmarks/bench_selection.py [--countries 32 128 512] [--years 2 20] [--repeat 20]
+"""
+
+import argparse
+import pathlib
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from cube import TOTAL, DataCube
+from synthetic import make_formatted, median_time
+
+###################################################################################################
+#                                                                                                 #
+#                                            FUNCTIONS                                            #
+#                                                                                                 #
+###################################################################################################
+
+def loop_selection(cube:DataCube, sel_countries:set, bmi:str):
+    """Trend slice of the selected countries, removing the other ones one at a time."""
+    filtered = cube.lookup(bmi=bmi, age=TOTAL, sex=TOTAL, isced11=TOTAL)
+    for country in filtered.alpha3.unique():
+        if not country in sel_countries:
+            filtered  = filtered[filtered.alpha3 != country]
+    return filtered
+
+
+def set_selection(cube:DataCube, sel_countries:set, bmi:str):
+    """Trend slice of the selected countries, selected by the cube."""
+    return cube.lookup(bmi=bmi, age=TOTAL, sex=TOTAL, isced11=TOTAL, alpha3=sel_countries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--countries', type=int, nargs='+', default=[32, 128, 512])
+    parser.add_argument('--years', type=int, nargs='+', default=[2, 20])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    print("{:>9} {:>6} {:>9} {:>10} {:>10} {:>9} {:>8}".format('countries', 'years', 'rows', 'selected', 'loop (ms)', 'set (ms)', 'speedup'))
+    for countries in args.countries:
+        for years in args.years:
+            data = make_formatted(countries, years)
+            cube = DataCube(data)
+            codes = cube.levels['alpha3']
+            sel_countries = set(codes[::2]) | {'R{:04d}'.format(region) for region in range(countries // 2)}
+            bmi = cube.levels['bmi'][0]
+
+            if not loop_selection(cube, sel_countries, bmi).reset_index(drop=True).equals(set_selection(cube, sel_countries, bmi)):
+                raise AssertionError("Both selections returned different data!!")
+            before = median_time(lambda: loop_selection(cube, sel_countries, bmi), args.repeat)
+            after = median_time(lambda: set_selection(cube, sel_countries, bmi), args.repeat)
+            print("{:>9} {:>6} {:>9} {:>10} {:>10.3f} {:>9.3f} {:>7.1f}x".format(countries, years, len(data), len(sel_countries), before, after, before / after))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - Session benchmark                                      #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+"""Counts the requests made to the server along a scripted user session, with
+the callbacks running on the server and in clientside mode (CLIENTSIDE_CALLBACKS=1).
+
+The app is started in a subprocess for each mode, its callback graph is read
+from the /_dash-dependencies endpoint (as the browser does) and every server
+callback triggered by the session is sent to /_dash-update-component. The
+initial page load (the page, its layout and dependencies plus the first call of
+every callback) is counted too; the assets are left out as they are cached by
+the browser.
+
+Usage:
+    python benchmarks/bench_session.py
+"""
+
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from synthetic import write_csv
+
+###################################################################################################
+#                                                                                                 #
+#                                            CONSTANTS                                            #
+#                                                                                                 #
+###################################################################################################
+
+# Interactions of the session: the property changed by the user and its new value
+SESSION = [
+    ("map.selectedData", {"points": [{"location": "ESP"}, {"location": "FRA"}, {"location": "PRT"}]}),
+    ("chart-dropdown.value", 2),
+    ("chart-dropdown.value", 3),
+    ("chart-dropdown.value", 4),
+    ("years-radio.value", 2019),
+    ("chart-dropdown.value", 5),
+    ("bmi-radio.value", "Obese"),
+    ("chart-dropdown.value", 1),
+    ("map.selectedData", {"points": [{"location": "DEU"}, {"location": "AUT"}]}),
+    ("years-radio.value", 2014),
+    ("bmi-radio.value", "Normal"),
+    ("chart-dropdown.value", 2),
+]
+
+# Values of the inputs when the page is loaded
+INITIAL_STATE = {
+    "bmi-radio.value": "Normal",
+    "years-radio.value": 2014,
+    "chart-dropdown.value": 1,
+    "map.selectedData": None,
+}
+
+# Run within the subprocess, prints the number of requests of the session
+SESSION_SCRIPT = """
+import json, sys
+import app
+
+session, state = json.loads(sys.argv[1]), json.loads(sys.argv[2])
+client = app.server.test_client()
+requests = 0
+for page in ["/", "/_dash-layout", "/_dash-dependencies"]:
+    response = client.get(page)
+    requests += 1
+callbacks = [callback for callback in response.get_json() if not callback.get("clientside_function")]
+
+def trigger(changed):
+    global requests
+    for callback in callbacks:
+        inputs = [entry["id"] + "." + entry["property"] for entry in callback["inputs"]]
+        if changed is None or changed in inputs:
+            # Callbacks with several outputs are listed as "..id.property...id.property.."
+            multiple = callback["output"].startswith("..")
+            outputs = [dict(zip(("id", "property"), name.split("."))) for name in callback["output"].strip(".").split("...")]
+            states = [entry["id"] + "." + entry["property"] for entry in callback.get("state", [])]
+            body = {
+                "output": callback["output"],
+                "outputs": outputs if multiple else outputs[0],
+                "inputs": [{"id": name.split(".")[0], "property": name.split(".")[1], "value": state.get(name)} for name in inputs],
+                "changedPropIds": [] if changed is None else [changed],
+                "state": [{"id": name.split(".")[0], "property": name.split(".")[1], "value": state.get(name)} for name in states],
+            }
+            assert client.post("/_dash-update-component", json=body).status_code in (200, 204)
+            requests += 1
+
+trigger(None)
+for changed, value in session:
+    state[changed] = value
+    trigger(changed)
+print(json.dumps({"requests": requests, "server_callbacks": len(callbacks)}))
+"""
+
+###################################################################################################
+#                                                                                                 #
+#                                            FUNCTIONS                                            #
+#                                                                                                 #
+###################################################################################################
+
+def run(data_file:str, clientside:bool) -> dict:
+    """Requests made along the session by the app started in the given mode."""
+    environment = dict(os.environ, DATA_FILE=data_file, CLIENTSIDE_CALLBACKS="1" if clientside else "0")
+    output = subprocess.run(
+        [sys.executable, "-c", SESSION_SCRIPT, json.dumps(SESSION), json.dumps(INITIAL_STATE)],
+        cwd=str(pathlib.Path(__file__).resolve().parent.parent), env=environment,
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    with tempfile.TemporaryDirectory() as folder:
+        data_file = write_csv(os.path.join(folder, "synthetic_1.csv"), 1)
+        print("{:<12} {:>17} {:>22}".format("mode", "server callbacks", "requests per session"))
+        for mode, clientside in [("server", False), ("clientside", True)]:
+            result = run(data_file, clientside)
+            print("{:<12} {:>17} {:>22}".format(mode, result["server_callbacks"], result["requests"]))
+
+
+if __name__ == "__main__":
+    main()
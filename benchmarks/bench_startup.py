@@ -0,0 +1,68 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - Startup benchmark                                      #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+"""Compares the time needed to load the data when a worker boots without the
+binary cache (parsing the CSV file) against a warm boot loading the cache
+stored next to the data file by a previous one.
+
+Usage:
+    python benchmarks/bench_startup.py [--scales 1 10 100] [--repeat 3]
+"""
+
+import argparse
+import os
+import pathlib
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from cube import DataCube
+from data import read_data
+from synthetic import write_csv
+
+###################################################################################################
+#                                                                                                 #
+#                                            FUNCTIONS                                            #
+#                                                                                                 #
+###################################################################################################
+
+def boot(data_file:str, cache:bool) -> float:
+    """Time (in seconds) needed to load the data and index it."""
+    start = time.perf_counter()
+    DataCube(read_data(data_file, cache=cache))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print("{:>6} {:>10} {:>10} {:>10} {:>8}".format('scale', 'CSV (MB)', 'cold (s)', 'warm (s)', 'speedup'))
+    with tempfile.TemporaryDirectory() as folder:
+        for scale in args.scales:
+            data_file = write_csv(os.path.join(folder, 'synthetic_{:d}.csv'.format(scale)), scale)
+            cold = statistics.median(boot(data_file, cache=False) for _ in range(args.repeat))
+
+            # The first boot stores the cache, the next ones load it
+            boot(data_file, cache=True)
+            warm = statistics.median(boot(data_file, cache=True) for _ in range(args.repeat))
+            size = os.path.getsize(data_file) / 2 ** 20
+            print("{:>6} {:>10.1f} {:>10.3f} {:>10.3f} {:>7.1f}x".format(scale, size, cold, warm, cold / warm))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - Regression suite                                       #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+"""Performance regression suite of the data load (read_data, format_data and
+translate_value) and of every callback (display_map, update_map_title and each
+chart of display_selected_data, for every country and for a small selection,
+with the default settings, plus the large-selection mode of every chart), run
+over synthetic extracts of growing size so that it needs neither the real CSV
+file nor network access. tests/test_perf.py runs it from pytest.
+
+Each scale runs in a fresh process importing the app over its synthetic file,
+with the figure cache disabled so that every callback builds its figure. The
+best time of each case (the least disturbed by the rest of the machine) and
+its peak of traced memory (tracemalloc, measured in a separate run) are
+compared against a JSON baseline: the suite exits with status 1 when a case
+gets slower or uses more memory than the baseline plus the threshold, ignoring
+differences below the floors. The first run, or a run with --update, stores
+the baseline.
+
+Usage:
+    python benchmarks/bench_suite.py [--scales 1 10 100] [--repeat 3] [--baseline benchmarks/baseline.json]
+                                     [--threshold 0.25] [--floor-ms 1.0] [--floor-mb 0.5] [--update]
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from synthetic import CHARTS, write_csv
+
+###################################################################################################
+#                                                                                                 #
+#                                            CONSTANTS                                            #
+#                                                                                                 #
+###################################################################################################
+
+# Countries of the small selection of the charts
+SMALL_SELECTION = 5
+
+# Countries above which the large-selection cases switch to that mode
+LARGE_SELECTION = 15
+
+# Environment of the app measured: the defaults, but every callback builds its figure within the request
+APP_ENVIRONMENT = {
+    'LARGE_SELECTION': '0',
+    'CLIENTSIDE_CALLBACKS': '0',
+    'REFRESH_INTERVAL': '0',
+    'FIGURE_CACHE_MAX_ENTRIES': '0',
+    'RENDER_THREADS': '0',
+    'SHARED_DATA': '0',
+    'PREWARM_FIGURES': '0',
+    'BACKGROUND_LOAD': '0',
+}
+
+DEFAULT_BASELINE = os.path.join(str(pathlib.Path(__file__).resolve().parent), 'baseline.json')
+
+###################################################################################################
+#                                                                                                 #
+#                                            FUNCTIONS                                            #
+#                                                                                                 #
+###################################################################################################
+
+def cases(data_file:str) -> dict:
+    """Functions measured by the suite, by name. Each callback case calls it once
+    for every year and BMI level of the data."""
+    import pandas as pd
+
+    import app
+    from data import COUNTRY_TRANSLATION, DROPPED_GEO, format_data, read_data, translate_value
+    from figures import render_selected_data
+
+    raw = pd.read_csv(data_file).drop(['DATAFLOW', 'LAST UPDATE', 'OBS_FLAG', 'freq', 'unit'], axis=1)
+    codes = raw.geo[~raw.geo.isin(DROPPED_GEO)].tolist()
+
+    dataset = app.datasets.get()
+    inputs = [(bmi, year) for year in dataset.years.tolist() for bmi in dataset.bmi_values.tolist()]
+    selection = {'points': [{'location': code} for code in dataset.cube.levels['alpha3'].tolist()]}
+    small = {'points': selection['points'][:SMALL_SELECTION]}
+    countries = set(dataset.cube.levels['alpha3'].tolist())
+
+    measured = {
+        'read_data': lambda: read_data(data_file, cache=False),
+        'format_data': lambda: format_data(raw),
+        'translate_value': lambda: [translate_value(code, COUNTRY_TRANSLATION) for code in codes],
+        'display_map': lambda: [app.display_map(bmi, year) for bmi, year in inputs],
+        'update_map_title': lambda: [app.update_map_title(bmi, year) for bmi, year in inputs],
+    }
+    for chart_dropdown, name in CHARTS.items():
+        measured['display_selected_data[{:s}]'.format(name)] = (
+            lambda chart=chart_dropdown: [app.display_selected_data(selection, chart, year, bmi) for bmi, year in inputs])
+        measured['display_selected_data[{:s}, small]'.format(name)] = (
+            lambda chart=chart_dropdown: [app.display_selected_data(small, chart, year, bmi) for bmi, year in inputs])
+        measured['render_selected_data[{:s}, large]'.format(name)] = (
+            lambda chart=chart_dropdown: [render_selected_data(dataset.rollups, countries, chart, year, bmi, large_selection=LARGE_SELECTION)
+                                          for bmi, year in inputs])
+    return measured
+
+
+def run(data_file:str, repeat:int):
+    """Child process: measures every case and prints the results as JSON."""
+    os.environ.update(APP_ENVIRONMENT, DATA_FILE=data_file)
+    results = {}
+    for name, function in cases(data_file).items():
+        # Warm-up, e.g. the templates of the charts are built on their first use
+        function()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results[name] = {'ms': min(timings) * 1000, 'peak_mb': peak / 2 ** 20}
+    print(json.dumps(results))
+
+
+def measure(data_file:str, repeat:int) -> dict:
+    """Runs the cases of a scale in a fresh process and returns their measurements."""
+    output = subprocess.run(
+        [sys.executable, __file__, '--run', data_file, '--repeat', str(repeat)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output)
+
+
+def regressions(current:dict, baseline:dict, threshold:float, floors:dict) -> list:
+    """Measurements above the baseline plus the threshold, ignoring the
+    differences below their floor (noise of the fastest and smallest cases)."""
+    found = []
+    for metric, minimum in floors.items():
+        if current[metric] > baseline[metric] * (1 + threshold) and current[metric] - baseline[metric] > minimum:
+            found.append(metric)
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--threshold', type=float, default=0.25, help="allowed increase over the baseline (0.25 = 25%%)")
+    parser.add_argument('--floor-ms', type=float, default=1.0, help="time increases below these milliseconds are ignored")
+    parser.add_argument('--floor-mb', type=float, default=0.5, help="memory increases below these MB are ignored")
+    parser.add_argument('--update', action='store_true', help="store the results as the new baseline")
+    parser.add_argument('--run', metavar='FILE', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run(args.run, args.repeat)
+        return
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as source:
+            baseline = json.load(source)
+
+    results, failed = {}, 0
+    print("{:>6} {:<39} {:>11} {:>10} {:>14} {:>14} {:<10}".format(
+        'scale', 'case', 'best (ms)', 'peak (MB)', 'vs time (%)', 'vs peak (%)', 'status'))
+    with tempfile.TemporaryDirectory() as folder:
+        for scale in args.scales:
+            data_file = write_csv(os.path.join(folder, 'synthetic_{:d}.csv'.format(scale)), scale)
+            results[str(scale)] = measure(data_file, args.repeat)
+            os.remove(data_file)
+
+            for name, current in results[str(scale)].items():
+                previous = baseline.get(str(scale), {}).get(name)
+                if previous is None:
+                    changes, status = ('', ''), 'new'
+                else:
+                    changes = tuple('{:+.1f}'.format(100 * (current[metric] / previous[metric] - 1)) if previous[metric] else ''
+                                    for metric in ('ms', 'peak_mb'))
+                    found = regressions(current, previous, args.threshold, {'ms': args.floor_ms, 'peak_mb': args.floor_mb})
+                    status = 'REGRESSED ({:s})'.format(', '.join(found)) if found else 'ok'
+                    failed += bool(found)
+                print("{:>6} {:<39} {:>11.3f} {:>10.2f} {:>14} {:>14} {:<10}".format(
+                    scale, name, current['ms'], current['peak_mb'], changes[0], changes[1], status))
+
+    if args.update or not baseline:
+        # The scales not run this time keep their former baseline
+        with open(args.baseline, 'w') as target:
+            json.dump(dict(baseline, **results), target, indent=2, sort_keys=True)
+        print("Baseline stored in {:s}".format(args.baseline))
+    elif failed:
+        print("{:d} cases regressed beyond {:.0%} of the baseline!!".format(failed, args.threshold))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - Workers benchmark                                      #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+"""Compares the memory used by N worker processes when each one of them reads
+and indexes its own copy of the data (as every gunicorn worker used to) against
+the shared mode, where the workers memory-map the cube stored by the first one.
+
+The workers are forked from a process that already imported the libraries, as
+gunicorn does with preload_app. RSS counts the shared pages once per worker,
+PSS splits them between the processes sharing them, so the sum of PSS is the
+real memory used by the workers. Linux only (reads /proc/self/smaps_rollup).
+
+Usage:
+    python benchmarks/bench_workers.py [--scale 10] [--workers 1 4 16]
+"""
+
+import argparse
+import multiprocessing
+import os
+import pathlib
+import sys
+import tempfile
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from cube import DataCube, load_cube
+from data import read_data
+from synthetic import write_csv
+
+###################################################################################################
+#                                                                                                 #
+#                                            FUNCTIONS                                            #
+#                                                                                                 #
+###################################################################################################
+
+def memory() -> tuple:
+    """RSS and PSS (in MB) of the current process."""
+    usage = {}
+    with open('/proc/self/smaps_rollup', 'r') as smaps:
+        for line in smaps:
+            fields = line.split()
+            if fields[0] in ('Rss:', 'Pss:'):
+                usage[fields[0]] = int(fields[1]) / 1024
+    return usage['Rss:'], usage['Pss:']
+
+
+def worker(data_file:str, shared:bool, ready, done, results):
+    """Loads the data as a gunicorn worker would and reports its memory."""
+    if shared:
+        data = (load_cube(data_file, shared=True),)
+    else:
+        full_data = read_data(data_file, cache=False)
+        data = (full_data, DataCube(full_data))
+
+    # Touch every value, as the callbacks eventually do
+    data[-1].values.sum()
+    ready.wait()
+    results.put(memory())
+    done.wait()
+
+
+def run(data_file:str, shared:bool, workers:int) -> list:
+    """Memory of each worker, measured once all of them have loaded the data."""
+    context = multiprocessing.get_context('fork')
+    ready, done, results = context.Barrier(workers + 1), context.Event(), context.Queue()
+    processes = [context.Process(target=worker, args=(data_file, shared, ready, done, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    ready.wait()
+    usage = [results.get() for _ in range(workers)]
+    done.set()
+    for process in processes:
+        process.join()
+    return usage
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=int, default=10)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 16])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        data_file = write_csv(os.path.join(folder, 'synthetic_{:d}.csv'.format(args.scale)), args.scale)
+        # Stored once, as the gunicorn master does with preload_app
+        load_cube(data_file, shared=True)
+
+        print("{:>8} {:<8} {:>16} {:>16} {:>15} {:>15}".format('workers', 'mode', 'RSS/worker (MB)', 'PSS/worker (MB)', 'total RSS (MB)', 'total PSS (MB)'))
+        for workers in args.workers:
+            for mode, shared in [('private', False), ('shared', True)]:
+                usage = run(data_file, shared, workers)
+                rss, pss = sum(rss for rss, _ in usage), sum(pss for _, pss in usage)
+                print("{:>8} {:<8} {:>16.1f} {:>16.1f} {:>15.1f} {:>15.1f}".format(workers, mode, rss / workers, pss / workers, rss, pss))
+
+
+if __name__ == '__main__':
+    main()
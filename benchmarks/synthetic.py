@@ -0,0 +1,153 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - Synthetic data                                         #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+import itertools
+import os
+import pathlib
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from data import AGE_TRANSLATION, BMI_TRANSLATION, COUNTRY_TRANSLATION, EDUCATION_TRANSLATION, GENDER_TRANSLATION, INDICATORS
+
+###################################################################################################
+#                                                                                                 #
+#                                            CONSTANTS                                            #
+#                                                                                                 #
+###################################################################################################
+
+# Codes found in the Eurostat extract that format_data drops
+AGGREGATED_GEO = ['EU27_2020', 'EU28']
+NON_STANDARD_AGES = ['Y_GE65', 'Y15-19', 'Y15-29', 'Y25-29', 'Y25-64', 'Y15-64', 'Y18-24',
+                     'Y18-29', 'Y18-44', 'Y18-64', 'Y_GE18', 'Y20-24', 'Y45-64']
+
+# Years found in the real extract, the synthetic ones are appended after them
+BASE_YEARS = [2014, 2019]
+
+# Charts of the chart dropdown, by value
+CHARTS = {
+    1: 'sex',
+    2: 'age',
+    3: 'education',
+    4: 'trend',
+    5: 'wind rose',
+}
+
+###################################################################################################
+#                                                                                                 #
+#                                            FUNCTIONS                                            #
+#                                                                                                 #
+###################################################################################################
+
+def make_raw(scale:int=1, seed:int=0, indicator:str='hlth_ehis_bm1e') -> pd.DataFrame:
+    """This function builds a data frame shaped like the Eurostat linear extract
+    of a BMI indicator (e.g. 'hlth_ehis_bm1e_linear.csv'). The data is enlarged
+    adding years to the two found within the real extract.
+
+    Args:
+        scale (int, optional): Size of the data compared with the real extract. Defaults to 1.
+        seed (int, optional): Seed of the random values. Defaults to 0.
+        indicator (str, optional): Code of the indicator within data.INDICATORS. Defaults to 'hlth_ehis_bm1e'.
+
+    Returns:
+        pd.DataFrame: The synthetic data, as returned by pd.read_csv.
+    """
+    column, translation, label = INDICATORS[indicator]
+    years = BASE_YEARS + [BASE_YEARS[-1] + year for year in range(1, len(BASE_YEARS) * (scale - 1) + 1)]
+    keys = pd.DataFrame(
+        list(itertools.product(
+            BMI_TRANSLATION,
+            translation,
+            GENDER_TRANSLATION,
+            list(AGE_TRANSLATION) + NON_STANDARD_AGES,
+            list(COUNTRY_TRANSLATION) + AGGREGATED_GEO,
+            years,
+        )),
+        columns=['bmi', column, 'sex', 'age', 'geo', 'TIME_PERIOD'],
+    )
+
+    rng = np.random.default_rng(seed)
+    values = np.round(rng.uniform(0.5, 60.0, len(keys)), 1)
+    values[rng.random(len(keys)) < 0.02] = np.nan
+
+    raw = pd.DataFrame({
+        'DATAFLOW': 'ESTAT:{:s}(1.0)'.format(indicator.upper()),
+        'LAST UPDATE': '10/06/22 23:00:00',
+        'freq': 'A',
+        'unit': 'PC',
+    }, index=keys.index)
+    raw = pd.concat([raw, keys], axis=1)
+    raw['OBS_VALUE'] = values
+    raw['OBS_FLAG'] = np.where(np.isnan(values), ':', None)
+    return raw
+
+
+def write_csv(path:str, scale:int=1, seed:int=0, indicator:str='hlth_ehis_bm1e') -> str:
+    """This function writes the synthetic extract built by make_raw to a CSV file.
+
+    Args:
+        path (str): Path of the file to be written.
+        scale (int, optional): Size of the data compared with the real extract. Defaults to 1.
+        seed (int, optional): Seed of the random values. Defaults to 0.
+        indicator (str, optional): Code of the indicator within data.INDICATORS. Defaults to 'hlth_ehis_bm1e'.
+
+    Returns:
+        str: The path of the written file.
+    """
+    if not os.path.isfile(path):
+        make_raw(scale, seed, indicator).to_csv(path, index=False)
+    return path
+
+
+def make_formatted(countries:int=32, years:int=2, seed:int=0) -> pd.DataFrame:
+    """This function builds a data frame shaped like the output of format_data
+    for any number of countries, which get made up names and codes.
+
+    Args:
+        countries (int, optional): Number of countries. Defaults to 32.
+        years (int, optional): Number of years. Defaults to 2.
+        seed (int, optional): Seed of the random values. Defaults to 0.
+
+    Returns:
+        pd.DataFrame: The synthetic data, as returned by read_data.
+    """
+    codes = ['C{:04d}'.format(country) for country in range(countries)]
+    keys = pd.DataFrame(
+        list(itertools.product(
+            BMI_TRANSLATION.values(),
+            EDUCATION_TRANSLATION.values(),
+            GENDER_TRANSLATION.values(),
+            AGE_TRANSLATION.values(),
+            codes,
+            range(BASE_YEARS[0], BASE_YEARS[0] + years),
+        )),
+        columns=['bmi', 'isced11', 'sex', 'age', 'alpha3', 'TIME_PERIOD'],
+    )
+    keys['OBS_VALUE'] = np.round(np.random.default_rng(seed).uniform(0.5, 60.0, len(keys)), 1)
+    keys['country'] = 'Country ' + keys.alpha3.str[1:]
+    for column in ['bmi', 'isced11', 'sex', 'age', 'alpha3', 'country']:
+        keys[column] = keys[column].astype('category')
+    return keys
+
+def median_time(function, repeat:int) -> float:
+    """Median time of a function call in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
@@ -0,0 +1,120 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - HTTP compression                                       #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+import hashlib
+import uuid
+
+import flask
+from flask_compress import Compress
+
+from figcache import FigureCache
+
+###################################################################################################
+#                                                                                                 #
+#                                            CONSTANTS                                            #
+#                                                                                                 #
+###################################################################################################
+
+# Encodings negotiated with the browser, by preference
+ALGORITHMS = ['br', 'gzip']
+
+# Responses compressed (figures and layout are JSON)
+MIMETYPES = ['application/json', 'text/html', 'text/css', 'text/javascript', 'application/javascript']
+
+# Default bounds of the cache of compressed bodies
+DEFAULT_CACHE_MAX_ENTRIES = 1024
+DEFAULT_CACHE_MAX_BYTES = 32 * 2 ** 20
+
+###################################################################################################
+#                                                                                                 #
+#                                             CLASSES                                             #
+#                                                                                                 #
+###################################################################################################
+
+class BodyCache(FigureCache):
+    """Bounded LRU cache of compressed response bodies, used as the cache backend of Flask-Compress."""
+
+    def set(self, key:str, body:bytes):
+        self.put(key, body)
+
+###################################################################################################
+#                                                                                                 #
+#                                            FUNCTIONS                                            #
+#                                                                                                 #
+###################################################################################################
+
+def tag_response(response:flask.Response) -> flask.Response:
+    """This function sets a strong ETag (the hash of the body) on the successful
+    responses that will be compressed, and answers the conditional GET requests
+    that already hold the body with a 304. It must run before Flask-Compress,
+    which appends the encoding to the ETag (e.g. "<hash>:br").
+
+    Args:
+        response (flask.Response): The response of the view.
+
+    Returns:
+        flask.Response: The tagged response, or an empty 304 response.
+    """
+    if (not 200 <= response.status_code < 300 or response.is_streamed or
+        response.mimetype not in MIMETYPES or "Content-Encoding" in response.headers):
+        return response
+
+    etag, _ = response.get_etag()
+    if etag is None:
+        etag = hashlib.sha1(response.get_data()).hexdigest()
+        response.set_etag(etag)
+    flask.g.body_etag = etag
+
+    if flask.request.method in ("GET", "HEAD"):
+        for tag in flask.request.if_none_match.as_set():
+            if tag.split(":")[0] == etag:
+                not_modified = flask.Response(status=304)
+                not_modified.set_etag(tag)
+                not_modified.headers["Vary"] = "Accept-Encoding"
+                return not_modified
+    return response
+
+def body_key(request:flask.Request) -> str:
+    """This function returns the key of the compressed body of the current response:
+    the ETag set by tag_response along with the encodings accepted by the browser.
+
+    Args:
+        request (flask.Request): The current request.
+
+    Returns:
+        str: The key within the cache of compressed bodies.
+    """
+    etag = flask.g.get("body_etag")
+    if etag is None:
+        # Not tagged (e.g. streamed), its body can not be looked up
+        etag = uuid.uuid4().hex
+    return "{0};{1}".format(etag, request.headers.get("Accept-Encoding", ""))
+
+def enable_compression(server:flask.Flask, cache:BodyCache=None):
+    """This function compresses the responses of the server with Brotli or gzip,
+    as negotiated with the browser. Identical bodies (e.g. the same map requested
+    again) are compressed only once if a cache is given.
+
+    Args:
+        server (flask.Flask): The server of the Dash app.
+        cache (BodyCache, optional): The cache of compressed bodies. Defaults to None.
+    """
+    server.config.update(
+        COMPRESS_ALGORITHM=ALGORITHMS,
+        COMPRESS_MIMETYPES=MIMETYPES,
+        COMPRESS_CACHE_BACKEND=(lambda: cache) if cache is not None else None,
+        COMPRESS_CACHE_KEY=body_key,
+    )
+    Compress(server)
+
+    # Registered after Flask-Compress so that it runs before it
+    server.after_request(tag_response)
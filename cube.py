@@ -0,0 +1,317 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - Data cube                                              #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from data import cache_meta, find_schema, get_schema, read_data, save_cache
+
+###################################################################################################
+#                                                                                                 #
+#                                            CONSTANTS                                            #
+#                                                                                                 #
+###################################################################################################
+
+# Label used by Eurostat for the aggregated value of a dimension
+TOTAL = 'Total'
+
+# Folder, within the cache of the data file, where the shared cube is stored
+CUBE_FOLDER = 'cube'
+
+# Levels held by the cubes alive, by dimension and levels (see shared_levels)
+_shared_levels = weakref.WeakValueDictionary()
+_shared_levels_lock = threading.Lock()
+
+###################################################################################################
+#                                                                                                 #
+#                                             CLASSES                                             #
+#                                                                                                 #
+###################################################################################################
+
+class SharedLevels:
+    """Read-only levels of a dimension, and their positions, shared by every cube
+    holding the same ones (e.g. the cubes of several datasets or versions of
+    the same data), whose texts are interned.
+
+    Args:
+        levels (np.ndarray): The levels of the dimension.
+    """
+
+    __slots__ = ('levels', 'positions', '__weakref__')
+
+    def __init__(self, levels:np.ndarray):
+        if levels.dtype == object:
+            levels = np.array([sys.intern(level) if isinstance(level, str) else level for level in levels], dtype=object)
+        else:
+            levels = np.array(levels)
+        levels.setflags(write=False)
+        self.levels = levels
+        self.positions = {level: position for position, level in enumerate(levels)}
+
+
+class DataCube:
+    """Dense index of our observations built once at startup.
+
+    Every observation is stored in a NumPy array with one axis per dimension
+    (see Schema.dimensions, found from the columns of the data) so that any
+    slice of the data can be retrieved by position, without scanning the whole
+    table. Missing observations are stored as NaN.
+
+    Args:
+        data (pd.DataFrame): The data returned by read_data.
+    """
+
+    def __init__(self, data:pd.DataFrame):
+        self.schema = find_schema(data.columns)
+        self.dimensions = self.schema.dimensions
+        levels = {}
+        codes = []
+        for dimension in self.dimensions:
+            dimension_codes, uniques = pd.factorize(data[dimension], sort=False)
+            levels[dimension] = np.asarray(uniques)
+            codes.append(dimension_codes)
+
+        # Country names sharing the position of their alpha3 code
+        names = dict(zip(data.alpha3, data.country))
+        countries = np.array([names[code] for code in levels['alpha3']], dtype=object)
+
+        values = np.full(tuple(len(levels[dimension]) for dimension in self.dimensions), np.nan)
+        values[tuple(codes)] = data.OBS_VALUE.to_numpy(dtype=float)
+        self._index(levels, countries, values)
+
+    def _index(self, levels:dict, countries:np.ndarray, values:np.ndarray):
+        # Kept alive as long as the cube, so that the next cubes with the same levels share them
+        self._shared = {dimension: shared_levels(dimension, levels[dimension]) for dimension in self.dimensions}
+        self._shared['country'] = shared_levels('country', countries)
+        self.levels = {dimension: self._shared[dimension].levels for dimension in self.dimensions}
+        self.positions = {dimension: self._shared[dimension].positions for dimension in self.dimensions}
+        self.countries = self._shared['country'].levels
+        self.values = values
+
+    def save(self, folder:str):
+        """This function stores the cube in a folder so that it can be memory-mapped by DataCube.load.
+
+        Args:
+            folder (str): The path to the folder, it must not exist.
+        """
+        temporary = tempfile.mkdtemp(dir=os.path.dirname(folder), prefix='.')
+        try:
+            np.save(os.path.join(temporary, 'values.npy'), self.values)
+            with open(os.path.join(temporary, 'levels.json'), 'w') as target:
+                json.dump({
+                    'schema': self.schema.name,
+                    'levels': {dimension: self.levels[dimension].tolist() for dimension in self.dimensions},
+                    'countries': self.countries.tolist(),
+                }, target)
+            os.rename(temporary, folder)
+        finally:
+            shutil.rmtree(temporary, ignore_errors=True)
+
+    @classmethod
+    def load(cls, folder:str) -> 'DataCube':
+        """This function loads a cube stored by DataCube.save. Its values are
+        memory-mapped read-only, so every process loading the same folder shares them.
+
+        Args:
+            folder (str): The path to the folder.
+
+        Returns:
+            DataCube: The loaded cube.
+        """
+        with open(os.path.join(folder, 'levels.json'), 'r') as source:
+            stored = json.load(source)
+        cube = cls.__new__(cls)
+        cube.schema = get_schema(stored['schema'])
+        cube.dimensions = cube.schema.dimensions
+        levels = {}
+        for dimension in cube.dimensions:
+            values = stored['levels'][dimension]
+            levels[dimension] = np.array(values) if all(isinstance(value, int) for value in values) else np.array(values, dtype=object)
+
+        cube._index(levels, np.array(stored['countries'], dtype=object), np.load(os.path.join(folder, 'values.npy'), mmap_mode='r'))
+        return cube
+
+    def extend(self, data:pd.DataFrame) -> 'DataCube':
+        """This function builds a new cube holding the observations of this one
+        and the given ones, which replace the observations they share.
+
+        Args:
+            data (pd.DataFrame): New observations, formatted by read_data.
+
+        Returns:
+            DataCube: The extended cube (this one is not modified).
+        """
+        return DataCube(pd.concat([self.lookup(), data], ignore_index=True))
+
+    def breakdown(self, dimension:str) -> list:
+        """This function returns the levels of a dimension without its aggregated value.
+
+        Args:
+            dimension (str): Name of the dimension.
+
+        Returns:
+            list: Every level of the dimension but 'Total'.
+        """
+        return [level for level in self.levels[dimension] if level != TOTAL]
+
+    def index(self, dimension:str, selector=None) -> np.ndarray:
+        """This function translates the selector of a dimension to the positions
+        of its levels within the cube.
+
+        Args:
+            dimension (str): Name of the dimension.
+            selector (optional): A single level, a collection of levels or None to
+                select the whole dimension. Defaults to None.
+
+        Returns:
+            np.ndarray: Sorted positions of the selected levels. Unknown levels are ignored.
+        """
+        positions = self.positions[dimension]
+        if selector is None:
+            return np.arange(len(positions))
+        if not isinstance(selector, (list, tuple, set, frozenset, np.ndarray)):
+            selector = [selector]
+        return np.array(sorted(positions[level] for level in selector if level in positions), dtype=np.intp)
+
+    def lookup(self, **selectors) -> pd.DataFrame:
+        """This function returns the observations found within a slice of the cube.
+
+        Args:
+            **selectors: One selector per dimension (see DataCube.index). Dimensions
+                not given are fully selected.
+
+        Raises:
+            ValueError: Raised if a selector does not match any dimension of the cube
+
+        Returns:
+            pd.DataFrame: One row per observation with a column per dimension plus
+                'country' and 'OBS_VALUE', in the order of the cube.
+        """
+        for dimension in selectors:
+            if dimension not in self.positions:
+                raise ValueError("The dimension '{:s}' could not be found within the cube!!".format(dimension))
+
+        indexes = [self.index(dimension, selectors.get(dimension)) for dimension in self.dimensions]
+        block = self.values[np.ix_(*indexes)]
+        cells = np.nonzero(~np.isnan(block))
+
+        sliced = {}
+        for dimension, index, cell in zip(self.dimensions, indexes, cells):
+            sliced[dimension] = self.levels[dimension][index[cell]]
+        alpha3 = self.dimensions.index('alpha3')
+        sliced['country'] = self.countries[indexes[alpha3][cells[alpha3]]]
+        sliced['OBS_VALUE'] = block[cells]
+        return pd.DataFrame(sliced)
+
+###################################################################################################
+#                                                                                                 #
+#                                            FUNCTIONS                                            #
+#                                                                                                 #
+###################################################################################################
+
+def shared_levels(dimension:str, levels:np.ndarray) -> SharedLevels:
+    """This function returns the shared levels of a dimension, built the first
+    time they are found while any cube holds them.
+
+    Args:
+        dimension (str): Name of the dimension.
+        levels (np.ndarray): The levels of the dimension.
+
+    Returns:
+        SharedLevels: The shared levels.
+    """
+    key = (dimension, tuple(levels.tolist()))
+    with _shared_levels_lock:
+        shared = _shared_levels.get(key)
+        if shared is None:
+            shared = SharedLevels(levels)
+            _shared_levels[key] = shared
+        return shared
+
+def cached_cube(data_file:str) -> DataCube:
+    """This function loads the cube stored within the cache of the data file if
+    it was built from the current content of the file.
+
+    Args:
+        data_file (str): The path to our data source file.
+
+    Returns:
+        DataCube: The memory-mapped cube, or None if there is no valid one.
+    """
+    meta = cache_meta(data_file)
+    if meta is None or not os.path.isdir(os.path.join(meta['path'], CUBE_FOLDER)):
+        return None
+    return DataCube.load(os.path.join(meta['path'], CUBE_FOLDER))
+
+def store_cube(cube:DataCube, data_file:str, fingerprint:dict) -> DataCube:
+    """This function stores a cube (and its data) within the cache of the data
+    file, so that the other processes can load it instead of building it.
+
+    Args:
+        cube (DataCube): The cube built from the data file.
+        data_file (str): The path to our data source file.
+        fingerprint (dict): The fingerprint of the data file the cube was built from.
+
+    Returns:
+        DataCube: The stored cube, memory-mapped.
+    """
+    save_cache(cube.lookup(), data_file, fingerprint)
+    meta = cache_meta(data_file)
+    if meta is None or meta['fingerprint']['sha256'] != fingerprint['sha256']:
+        # The data file changed again meanwhile
+        return cube
+    try:
+        cube.save(os.path.join(meta['path'], CUBE_FOLDER))
+    except OSError:
+        if not os.path.isdir(os.path.join(meta['path'], CUBE_FOLDER)):
+            return cube
+    return DataCube.load(os.path.join(meta['path'], CUBE_FOLDER))
+
+def load_cube(data_file:str, shared:bool=True) -> DataCube:
+    """This function reads the data file and indexes it.
+
+    In shared mode the cube is stored within the cache of the data file (see
+    data.save_cache) the first time it is built, and every process (e.g. each
+    gunicorn worker) memory-maps that same file instead of holding a private
+    copy of the data.
+
+    Args:
+        data_file (str): The path to our data source file.
+        shared (bool, optional): Whether to share the cube between processes. Defaults to True.
+
+    Returns:
+        DataCube: The cube of our data.
+    """
+    if not shared:
+        return DataCube(read_data(data_file, cache=False))
+
+    meta = cache_meta(data_file)
+    if meta is None or not os.path.isdir(os.path.join(meta['path'], CUBE_FOLDER)):
+        cube = DataCube(read_data(data_file))
+        meta = cache_meta(data_file)
+        if meta is None:
+            return cube
+        try:
+            cube.save(os.path.join(meta['path'], CUBE_FOLDER))
+        except OSError:
+            # Another process stored it first, or the cache is not writable
+            if not os.path.isdir(os.path.join(meta['path'], CUBE_FOLDER)):
+                return cube
+    return DataCube.load(os.path.join(meta['path'], CUBE_FOLDER))
@@ -0,0 +1,623 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - Data layer                                             #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+import functools
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+###################################################################################################
+#                                                                                                 #
+#                                            CONSTANTS                                            #
+#                                                                                                 #
+###################################################################################################
+
+# Dictionary to parse countries
+COUNTRY_TRANSLATION = {
+    'BE': 'Belgium',
+    'BG': 'Bulgaria',
+    'CZ': 'Czechia',
+    'DK': 'Denmark',
+    'DE': 'Germany',
+    'EE': 'Estonia',
+    'IE': 'Ireland',
+    'EL': 'Greece',
+    'ES': 'Spain',
+    'FR': 'France',
+    'HR': 'Croatia',
+    'IT': 'Italy',
+    'CY': 'Cyprus',
+    'LV': 'Latvia',
+    'LT': 'Lithuania',
+    'LU': 'Luxembourg',
+    'HU': 'Hungary',
+    'MT': 'Malta',
+    'NL': 'Netherlands',
+    'AT': 'Austria',
+    'PL': 'Poland',
+    'PT': 'Portugal',
+    'RO': 'Romania',
+    'SI': 'Slovenia',
+    'SK': 'Slovakia',
+    'FI': 'Finland',
+    'SE': 'Sweden',
+    'IS': 'Iceland',
+    'NO': 'Norway',
+    'UK': 'United Kingdom',
+    'RS': 'Serbia',
+    'TR': 'Turkey'
+}
+
+# Dictionary to parse countries into their ISO alpha3 codes (the ones of the map geometry)
+ALPHA3_TRANSLATION = {
+    'BE': 'BEL',
+    'BG': 'BGR',
+    'CZ': 'CZE',
+    'DK': 'DNK',
+    'DE': 'DEU',
+    'EE': 'EST',
+    'IE': 'IRL',
+    'EL': 'GRC',
+    'ES': 'ESP',
+    'FR': 'FRA',
+    'HR': 'HRV',
+    'IT': 'ITA',
+    'CY': 'CYP',
+    'LV': 'LVA',
+    'LT': 'LTU',
+    'LU': 'LUX',
+    'HU': 'HUN',
+    'MT': 'MLT',
+    'NL': 'NLD',
+    'AT': 'AUT',
+    'PL': 'POL',
+    'PT': 'PRT',
+    'RO': 'ROU',
+    'SI': 'SVN',
+    'SK': 'SVK',
+    'FI': 'FIN',
+    'SE': 'SWE',
+    'IS': 'ISL',
+    'NO': 'NOR',
+    'UK': 'GBR',
+    'RS': 'SRB',
+    'TR': 'TUR'
+}
+
+# Dictionary to parse gender
+GENDER_TRANSLATION = {
+    'F': 'Female',
+    'M': 'Male',
+    'T': 'Total'
+}
+
+# Dictionary to parse BMI levels
+BMI_TRANSLATION = {
+    'BMI_LT18P5': 'Underweight',
+    'BMI18P5-24': 'Normal',
+    'BMI_GE25': 'Overweight',
+    'BMI25-29': 'Pre-obese',
+    'BMI_GE30': 'Obese'
+}
+
+EDUCATION_TRANSLATION = {
+    'ED0-2': 'Primary',
+    'ED3_4': 'Secondary',
+    'ED5-8': 'Tertiary',
+    'TOTAL': 'Total'
+}
+
+INCOME_TRANSLATION = {
+    'QU1': 'First quintile',
+    'QU2': 'Second quintile',
+    'QU3': 'Third quintile',
+    'QU4': 'Fourth quintile',
+    'QU5': 'Fifth quintile',
+    'TOTAL': 'Total'
+}
+
+URBANISATION_TRANSLATION = {
+    'DEG1': 'Cities',
+    'DEG2': 'Towns and suburbs',
+    'DEG3': 'Rural areas',
+    'TOTAL': 'Total'
+}
+
+AGE_TRANSLATION = {
+    'Y15-24': '15-24',
+    'Y25-34': '25-34',
+    'Y35-44': '35-44',
+    'Y45-54': '45-54',
+    'Y55-64': '55-64',
+    'Y65-74': '65-74',
+    'Y_GE75': '75+',
+    'TOTAL': 'Total'
+}
+
+# Suffix of the folder holding the binary cache of a data file
+CACHE_SUFFIX = '.cache'
+
+# Version of the cache layout, bump it whenever format_data or the stored cube (see cube.DataCube.save) change
+CACHE_VERSION = 2
+
+# Columns of every BMI indicator used by the dashboard and how they are parsed
+COLUMN_TYPES = {
+    'bmi': 'category',
+    'sex': 'category',
+    'age': 'category',
+    'geo': 'category',
+    'TIME_PERIOD': 'int64',
+    'OBS_VALUE': 'float64',
+}
+
+# BMI indicators of Eurostat supported, by dataset code: the column breaking down their observations
+# besides sex and age, its translation dictionary and its name within the charts
+INDICATORS = {
+    'hlth_ehis_bm1e': ('isced11', EDUCATION_TRANSLATION, 'education'),
+    'hlth_ehis_bm1i': ('quant_inc', INCOME_TRANSLATION, 'income'),
+    'hlth_ehis_bm1u': ('deg_urb', URBANISATION_TRANSLATION, 'urbanisation'),
+}
+
+# Number of rows of the data file parsed at once
+CHUNK_SIZE = 100000
+
+# Agregated values dropped from the data
+DROPPED_GEO = ['EU27_2020', 'EU28']
+
+# Non standard age groups dropped from the data
+DROPPED_AGES = [
+    'Y_GE65',
+    'Y15-19',
+    'Y15-29',
+    'Y25-29',
+    'Y25-64',
+    'Y15-64',
+    'Y18-24',
+    'Y18-29',
+    'Y18-44',
+    'Y18-64',
+    'Y_GE18',
+    'Y20-24',
+    'Y45-64'
+]
+
+###################################################################################################
+#                                                                                                 #
+#                                             CLASSES                                             #
+#                                                                                                 #
+###################################################################################################
+
+class Schema:
+    """Shape of the linear file of a BMI indicator (see INDICATORS): every one
+    holds the BMI level, sex, age, country and year of its observations and
+    breaks them down by a column of its own (e.g. the educational attainment
+    level in hlth_ehis_bm1e or the income quintile in hlth_ehis_bm1i).
+
+    The columns shared by every indicator are parsed with the same translation
+    dictionaries, so their levels are shared by the cubes of every dataset (see
+    cube.shared_levels).
+
+    Args:
+        name (str): Code of the indicator within INDICATORS.
+    """
+
+    def __init__(self, name:str):
+        self.name = name
+        self.column, translation, self.label = INDICATORS[name]
+        # Dimensions of its cube, in the same order used by the linear files
+        self.dimensions = ('bmi', self.column, 'sex', 'age', 'alpha3', 'TIME_PERIOD')
+        # Columns broken down by the histograms, in the order of the chart dropdown
+        self.breakdowns = ('sex', 'age', self.column)
+        self.labels = {'sex': 'sex', 'age': 'age', self.column: self.label}
+        self.translations = {
+            'sex': GENDER_TRANSLATION,
+            'bmi': BMI_TRANSLATION,
+            self.column: translation,
+            'age': AGE_TRANSLATION,
+        }
+        self.column_types = dict(COLUMN_TYPES, **{self.column: 'category'})
+
+###################################################################################################
+#                                                                                                 #
+#                                            FUNCTIONS                                            #
+#                                                                                                 #
+###################################################################################################
+
+def translate_value(code:str, translator:dict) -> str:
+    """This function is meant to translate the value found
+    within the original dataset to a human readable one.
+
+    Args:
+        code (str): Value to be translated
+        translator (dict): Dictionary to use for the translation
+
+    Raises:
+        ValueError: Raised if the code is not found within the translator dictionary
+
+    Returns:
+        str: Transalted value.
+    """
+    if code in translator.keys():
+        translated = translator[code]
+    else:
+        raise ValueError("The code '{:s}' could not be found within the translation dictionary!!".format(code))
+    return translated
+
+def translate_column(codes:pd.Series, translator:dict) -> pd.Series:
+    """This function is the vectorized version of translate_value. Each distinct
+    code is translated only once and the result is stored as a categorical whose
+    categories are the values of the translator dictionary.
+
+    Args:
+        codes (pd.Series): Values to be translated
+        translator (dict): Dictionary to use for the translation
+
+    Raises:
+        ValueError: Raised if a code is not found within the translator dictionary
+
+    Returns:
+        pd.Series: Translated values.
+    """
+    # Codes read as categoricals keep the categories of the rows filtered out
+    categorical = pd.Categorical(codes).remove_unused_categories()
+    if (categorical.codes == -1).any():
+        translate_value(codes[categorical.codes == -1].iloc[0], translator)
+
+    categories = list(dict.fromkeys(translator.values()))
+    positions = {category: position for position, category in enumerate(categories)}
+    remap = np.array([positions[translate_value(code, translator)] for code in categorical.categories], dtype=int)
+    translated = pd.Categorical.from_codes(remap[categorical.codes], categories=categories)
+    return pd.Series(translated, index=codes.index)
+
+@functools.lru_cache(maxsize=None)
+def get_schema(name:str) -> Schema:
+    """This function returns the schema of a BMI indicator, built once.
+
+    Args:
+        name (str): Code of the indicator.
+
+    Raises:
+        ValueError: Raised if the indicator is not found within INDICATORS
+
+    Returns:
+        Schema: The schema of the indicator.
+    """
+    if name not in INDICATORS:
+        raise ValueError("The indicator '{:s}' could not be found within the supported ones!!".format(name))
+    return Schema(name)
+
+def find_schema(columns) -> Schema:
+    """This function returns the schema of the indicator whose own column is
+    found among the given ones (e.g. the header of a data file or the columns
+    of our data once formatted).
+
+    Args:
+        columns: The names of the columns.
+
+    Raises:
+        ValueError: Raised if no column breaks down any of the supported indicators
+
+    Returns:
+        Schema: The schema of the indicator.
+    """
+    for name, (column, translation, label) in INDICATORS.items():
+        if column in columns:
+            return get_schema(name)
+    raise ValueError("The columns {:s} do not break down any of the BMI indicators ({:s})!!".format(
+        ', '.join(map(str, columns)), ', '.join(column for column, translation, label in INDICATORS.values())))
+
+def format_data(data:pd.DataFrame, schema:Schema=None) -> pd.DataFrame:
+    """This function will format the original data to be easy
+    to read and analyse.
+
+    Args:
+        data (pd.DataFrame): Our data before parsing.
+        schema (Schema, optional): The schema of the data. Defaults to None (found from its columns).
+
+    Returns:
+        pd.DataFrame: Our data ready to be used.
+    """
+    schema = schema if schema is not None else find_schema(data.columns)
+
+    # Drop the NA values, the agregated values and the non standard age groups
+    data = data[data.OBS_VALUE.notna() & ~data.geo.isin(DROPPED_GEO) & ~data.age.isin(DROPPED_AGES)].copy()
+
+    # Value Parsing
+    for column, translator in schema.translations.items():
+        data[column] = translate_column(data[column], translator)
+    data['country'] = translate_column(data.geo, COUNTRY_TRANSLATION)
+    data['alpha3'] = translate_column(data.geo, ALPHA3_TRANSLATION)
+    data = data.drop(['geo'], axis=1)
+    return data
+
+
+def file_digest(data_file:str, length:int=None) -> str:
+    """This function computes the SHA-256 hash of the content of a file.
+
+    Args:
+        data_file (str): The path to the file.
+        length (int, optional): Number of bytes hashed from the start of the file. Defaults to None (the whole file).
+
+    Returns:
+        str: The hexadecimal digest of the file.
+    """
+    digest = hashlib.sha256()
+    remaining = float('inf') if length is None else length
+    with open(data_file, 'rb') as source:
+        for block in iter(lambda: source.read(int(min(2 ** 20, remaining))), b''):
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+def file_fingerprint(data_file:str) -> dict:
+    """This function computes the fingerprint used to validate the cache of a data file.
+
+    Args:
+        data_file (str): The path to the file.
+
+    Returns:
+        dict: The size, modification time and content hash of the file.
+    """
+    stat = os.stat(data_file)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'sha256': file_digest(data_file)}
+
+def appended_to(data_file:str, fingerprint:dict) -> bool:
+    """This function checks whether a data file only got new lines appended since
+    the given fingerprint was taken, i.e. whether its former content is a prefix
+    of the current one.
+
+    Args:
+        data_file (str): The path to the file.
+        fingerprint (dict): A former fingerprint of the file (see file_fingerprint).
+
+    Returns:
+        bool: Whether only complete lines were appended to the file.
+    """
+    size = os.path.getsize(data_file)
+    if fingerprint['size'] == 0 or size <= fingerprint['size']:
+        return False
+    with open(data_file, 'rb') as source:
+        source.seek(fingerprint['size'] - 1)
+        boundary = source.read(1)
+        source.seek(size - 1)
+        end = source.read(1)
+    return boundary == end == b'\n' and file_digest(data_file, fingerprint['size']) == fingerprint['sha256']
+
+def write_json(path:str, content:dict):
+    """This function atomically replaces a JSON file.
+
+    Args:
+        path (str): The path to the file.
+        content (dict): The content of the file.
+    """
+    handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(handle, 'w') as target:
+        json.dump(content, target)
+    os.replace(temporary, path)
+
+def save_cache(data:pd.DataFrame, data_file:str, fingerprint:dict):
+    """This function stores the formatted data next to its data file as one
+    NumPy array per column (the codes of categorical columns) so that it can
+    be memory-mapped by load_cache.
+
+    Args:
+        data (pd.DataFrame): The formatted data.
+        data_file (str): The path to the data file the data was read from.
+        fingerprint (dict): The fingerprint of the data file when it was read.
+    """
+    cache_dir = data_file + CACHE_SUFFIX
+    folder = '{:s}-{:d}'.format(fingerprint['sha256'][:16], CACHE_VERSION)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    columns = []
+    temporary = tempfile.mkdtemp(dir=cache_dir, prefix='.')
+    try:
+        for name in data.columns:
+            column = data[name]
+            if not pd.api.types.is_numeric_dtype(column):
+                column = column.astype('category')
+                columns.append({'name': name, 'categories': column.cat.categories.tolist()})
+                values = column.cat.codes.to_numpy()
+            else:
+                columns.append({'name': name, 'categories': None})
+                values = column.to_numpy()
+            np.save(os.path.join(temporary, name + '.npy'), values)
+        os.rename(temporary, os.path.join(cache_dir, folder))
+    except OSError:
+        # Another process stored the same data first
+        shutil.rmtree(temporary, ignore_errors=True)
+        if not os.path.isdir(os.path.join(cache_dir, folder)):
+            raise
+
+    write_json(os.path.join(cache_dir, 'current.json'), {'version': CACHE_VERSION, 'folder': folder, 'fingerprint': fingerprint, 'columns': columns})
+
+    # Remove the data stored for previous versions of the data file (but not the ones being built)
+    for previous in os.listdir(cache_dir):
+        if previous != folder and not previous.startswith('.') and os.path.isdir(os.path.join(cache_dir, previous)):
+            shutil.rmtree(os.path.join(cache_dir, previous), ignore_errors=True)
+
+def cache_meta(data_file:str) -> dict:
+    """This function returns the description of the cache stored by save_cache if
+    it was built from the current content of the data file. The size and
+    modification time of the file are checked first, its content is only hashed
+    when they differ.
+
+    Args:
+        data_file (str): The path to the data file.
+
+    Returns:
+        dict: The description of the cache ('path' holds its folder), or None if there is no valid cache.
+    """
+    cache_dir = data_file + CACHE_SUFFIX
+    try:
+        with open(os.path.join(cache_dir, 'current.json'), 'r') as current:
+            meta = json.load(current)
+    except (OSError, ValueError):
+        return None
+    if meta.get('version') != CACHE_VERSION:
+        return None
+
+    fingerprint = meta['fingerprint']
+    stat = os.stat(data_file)
+    if (stat.st_size, stat.st_mtime_ns) != (fingerprint['size'], fingerprint['mtime']):
+        if stat.st_size != fingerprint['size'] or file_digest(data_file) != fingerprint['sha256']:
+            return None
+        # Same content with a new modification time (e.g. copied or touched)
+        meta['fingerprint'] = dict(fingerprint, mtime=stat.st_mtime_ns)
+        try:
+            write_json(os.path.join(cache_dir, 'current.json'), meta)
+        except OSError:
+            pass
+
+    meta['path'] = os.path.join(cache_dir, meta['folder'])
+    return meta
+
+def load_cache(data_file:str) -> pd.DataFrame:
+    """This function loads the data stored by save_cache if it is still valid (see cache_meta).
+
+    The columns are memory-mapped read-only and the frame is built over them
+    without copying (pandas 1 still copies the numeric ones when consolidating
+    its blocks), so that the pages are shared by every process mapping them.
+
+    Args:
+        data_file (str): The path to the data file.
+
+    Returns:
+        pd.DataFrame: The formatted data, or None if there is no valid cache.
+    """
+    meta = cache_meta(data_file)
+    if meta is None:
+        return None
+
+    columns = {}
+    try:
+        for column in meta['columns']:
+            values = np.load(os.path.join(meta['path'], column['name'] + '.npy'), mmap_mode='r')
+            if column['categories'] is None:
+                columns[column['name']] = values
+            else:
+                columns[column['name']] = pd.Categorical.from_codes(values, categories=column['categories'])
+    except (OSError, ValueError):
+        return None
+    return pd.DataFrame(columns, copy=False)
+
+def stream_data(data_file:str, chunksize:int=CHUNK_SIZE, start:int=0, end:int=None) -> pd.DataFrame:
+    """This function reads and formats the data file chunk by chunk, so that
+    only one chunk of the raw data is held in memory at a time. The formatted
+    chunks are kept as compact arrays (categorical codes) and joined column by
+    column at the end.
+
+    Args:
+        data_file (str): The path to the data file.
+        chunksize (int, optional): Number of rows parsed at once. Defaults to CHUNK_SIZE.
+        start (int, optional): Offset of the first line to read (e.g. the former size of
+            a file new lines were appended to), 0 reads the whole file. Defaults to 0.
+        end (int, optional): Offset where the lines read end, only used along with start. Defaults to None.
+
+    Returns:
+        pd.DataFrame: The data ready to be used.
+    """
+    parts = {}
+    categories = {}
+    if start:
+        # The lines after the offset are read under the header of the file
+        with open(data_file, 'rb') as source:
+            names = pd.read_csv(source, nrows=0).columns.tolist()
+            source.seek(start)
+            tail = io.BytesIO(source.read() if end is None else source.read(end - start))
+        schema = find_schema(names)
+        reader = pd.read_csv(tail, header=None, names=names, usecols=list(schema.column_types), dtype=schema.column_types, chunksize=chunksize)
+    else:
+        schema = find_schema(pd.read_csv(data_file, nrows=0).columns)
+        reader = pd.read_csv(data_file, usecols=list(schema.column_types), dtype=schema.column_types, chunksize=chunksize)
+    for chunk in reader:
+        formatted = format_data(chunk, schema)
+        for name in formatted.columns:
+            column = formatted[name]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                # Every chunk shares the categories of the translation dictionaries
+                categories[name] = column.cat.categories
+                column = column.cat.codes
+            parts.setdefault(name, []).append(column.to_numpy())
+
+    if not parts:
+        return format_data(pd.read_csv(data_file, nrows=0, usecols=list(schema.column_types), dtype=schema.column_types), schema)
+
+    columns = {}
+    for name in list(parts):
+        values = np.concatenate(parts.pop(name))
+        columns[name] = pd.Categorical.from_codes(values, categories=categories[name]) if name in categories else values
+    return pd.DataFrame(columns)
+
+def check_schema(data_file:str, rows:int=1000) -> Schema:
+    """This function checks that a data file has the shape of one of the BMI
+    indicators (see INDICATORS): the columns of its schema and codes found
+    within its translation dictionaries, reading its header and first rows only.
+
+    Args:
+        data_file (str): The path to the data file.
+        rows (int, optional): Number of rows whose codes are checked. Defaults to 1000.
+
+    Raises:
+        ValueError: Raised if a column is missing or a code can not be translated.
+
+    Returns:
+        Schema: The schema of the data file.
+    """
+    columns = pd.read_csv(data_file, nrows=0).columns
+    try:
+        schema = find_schema(columns)
+    except ValueError as error:
+        raise ValueError("The data file '{:s}' is not shaped as a BMI indicator: {}".format(data_file, error)) from error
+    missing = [name for name in schema.column_types if name not in columns]
+    if missing:
+        raise ValueError("The data file '{:s}' lacks the columns {:s} of the BMI indicator {:s}!!".format(data_file, ', '.join(missing), schema.name))
+    try:
+        format_data(pd.read_csv(data_file, nrows=rows, usecols=list(schema.column_types), dtype=schema.column_types), schema)
+    except ValueError as error:
+        raise ValueError("The data file '{:s}' does not have the codes of the BMI indicator {:s}: {}".format(data_file, schema.name, error)) from error
+    return schema
+
+def read_data(data_file:str="hlth_ehis_bm1e_linear.csv", cache:bool=True, chunksize:int=CHUNK_SIZE) -> pd.DataFrame:
+    """This function is meant to used to read the data file and prepare it to be used
+    within our dashboard
+
+    Args:
+        file (str, optional): The path to our data source file. Defaults to "hlth_ehis_bm1e_linear.csv".
+        cache (bool, optional): Whether to use (and build) the binary cache stored
+            next to the data file. Defaults to True.
+        chunksize (int, optional): Number of rows parsed at once (see stream_data). Defaults to CHUNK_SIZE.
+
+    Returns:
+        pd.DataFrame: The data ready to be used.
+    """
+    if os.path.isfile(data_file):
+        my_data = load_cache(data_file) if cache else None
+        if my_data is None:
+            fingerprint = file_fingerprint(data_file) if cache else None
+            my_data = stream_data(data_file, chunksize)
+            if cache:
+                try:
+                    save_cache(my_data, data_file, fingerprint)
+                except OSError:
+                    # The cache is an optimization, the data is still usable without it
+                    pass
+    else:
+        raise FileNotFoundError("The path given as parameter is not a file!!")
+
+    return my_data
@@ -0,0 +1,269 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - Static export                                          #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+import argparse
+import collections
+import concurrent.futures
+import hashlib
+import json
+import os
+import pathlib
+import re
+import tempfile
+import time
+
+import plotly.io as pio
+from plotly.offline import get_plotlyjs_version
+
+from data import write_json
+from figures import render_map, render_selected_data
+from geo import load_geojson
+from refresh import DatasetRefresher
+
+###################################################################################################
+#                                                                                                 #
+#                                            CONSTANTS                                            #
+#                                                                                                 #
+###################################################################################################
+
+APP_PATH = str(pathlib.Path(__file__).parent.resolve())
+
+# Groups of countries whose charts are exported (regions of the UN geoscheme), plus every country
+REGIONS = {
+    'northern-europe': ['DNK', 'EST', 'FIN', 'ISL', 'IRL', 'LVA', 'LTU', 'NOR', 'SWE', 'GBR'],
+    'western-europe': ['AUT', 'BEL', 'FRA', 'DEU', 'LUX', 'NLD'],
+    'southern-europe': ['HRV', 'CYP', 'GRC', 'ITA', 'MLT', 'PRT', 'SRB', 'SVN', 'ESP', 'TUR'],
+    'eastern-europe': ['BGR', 'CZE', 'HUN', 'POL', 'ROU', 'SVK'],
+    'europe': None,
+}
+
+# Name of the files of each chart of the dropdown, the third one is named after the indicator of the data (see data.Schema)
+CHART_NAMES = {
+    1: 'sex',
+    2: 'age',
+    3: None,
+    4: 'trend',
+    5: 'wind-rose',
+}
+
+# Formats each figure can be exported to
+FORMATS = ['json', 'html']
+
+# Standalone page drawing a figure with the plotly.js release of the installed plotly, loaded from its CDN
+HTML_PAGE = """<html>
+<head><meta charset="utf-8" /><script src="https://cdn.plot.ly/plotly-{version}.min.js"></script></head>
+<body>
+<div id="figure" style="height:100%; width:100%;"></div>
+<script>var figure = {figure}; Plotly.newPlot("figure", figure.data, figure.layout, {{"responsive": true}});</script>
+</body>
+</html>
+"""
+
+# File listing the content hash of every output
+MANIFEST = 'manifest.json'
+
+# Figures rendered by each task of the process pool
+CHUNK_SIZE = 8
+
+# State of each process of the pool, set by start_worker
+_worker = {}
+
+###################################################################################################
+#                                                                                                 #
+#                                            FUNCTIONS                                            #
+#                                                                                                 #
+###################################################################################################
+
+def slug(text) -> str:
+    """This function turns a value into a file name friendly text.
+
+    Args:
+        text: The value (e.g. a BMI level).
+
+    Returns:
+        str: The lowercase text, with any other character replaced by dashes.
+    """
+    return re.sub(r'[^a-z0-9+]+', '-', str(text).lower()).strip('-')
+
+def figure_tasks(years:list, bmi_values:list, regions:dict, charts:list, label:str) -> list:
+    """This function enumerates the figures to export: every map (year by BMI
+    level) and every chart of each group of countries.
+
+    Args:
+        years (list): The years of the data.
+        bmi_values (list): The BMI levels of the data.
+        regions (dict): The groups of countries, by name (None for every country).
+        charts (list): The charts of the dropdown exported.
+        label (str): Name of the column of the indicator of the data (e.g. 'education').
+
+    Returns:
+        list: The figures, as (output name without extension, kind, arguments) tuples.
+    """
+    names = dict(CHART_NAMES)
+    names[3] = slug(label)
+    tasks = []
+    for year in years:
+        for bmi in bmi_values:
+            tasks.append(('maps/{0}_{1}'.format(year, slug(bmi)), 'map', (bmi, year)))
+    for region, countries in regions.items():
+        for chart_dropdown in charts:
+            for year in years:
+                for bmi in bmi_values:
+                    name = 'charts/{0}/{1}_{2}_{3}'.format(region, names[chart_dropdown], year, slug(bmi))
+                    tasks.append((name, 'chart', (countries, chart_dropdown, year, bmi)))
+    return tasks
+
+def write_file(path:str, content:str):
+    """This function atomically replaces a text file, creating its folder.
+
+    Args:
+        path (str): The path to the file.
+        content (str): The content of the file.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(handle, 'w', encoding='utf-8') as target:
+        target.write(content)
+    os.replace(temporary, path)
+
+def start_worker(data_file:str, output:str, formats:list, hashes:dict):
+    """This function loads, once per process of the pool, the data and the map
+    geometry. In shared mode the cube stored by the parent process is
+    memory-mapped instead of being built again.
+
+    Args:
+        data_file (str): The path to our data source file.
+        output (str): The folder of the outputs.
+        formats (list): The formats written.
+        hashes (dict): The content hash of each output of the previous export.
+    """
+    datasets = DatasetRefresher(data_file, load_geojson(os.path.join(APP_PATH, 'europe.geo.json')), interval=0)
+    _worker.update(dataset=datasets.current, output=output, formats=formats, hashes=hashes)
+
+def export_figures(tasks:list) -> list:
+    """This function renders some figures and writes the outputs whose content
+    changed since the previous export.
+
+    Args:
+        tasks (list): The figures (see figure_tasks).
+
+    Returns:
+        list: For each output, its (name, kind, content hash, bytes written) tuple, with 0 bytes if unchanged.
+    """
+    dataset = _worker['dataset']
+    results = []
+    for name, kind, arguments in tasks:
+        if kind == 'map':
+            figure = render_map(dataset.rollups, dataset.geo_cache, *arguments)
+        else:
+            countries, chart_dropdown, year, bmi = arguments
+            countries = set(dataset.cube.levels['alpha3']) if countries is None else set(countries)
+            figure = render_selected_data(dataset.rollups, countries, chart_dropdown, year, bmi)
+
+        serialized = pio.to_json(figure, validate=False)
+        digest = hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+        for extension in _worker['formats']:
+            path = '{0}.{1}'.format(name, extension)
+            target = os.path.join(_worker['output'], path)
+            if _worker['hashes'].get(path) == digest and os.path.exists(target):
+                results.append((path, kind, digest, 0))
+                continue
+            if extension == 'json':
+                content = serialized
+            else:
+                # Filled in directly, plotly.io.to_html serializes the figure again and hashes plotly.js on every call
+                content = HTML_PAGE.format(version=get_plotlyjs_version(), figure=serialized)
+            write_file(target, content)
+            results.append((path, kind, digest, len(content.encode('utf-8'))))
+    return results
+
+def export(data_file:str, output:str, formats:list=FORMATS, regions:dict=REGIONS, charts:list=list(CHART_NAMES),
+           workers:int=None) -> dict:
+    """This function exports every map and every chart of each group of
+    countries to static files, rendered across a pool of processes.
+
+    Outputs are written as soon as they are rendered, and only when their
+    content hash differs from the one in the manifest of the previous export.
+
+    Args:
+        data_file (str): The path to our data source file.
+        output (str): The folder of the outputs.
+        formats (list, optional): The formats written. Defaults to FORMATS.
+        regions (dict, optional): The groups of countries, by name. Defaults to REGIONS.
+        charts (list, optional): The charts of the dropdown exported. Defaults to every chart.
+        workers (int, optional): Processes rendering the figures, 0 renders them within this one. Defaults to None (one per CPU).
+
+    Returns:
+        dict: The figures rendered, the seconds taken and, by kind of figure (map or chart), the outputs written
+        and skipped and the bytes written.
+    """
+    for extension in formats:
+        if extension not in FORMATS:
+            raise ValueError("The format '{:s}' is not supported!!".format(extension))
+
+    manifest_file = os.path.join(output, MANIFEST)
+    previous = {}
+    if os.path.exists(manifest_file):
+        with open(manifest_file) as source:
+            previous = json.load(source).get('outputs', {})
+
+    # Loaded here first, so that in shared mode the processes of the pool find the cube already stored
+    start = time.perf_counter()
+    start_worker(data_file, output, formats, previous)
+    dataset = _worker['dataset']
+    tasks = figure_tasks(dataset.years.tolist(), dataset.bmi_values.tolist(), regions, charts, dataset.cube.schema.label)
+    chunks = [tasks[position:position + CHUNK_SIZE] for position in range(0, len(tasks), CHUNK_SIZE)]
+
+    os.makedirs(output, exist_ok=True)
+    hashes = {}
+    report = collections.defaultdict(lambda: {'written': 0, 'skipped': 0, 'bytes': 0})
+    try:
+        if workers == 0:
+            completed = map(export_figures, chunks)
+            pool = None
+        else:
+            pool = concurrent.futures.ProcessPoolExecutor(workers, initializer=start_worker, initargs=(data_file, output, formats, previous))
+            completed = pool.map(export_figures, chunks)
+        for results in completed:
+            for path, kind, digest, written in results:
+                hashes[path] = digest
+                report[kind]['written' if written else 'skipped'] += 1
+                report[kind]['bytes'] += written
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        # The outputs written so far are kept by the next export even if this one fails
+        write_json(manifest_file, {'version': dataset.version, 'outputs': dict(previous, **hashes)})
+
+    return {'figures': len(tasks), 'seconds': time.perf_counter() - start, 'kinds': dict(report)}
+
+###################################################################################################
+#                                                                                                 #
+#                                              MAIN                                               #
+#                                                                                                 #
+###################################################################################################
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Exports every map and every chart of each group of countries to static files.")
+    parser.add_argument('--data-file', default=os.environ.get("DATA_FILE", os.path.join(APP_PATH, "hlth_ehis_bm1e_linear.csv")))
+    parser.add_argument('--output', default=os.path.join(APP_PATH, 'export'))
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=FORMATS)
+    parser.add_argument('--regions', nargs='+', choices=list(REGIONS), default=list(REGIONS))
+    parser.add_argument('--charts', type=int, nargs='+', choices=list(CHART_NAMES), default=list(CHART_NAMES))
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    report = export(args.data_file, args.output, args.formats, {region: REGIONS[region] for region in args.regions}, args.charts, args.workers)
+    print("{:<6} {:>8} {:>8} {:>11}".format('kind', 'written', 'skipped', 'MB written'))
+    for kind, counts in report['kinds'].items():
+        print("{:<6} {:>8} {:>8} {:>11.2f}".format(kind, counts['written'], counts['skipped'], counts['bytes'] / 2 ** 20))
+    print("{:d} figures in {:.2f} s ({:.1f} figures/s)".format(report['figures'], report['seconds'], report['figures'] / report['seconds']))
@@ -0,0 +1,160 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - Figure cache                                           #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+import collections
+import json
+import threading
+
+import plotly.io as pio
+
+from metrics import phase
+
+###################################################################################################
+#                                                                                                 #
+#                                            CONSTANTS                                            #
+#                                                                                                 #
+###################################################################################################
+
+# Default bounds of the cache
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_MAX_BYTES = 64 * 2 ** 20
+
+###################################################################################################
+#                                                                                                 #
+#                                            FUNCTIONS                                            #
+#                                                                                                 #
+###################################################################################################
+
+def canonical_key(name:str, *inputs) -> tuple:
+    """This function builds the key of a figure from the inputs of its callback.
+    Collections (e.g. the selected countries) are turned into sorted tuples so
+    that the order in which they were given does not matter.
+
+    Args:
+        name (str): Name of the figure (e.g. the callback building it).
+        *inputs: The inputs of the callback.
+
+    Returns:
+        tuple: A hashable key.
+    """
+    key = [name]
+    for value in inputs:
+        if isinstance(value, (list, tuple, set, frozenset)):
+            value = tuple(sorted(frozenset(value)))
+        key.append(value)
+    return tuple(key)
+
+###################################################################################################
+#                                                                                                 #
+#                                             CLASSES                                             #
+#                                                                                                 #
+###################################################################################################
+
+class FigureCache:
+    """Bounded LRU cache of serialized figures shared by the callbacks of a process.
+
+    Figures are stored as JSON strings, the least recently used ones are evicted
+    once there are more than max_entries figures or they take more than max_bytes.
+
+    Args:
+        max_entries (int, optional): Maximum number of figures. Defaults to DEFAULT_MAX_ENTRIES.
+        max_bytes (int, optional): Maximum size of the stored JSON. Defaults to DEFAULT_MAX_BYTES.
+    """
+
+    def __init__(self, max_entries:int=DEFAULT_MAX_ENTRIES, max_bytes:int=DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key:tuple) -> str:
+        """This function returns a stored figure, marking it as recently used.
+
+        Args:
+            key (tuple): The key of the figure (see canonical_key).
+
+        Returns:
+            str: The serialized figure, or None if it is not stored.
+        """
+        with self._lock:
+            serialized = self._entries.get(key)
+            if serialized is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return serialized
+
+    def put(self, key:tuple, serialized:str):
+        """This function stores a figure, evicting the least recently used ones if needed.
+        Figures bigger than max_bytes are not stored.
+
+        Args:
+            key (tuple): The key of the figure (see canonical_key).
+            serialized (str): The serialized figure.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= len(self._entries.pop(key))
+            if len(serialized) > self.max_bytes:
+                return
+            self._entries[key] = serialized
+            self._bytes += len(serialized)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def fetch(self, key:tuple, build) -> dict:
+        """This function returns a figure from the cache, building and storing it if needed.
+
+        Args:
+            key (tuple): The key of the figure (see canonical_key).
+            build (callable): Function without arguments returning the figure.
+
+        Returns:
+            dict: The figure, ready to be returned by a callback.
+        """
+        serialized = self.get(key)
+        if serialized is None:
+            figure = build()
+            with phase('serialize'):
+                serialized = pio.to_json(figure, validate=False)
+            self.put(key, serialized)
+        return json.loads(serialized)
+
+    def clear(self):
+        """This function removes every stored figure."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """This function returns the counters of the cache.
+
+        Returns:
+            dict: Hits, misses, evictions, stored entries and bytes.
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+            }
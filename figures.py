@@ -0,0 +1,470 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - Figures                                                #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+import functools
+import json
+
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+
+from cube import TOTAL, DataCube
+from geo import GeoCache, MAP_HEIGHT
+from metrics import phase
+from rollup import Rollups
+
+###################################################################################################
+#                                                                                                 #
+#                                            CONSTANTS                                            #
+#                                                                                                 #
+###################################################################################################
+
+# Column giving the colour of each histogram, by chart_dropdown value: its position within the
+# breakdowns of the schema of the data (sex, age and the column of the indicator, see data.Schema)
+HISTOGRAM_CHARTS = {
+    1: 0,
+    2: 1,
+    3: 2
+}
+
+AREA_CHART = 4
+
+WIND_ROSE_CHART = 5
+
+# Countries above which a chart switches to its large-selection mode (0 disables it)
+LARGE_SELECTION = 0
+
+# Countries drawn in the large-selection mode, the other ones are averaged into an 'Others' bucket
+TOP_COUNTRIES = 10
+
+# Maximum number of points drawn by a chart in the large-selection mode
+MAX_POINTS = 5000
+
+# Trace keys of the area chart not supported by its WebGL version
+WEBGL_DROPPED_KEYS = ('stackgroup', 'fillpattern', 'orientation', 'alignmentgroup', 'offsetgroup')
+
+# Figures returned when there is nothing to draw
+EMPTY_SELECTION = dict(
+    data=[dict(x=0, y=0)],
+    layout=dict(
+        title="Drag over the map to select countries",
+        paper_bgcolor="#1f2630",
+        plot_bgcolor="#1f2630",
+        font=dict(color="#05C3DD"),
+        margin=dict(t=75, r=50, b=100, l=75),
+    ),
+)
+
+UNKNOWN_CHART = dict(
+    data=[dict(x=0, y=0)],
+    layout=dict(
+        title="Ups! Something's gone wrong... :S",
+        paper_bgcolor="#1f2630",
+        plot_bgcolor="#1f2630",
+        font=dict(color="#05C3DD"),
+        margin=dict(t=75, r=50, b=100, l=75),
+    ),
+)
+
+###################################################################################################
+#                                                                                                 #
+#                                             CLASSES                                             #
+#                                                                                                 #
+###################################################################################################
+
+class ChartTemplate:
+    """Figure built once with plotly express and reused as a plain dictionary.
+
+    The traces of the template are used as prototypes: the i-th group of a chart
+    copies the i-th prototype (so it gets the same colour plotly express would
+    give it) and only its name and data arrays are filled in, without going
+    through the validation of plotly.graph_objects. Templates are shared by
+    every request, so the dictionaries returned by render must not be modified.
+
+    Args:
+        figure (Figure): The figure built with plotly express over sample groups.
+        column (str): Column used to colour the groups.
+        cycle (int): Number of colours of the sequence used by plotly express.
+    """
+
+    def __init__(self, figure, column:str, cycle:int):
+        figure = figure.to_plotly_json()
+        self.layout = figure['layout']
+        self.column = column
+        self.cycle = cycle
+        self.prototypes = []
+        for trace in figure['data']:
+            prefix = '{0}={1}'.format(column, trace['name'])
+            prototype = {key: value for key, value in trace.items() if key not in ('x', 'y', 'r', 'theta', 'locations', 'z')}
+            prototype['hovertemplate'] = trace['hovertemplate'][len(prefix):]
+            self.prototypes.append(prototype)
+
+    def trace(self, position:int, name:str, arrays:dict) -> dict:
+        """This function builds the trace of a group.
+
+        Args:
+            position (int): Position of the group within the chart.
+            name (str): Name of the group.
+            arrays (dict): Data arrays of the trace (e.g. 'x' and 'y').
+
+        Returns:
+            dict: The trace.
+        """
+        if position >= len(self.prototypes):
+            position = (position - 1) % self.cycle + 1
+        trace = dict(self.prototypes[position], name=name, legendgroup=name, **arrays)
+        trace['hovertemplate'] = '{0}={1}'.format(self.column, name) + trace['hovertemplate']
+        return trace
+
+    def render(self, traces:list, title:str, axis_title:str) -> dict:
+        """This function builds the figure.
+
+        Args:
+            traces (list): The traces built with ChartTemplate.trace.
+            title (str): Title of the figure.
+            axis_title (str): Title of the y axis.
+
+        Returns:
+            dict: The figure.
+        """
+        layout = dict(self.layout)
+        layout['title'] = dict(layout['title'], text=title)
+        layout['yaxis'] = dict(layout['yaxis'], title={'text': axis_title})
+        return {'data': traces, 'layout': layout}
+
+###################################################################################################
+#                                                                                                 #
+#                                            FUNCTIONS                                            #
+#                                                                                                 #
+###################################################################################################
+
+def style_chart(fig, chart_dropdown:int):
+    """This function applies the style of our dashboard to a chart built with plotly express.
+
+    Args:
+        fig (Figure): The chart.
+        chart_dropdown (int): The chart selected.
+    """
+    fig_layout = fig["layout"]
+    fig_layout["yaxis"]["title"] = ""
+    fig_layout["xaxis"]["title"] = ""
+    fig_layout["title"] = ""
+    fig_layout["yaxis"]["fixedrange"] = True
+    fig_layout["xaxis"]["fixedrange"] = False
+    fig_layout["paper_bgcolor"] = "#1f2630"
+    fig_layout["font"]["color"] = "#05C3DD"
+    fig_layout["xaxis"]["tickfont"]["color"] = "#05C3DD"
+    fig_layout["yaxis"]["tickfont"]["color"] = "#05C3DD"
+    fig_layout["xaxis"]["gridcolor"] = "#5b5b5b"
+    fig_layout["yaxis"]["gridcolor"] = "#5b5b5b"
+    fig_layout["font"]["color"] = "#05C3DD"
+    fig_layout["title"]["font"]["color"] = "#05C3DD"
+    fig_layout["hovermode"] = "closest"
+    fig_layout["legend"] = dict(orientation="v")
+    fig_layout["autosize"] = True
+    fig_layout["margin"]["t"] = 75
+    fig_layout["margin"]["r"] = 50
+    fig_layout["margin"]["b"] = 100
+    fig_layout["margin"]["l"] = 50
+
+    if chart_dropdown in HISTOGRAM_CHARTS:
+        fig_data = fig["data"]
+        fig_data[0]["marker"]["color"] = "#05C3DD"
+        fig_data[0]["marker"]["opacity"] = 1
+        fig_data[0]["marker"]["line"]["width"] = 0
+        fig_data[0]["textposition"] = "outside"
+
+@functools.lru_cache(maxsize=None)
+def chart_template(chart_dropdown:int, column:str=None) -> ChartTemplate:
+    """This function builds, once per chart and column, the template used to render it.
+
+    Args:
+        chart_dropdown (int): The chart selected.
+        column (str, optional): Column giving the colour of a histogram (see histogram_column). Defaults to None.
+
+    Returns:
+        ChartTemplate: The template of the chart.
+    """
+    # plotly.express is only needed by the templates, importing it on first use speeds up the boot
+    import plotly.express as px
+
+    if chart_dropdown == WIND_ROSE_CHART:
+        colours = px.colors.sequential.Plasma_r
+        column = 'bmi'
+    else:
+        colours = px.colors.qualitative.Plotly
+        column = column if chart_dropdown in HISTOGRAM_CHARTS else 'country'
+
+    # One sample group more than colours, so the prototypes cover the whole cycle after the first one
+    sample = pd.DataFrame({
+        'OBS_VALUE': 1.0,
+        'TIME_PERIOD': 0,
+        'country': 'country',
+        column: ['group {:d}'.format(group) for group in range(len(colours) + 1)],
+    })
+
+    if chart_dropdown in HISTOGRAM_CHARTS:
+        fig = px.histogram(sample, x="OBS_VALUE", y="country", color=column)
+    elif chart_dropdown == AREA_CHART:
+        fig = px.area(sample, y="OBS_VALUE", x="TIME_PERIOD", color=column)
+    else:
+        fig = px.bar_polar(sample, r="OBS_VALUE", theta="country", color=column, color_discrete_sequence=colours, title="")
+    style_chart(fig, chart_dropdown)
+    return ChartTemplate(fig, column, len(colours))
+
+def histogram_column(cube:DataCube, chart_dropdown:int) -> str:
+    """This function returns the column giving the colour of a histogram for the schema of our data.
+
+    Args:
+        cube (DataCube): Our data.
+        chart_dropdown (int): The chart selected, one of HISTOGRAM_CHARTS.
+
+    Returns:
+        str: The column.
+    """
+    return cube.schema.breakdowns[HISTOGRAM_CHARTS[chart_dropdown]]
+
+@functools.lru_cache(maxsize=None)
+def map_template() -> dict:
+    """This function builds, once, the template used to render the map.
+
+    Returns:
+        dict: The map built over an empty sample, as a dictionary.
+    """
+    import plotly.express as px
+
+    sample = pd.DataFrame({'alpha3': ['ESP'], 'OBS_VALUE': [0.0]})
+    fig = px.choropleth(sample, geojson={'type': 'FeatureCollection', 'features': []}, color="OBS_VALUE",
+    locations="alpha3", featureidkey="properties.iso_a3", range_color=[0, 1])
+
+    fig.update_geos(fitbounds="locations", visible=True)
+    fig.update_layout(margin={"r":0,"t":0,"l":0,"b":0}, height=MAP_HEIGHT, paper_bgcolor="#F4F4F8", dragmode="select")
+    return fig.to_plotly_json()
+
+def render_map(rollups:Rollups, geo_cache:GeoCache, bmi:str, year:int) -> dict:
+    """This function builds the heatmap of a BMI level for a year.
+
+    Args:
+        rollups (Rollups): The projections of our data.
+        geo_cache (GeoCache): The map geometry.
+        bmi (str): The BMI level.
+        year (int): The year.
+
+    Returns:
+        dict: The map.
+    """
+    with phase('slice'):
+        locations, values = rollups.map_totals(bmi, year)
+
+    with phase('figure'):
+        # Geometry detailed enough for the area fitted by the map (the zoom of the user is not followed)
+        countries = geo_cache.pick(locations, MAP_HEIGHT)
+
+        template = map_template()
+        trace = dict(template['data'][0], geojson=countries, locations=locations, z=values)
+        layout = dict(template['layout'])
+        bounds = (values.min(), values.max()) if len(values) else (np.nan, np.nan)
+        layout['coloraxis'] = dict(layout['coloraxis'], cmin=bounds[0], cmax=bounds[1])
+        return {'data': [trace], 'layout': layout}
+
+def keep_top(block:np.ndarray, countries:np.ndarray, ranking:np.ndarray, top:int) -> tuple:
+    """This function keeps the top ranked countries of a block of values (one
+    column per country) and averages the other ones into an 'Others' column.
+
+    Args:
+        block (np.ndarray): The values, one row per group and one column per country.
+        countries (np.ndarray): The names of the countries.
+        ranking (np.ndarray): The value each country is ranked by (NaN ranks last).
+        top (int): Number of countries kept.
+
+    Returns:
+        tuple: The reduced block and its country names.
+    """
+    order = np.argsort(np.where(np.isnan(ranking), -np.inf, ranking), kind='stable')[::-1]
+    kept, others = np.sort(order[:top]), order[top:]
+    if len(others) == 0:
+        return block, countries
+
+    rest = block[:, others]
+    counts = (~np.isnan(rest)).sum(axis=1)
+    averages = np.full(len(block), np.nan)
+    np.divide(np.nansum(rest, axis=1), counts, out=averages, where=counts > 0)
+    names = np.append(countries[kept], 'Others ({:d})'.format(len(others))).astype(object)
+    return np.column_stack([block[:, kept], averages]), names
+
+def downsample(row:np.ndarray, limit:int) -> np.ndarray:
+    """This function returns the positions of at most limit points of a series,
+    evenly spaced and including its last point.
+
+    Args:
+        row (np.ndarray): The series.
+        limit (int): Maximum number of points.
+
+    Returns:
+        np.ndarray: The positions of the points kept.
+    """
+    if len(row) <= limit:
+        return np.arange(len(row))
+    return np.unique(np.append(np.linspace(0, len(row) - 1, max(limit - 1, 1)).astype(int), len(row) - 1))
+
+def render_selected_data(rollups:Rollups, sel_countries:set, chart_dropdown:int, year:int, bmi:str,
+                         large_selection:int=LARGE_SELECTION, top_countries:int=TOP_COUNTRIES, max_points:int=MAX_POINTS) -> dict:
+    """This function builds the chart selected within the dropdown for the
+    countries selected over the map.
+
+    When large_selection is set and more countries than it (and than
+    top_countries) have values the chart switches to its large-selection mode:
+    only the top_countries countries with the highest values (for the selected
+    BMI level) are drawn and the other ones are averaged into an 'Others'
+    bucket, the trend is drawn with WebGL lines, which drop its stackgroup so
+    it is no longer a stacked area chart, and every series is downsampled so
+    that the chart has at most max_points points.
+
+    Args:
+        rollups (Rollups): The projections of our data.
+        sel_countries (set): The alpha3 codes of the selected countries.
+        chart_dropdown (int): The chart selected.
+        year (int): The year.
+        bmi (str): The BMI level.
+        large_selection (int, optional): Countries above which the large-selection mode is used (0 disables it). Defaults to LARGE_SELECTION.
+        top_countries (int, optional): Countries drawn in the large-selection mode. Defaults to TOP_COUNTRIES.
+        max_points (int, optional): Maximum number of points of the chart. Defaults to MAX_POINTS.
+
+    Returns:
+        dict: The chart.
+    """
+    with phase('slice'):
+        # Locations outside of our data (e.g. non EU regions) are ignored by the cube
+        positions = rollups.selection(sel_countries)
+        countries = rollups.countries[positions]
+        column = histogram_column(rollups.cube, chart_dropdown) if chart_dropdown in HISTOGRAM_CHARTS else None
+        if chart_dropdown in HISTOGRAM_CHARTS:
+            # One group per column level, one point per country
+            block, names = rollups.by_level(column, bmi, year, positions)
+            labels, drawn = countries, ~np.isnan(block).all(axis=0)
+        elif chart_dropdown == AREA_CHART:
+            # One group per country, one point per year
+            block, labels = rollups.trend(bmi, positions)
+            names, drawn = countries, ~np.isnan(block).all(axis=1)
+        elif chart_dropdown == WIND_ROSE_CHART:
+            # One group per BMI level, one point per country
+            block, names = rollups.snapshot(year, positions)
+            labels, drawn = countries, ~np.isnan(block).all(axis=0)
+        else:
+            return UNKNOWN_CHART
+
+        selected = int(drawn.sum())
+        # Nothing to bucket unless more countries than the ones kept are drawn
+        large = 0 < large_selection < selected and selected > top_countries
+        if large:
+            # Countries without any value are left out of the 'Others' bucket
+            if chart_dropdown == AREA_CHART:
+                # Countries ranked by their mean over the years
+                block, names = block[drawn], names[drawn]
+                block, names = keep_top(block.T, names, np.nanmean(block, axis=1), top_countries)
+                block = block.T
+            else:
+                # Countries ranked by their value for the BMI level (wind rose) or their mean over the groups
+                block, labels = block[:, drawn], labels[drawn]
+                levels = list(names)
+                if chart_dropdown == WIND_ROSE_CHART and bmi in levels:
+                    ranking = block[levels.index(bmi)]
+                else:
+                    ranking = np.nanmean(block, axis=0)
+                block, labels = keep_top(block, labels, ranking, top_countries)
+
+    with phase('figure'):
+        template = chart_template(chart_dropdown, column)
+        limit = max(max_points // max(len(block), 1), 1)
+        traces = []
+        for name, row in zip(names, block):
+            # Groups without any value get no trace, as with DataFrame.groupby
+            points = ~np.isnan(row)
+            if not points.any():
+                continue
+            if large and points.sum() > limit:
+                positions = np.flatnonzero(points)
+                points = np.zeros(len(row), dtype=bool)
+                points[positions[downsample(positions, limit)]] = True
+            if chart_dropdown in HISTOGRAM_CHARTS:
+                arrays = {'x': row[points], 'y': labels[points]}
+            elif chart_dropdown == AREA_CHART:
+                arrays = {'x': labels[points], 'y': row[points]}
+            else:
+                arrays = {'r': row[points], 'theta': labels[points]}
+            trace = template.trace(len(traces), name, arrays)
+            if large and chart_dropdown == AREA_CHART:
+                trace = {key: value for key, value in trace.items() if key not in WEBGL_DROPPED_KEYS}
+                trace['type'] = 'scattergl'
+            traces.append(trace)
+
+        if chart_dropdown in HISTOGRAM_CHARTS:
+            axis_title = "Percentage of people with '<b>{0}</b>' BMI by {2} (<b>{1}</b>)".format(bmi, year, rollups.cube.schema.labels[column])
+        elif chart_dropdown == AREA_CHART:
+            axis_title = "Trend for people with '<b>{0}</b>' BMI (2014-2019)".format(bmi)
+        else:
+            axis_title = "Wind rose of all BMIs for year <b>{0}</b>".format(year)
+
+        title = "<b>{0}</b> countries selected".format(selected)
+        if large:
+            title += " (top {0} shown)".format(top_countries)
+        return template.render(traces, title, axis_title)
+
+def client_store(cube:DataCube) -> dict:
+    """This function builds the compact version of our data shipped once to the
+    browser, so that the clientside callbacks can draw the charts.
+
+    Only the slices used by the charts are kept: for each column broken down by
+    a histogram (sex, age and the column of the indicator) the values with the
+    other two columns at 'Total', by BMI level, column level, country and year.
+    The column and label of each histogram and the templates of the charts are
+    shipped too.
+
+    Args:
+        cube (DataCube): Our data.
+
+    Returns:
+        dict: The data, ready to be stored in a dcc.Store.
+    """
+    charts = {chart_dropdown: histogram_column(cube, chart_dropdown) for chart_dropdown in HISTOGRAM_CHARTS}
+    edges = {}
+    for column in charts.values():
+        indexes = [cube.index(dimension, None if dimension in (column, 'bmi', 'alpha3', 'TIME_PERIOD') else TOTAL) for dimension in cube.dimensions]
+        values = cube.values[np.ix_(*indexes)]
+        values = values.reshape([len(index) for dimension, index in zip(cube.dimensions, indexes) if dimension in (column, 'bmi', 'alpha3', 'TIME_PERIOD')])
+        edges[column] = {
+            'shape': list(values.shape),
+            'values': np.where(np.isnan(values), None, values).ravel().tolist(),
+        }
+
+    # The plotly theme is the same for every chart, so it is shipped only once
+    templates = {}
+    for chart_dropdown in list(HISTOGRAM_CHARTS) + [AREA_CHART, WIND_ROSE_CHART]:
+        template = chart_template(chart_dropdown, charts.get(chart_dropdown))
+        templates[chart_dropdown] = json.loads(pio.json.to_json_plotly({
+            'layout': {key: value for key, value in template.layout.items() if key != 'template'},
+            'prototypes': template.prototypes,
+            'column': template.column,
+            'cycle': template.cycle,
+        }))
+    theme = json.loads(pio.json.to_json_plotly(chart_template(AREA_CHART).layout['template']))
+
+    return {
+        'total': TOTAL,
+        'levels': {dimension: cube.levels[dimension].tolist() for dimension in cube.dimensions},
+        'countries': cube.countries.tolist(),
+        'charts': charts,
+        'labels': cube.schema.labels,
+        'edges': edges,
+        'templates': templates,
+        'theme': theme,
+    }
@@ -0,0 +1,220 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - Map geometry                                           #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+import json
+import threading
+
+import numpy as np
+
+###################################################################################################
+#                                                                                                 #
+#                                            CONSTANTS                                            #
+#                                                                                                 #
+###################################################################################################
+
+# Douglas-Peucker tolerances (in degrees) of the precomputed geometry levels
+TOLERANCES = (0.0, 0.02, 0.05, 0.1)
+
+# Height (in pixels) of the map, used to estimate the size of a pixel in degrees
+MAP_HEIGHT = 630
+
+###################################################################################################
+#                                                                                                 #
+#                                            FUNCTIONS                                            #
+#                                                                                                 #
+###################################################################################################
+
+def load_geojson(geo_file:str) -> dict:
+    """This function reads the GeoJSON file used to draw the map.
+
+    Args:
+        geo_file (str): The path to the GeoJSON file.
+
+    Raises:
+        FileNotFoundError: Raised if the path given is not a file
+
+    Returns:
+        dict: The parsed GeoJSON.
+    """
+    try:
+        with open(geo_file, 'r') as geo:
+            return json.load(geo)
+    except (FileNotFoundError, IsADirectoryError):
+        raise FileNotFoundError("The path given as parameter is not a file!!")
+
+
+def simplify_ring(ring:list, tolerance:float) -> list:
+    """This function simplifies a closed ring of coordinates using the
+    Douglas-Peucker algorithm.
+
+    Args:
+        ring (list): The [lon, lat] pairs of the ring, the first one repeated at the end.
+        tolerance (float): Maximum distance (in degrees) between the original and the simplified ring.
+
+    Returns:
+        list: The simplified ring. The original one is returned if it would collapse.
+    """
+    if tolerance <= 0 or len(ring) <= 4:
+        return ring
+
+    points = np.asarray(ring, dtype=float)
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+
+    # Closed rings have the same start and end, so split them at the farthest point
+    farthest = int(np.argmax(np.hypot(*(points - points[0]).T)))
+    keep[farthest] = True
+    stack = [(0, farthest), (farthest, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start, end = points[first], points[last]
+        segment = end - start
+        inner = points[first + 1:last]
+        length = np.hypot(*segment)
+        if length == 0:
+            distances = np.hypot(*(inner - start).T)
+        else:
+            distances = np.abs(segment[0] * (inner[:, 1] - start[1]) - segment[1] * (inner[:, 0] - start[0])) / length
+        split = int(np.argmax(distances))
+        if distances[split] > tolerance:
+            split += first + 1
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+
+    if keep.sum() < 4:
+        return ring
+    return points[keep].tolist()
+
+
+def simplify_geometry(geometry:dict, tolerance:float) -> dict:
+    """This function simplifies every ring of a Polygon or MultiPolygon geometry.
+
+    Args:
+        geometry (dict): The GeoJSON geometry.
+        tolerance (float): Tolerance given to simplify_ring.
+
+    Returns:
+        dict: A new geometry with the simplified rings.
+    """
+    if geometry['type'] == 'Polygon':
+        coordinates = [simplify_ring(ring, tolerance) for ring in geometry['coordinates']]
+    else:
+        coordinates = [[simplify_ring(ring, tolerance) for ring in polygon] for polygon in geometry['coordinates']]
+    return {'type': geometry['type'], 'coordinates': coordinates}
+
+
+def geometry_bounds(geometry:dict) -> tuple:
+    """This function computes the bounding box of a Polygon or MultiPolygon geometry.
+
+    Args:
+        geometry (dict): The GeoJSON geometry.
+
+    Returns:
+        tuple: (min lon, min lat, max lon, max lat)
+    """
+    polygons = [geometry['coordinates']] if geometry['type'] == 'Polygon' else geometry['coordinates']
+    points = np.concatenate([np.asarray(ring, dtype=float) for polygon in polygons for ring in polygon])
+    return tuple(points.min(axis=0).tolist() + points.max(axis=0).tolist())
+
+###################################################################################################
+#                                                                                                 #
+#                                             CLASSES                                             #
+#                                                                                                 #
+###################################################################################################
+
+class GeoCache:
+    """Parsed map geometry shared by every map callback.
+
+    Only the features of the countries found within our data are kept, stripped
+    of every property but 'iso_a3', and simplified once per tolerance, when a
+    map first needs it. The level is picked from the extent of the countries
+    drawn, the map being fitted to them, not from the zoom of the user: zooming
+    in keeps the outlines of that level. With the European data every map is
+    drawn with the coarsest levels, so the finer ones are never built. The
+    objects returned are shared between requests, so they must not be modified.
+
+    Args:
+        geojson (dict): The GeoJSON returned by load_geojson.
+        locations (iterable): The alpha3 codes used by our data.
+        tolerances (tuple, optional): Tolerances of the precomputed levels. Defaults to TOLERANCES.
+    """
+
+    def __init__(self, geojson:dict, locations, tolerances:tuple=TOLERANCES):
+        locations = set(locations)
+        features = [feature for feature in geojson['features'] if feature['properties']['iso_a3'] in locations]
+
+        self.tolerances = tuple(sorted(tolerances))
+        self.bounds = {feature['properties']['iso_a3']: geometry_bounds(feature['geometry']) for feature in features}
+        self.levels = {}
+        self._features = features
+        self._lock = threading.Lock()
+
+    def level(self, tolerance:float) -> dict:
+        """This function returns the geometry simplified with a tolerance, building it the first time.
+
+        Args:
+            tolerance (float): One of the precomputed tolerances.
+
+        Returns:
+            dict: A shared, read-only GeoJSON FeatureCollection.
+        """
+        level = self.levels.get(tolerance)
+        if level is None:
+            with self._lock:
+                level = self.levels.get(tolerance)
+                if level is None:
+                    level = self.levels[tolerance] = {
+                        'type': 'FeatureCollection',
+                        'features': [
+                            {
+                                'type': 'Feature',
+                                'properties': {'iso_a3': feature['properties']['iso_a3']},
+                                'geometry': simplify_geometry(feature['geometry'], tolerance),
+                            }
+                            for feature in self._features
+                        ],
+                    }
+        return level
+
+    def tolerance(self, locations, height:int=MAP_HEIGHT) -> float:
+        """This function picks the coarsest tolerance that keeps the error of the
+        simplified geometry below one pixel once the map is fitted to the locations.
+
+        Args:
+            locations (iterable): The alpha3 codes drawn in the map.
+            height (int, optional): Height of the map in pixels. Defaults to MAP_HEIGHT.
+
+        Returns:
+            float: One of the precomputed tolerances.
+        """
+        bounds = [self.bounds[location] for location in locations if location in self.bounds]
+        if not bounds:
+            return self.tolerances[0]
+        bounds = np.array(bounds)
+        span = max(bounds[:, 2].max() - bounds[:, 0].min(), bounds[:, 3].max() - bounds[:, 1].min())
+        pixel = span / height
+        return max(tolerance for tolerance in self.tolerances if tolerance <= max(pixel, self.tolerances[0]))
+
+    def pick(self, locations, height:int=MAP_HEIGHT) -> dict:
+        """This function returns the geometry level to use to draw some locations.
+
+        Args:
+            locations (iterable): The alpha3 codes drawn in the map.
+            height (int, optional): Height of the map in pixels. Defaults to MAP_HEIGHT.
+
+        Returns:
+            dict: A shared, read-only GeoJSON FeatureCollection.
+        """
+        return self.level(self.tolerance(locations, height))
@@ -0,0 +1,27 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - Gunicorn settings                                      #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+import os
+
+from renderpool import DEFAULT_REQUEST_THREADS
+
+# Import the app (and load the data) once in the master process, the workers are forked from it
+# and share the memory-mapped data cube (GUNICORN_PRELOAD=0 disables it). With BACKGROUND_LOAD=1
+# each worker imports the app and loads the data itself by default, so that it serves right away
+preload_app = os.environ.get("GUNICORN_PRELOAD", "0" if os.environ.get("BACKGROUND_LOAD", "0") == "1" else "1") != "0"
+
+# Threaded workers, so that a slow callback does not block every other request of its worker
+# (GUNICORN_WORKER_CLASS=sync restores the default workers)
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+
+# Requests served at once by each worker, the figures they build are bounded by RENDER_THREADS
+threads = int(os.environ.get("GUNICORN_THREADS", DEFAULT_REQUEST_THREADS))
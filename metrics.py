@@ -0,0 +1,251 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - Instrumentation                                        #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+import collections
+import contextlib
+import contextvars
+import cProfile
+import functools
+import io
+import pstats
+import threading
+import time
+
+###################################################################################################
+#                                                                                                 #
+#                                            CONSTANTS                                            #
+#                                                                                                 #
+###################################################################################################
+
+# Quantiles reported for every series
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Number of recent observations used to compute the quantiles of a series
+WINDOW = 1024
+
+# Prefix of the exported metrics
+PREFIX = 'fitorfat'
+
+###################################################################################################
+#                                                                                                 #
+#                                             CLASSES                                             #
+#                                                                                                 #
+###################################################################################################
+
+class Summary:
+    """Count, sum and quantiles (over the last WINDOW observations) of a timing series."""
+
+    def __init__(self, window:int=WINDOW):
+        self.count = 0
+        self.total = 0.0
+        self.window = collections.deque(maxlen=window)
+
+    def observe(self, seconds:float):
+        self.count += 1
+        self.total += seconds
+        self.window.append(seconds)
+
+    def quantiles(self) -> dict:
+        """This function computes the quantiles of the recent observations.
+
+        Returns:
+            dict: The value of each quantile of QUANTILES.
+        """
+        ordered = sorted(self.window)
+        if not ordered:
+            return {quantile: float('nan') for quantile in QUANTILES}
+        return {quantile: ordered[min(int(quantile * len(ordered)), len(ordered) - 1)] for quantile in QUANTILES}
+
+
+class Metrics:
+    """Registry of the timing series of a process, exported in Prometheus text format."""
+
+    def __init__(self):
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, metric:str, labels:tuple, seconds:float):
+        """This function records an observation.
+
+        Args:
+            metric (str): Name of the metric, without PREFIX.
+            labels (tuple): (name, value) pairs identifying the series.
+            seconds (float): The observed time.
+        """
+        with self._lock:
+            series = self._series.get((metric, labels))
+            if series is None:
+                series = self._series[(metric, labels)] = Summary()
+            series.observe(seconds)
+
+    def snapshot(self) -> dict:
+        """This function returns the current state of every series.
+
+        Returns:
+            dict: count, sum and quantiles by (metric, labels).
+        """
+        with self._lock:
+            return {
+                key: {'count': series.count, 'sum': series.total, 'quantiles': series.quantiles()}
+                for key, series in self._series.items()
+            }
+
+    def prometheus(self, counters:dict=None, labels:tuple=()) -> str:
+        """This function exports the series in Prometheus text format.
+
+        Args:
+            counters (dict, optional): Additional counters to export, by name (without PREFIX). Defaults to None.
+            labels (tuple, optional): (name, value) pairs added to every series and counter (e.g. the worker). Defaults to ().
+
+        Returns:
+            str: The exposition text.
+        """
+        lines = []
+        exported = set()
+        common = list(labels)
+        for (metric, series_labels), series in sorted(self.snapshot().items()):
+            name = '{0}_{1}'.format(PREFIX, metric)
+            if name not in exported:
+                lines.append('# TYPE {0} summary'.format(name))
+                exported.add(name)
+            label_text = ','.join('{0}="{1}"'.format(key, escape(value)) for key, value in common + list(series_labels))
+            for quantile, value in series['quantiles'].items():
+                lines.append('{0}{{{1}}} {2!r}'.format(name, ','.join(filter(None, [label_text, 'quantile="{0}"'.format(quantile)])), value))
+            lines.append('{0}_sum{{{1}}} {2!r}'.format(name, label_text, series['sum']))
+            lines.append('{0}_count{{{1}}} {2:d}'.format(name, label_text, series['count']))
+        for metric, value in sorted((counters or {}).items()):
+            lines.append('# TYPE {0}_{1} counter'.format(PREFIX, metric))
+            label_text = ','.join('{0}="{1}"'.format(key, escape(value)) for key, value in common)
+            lines.append('{0}_{1}{2} {3!r}'.format(PREFIX, metric, '{{{0}}}'.format(label_text) if label_text else '', value))
+        return '\n'.join(lines) + '\n'
+
+
+class Profiler:
+    """cProfile based profiler of the callbacks, turned on and off at runtime.
+
+    cProfile only sees the thread it runs in, so each call is profiled on its
+    own thread (e.g. the callback on a request thread and its figure on a
+    thread of the render pool) and the profiles are merged into one report.
+    Calls made within a call already being profiled on the same thread are
+    part of its profile.
+    """
+
+    def __init__(self):
+        self.active = False
+        self._stats = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def start(self):
+        with self._lock:
+            self._stats = None
+        self.active = True
+
+    def stop(self):
+        self.active = False
+
+    def run(self, function, *args, **kwargs):
+        """This function calls a function, profiling it if the profiler is active."""
+        if not self.active or getattr(self._local, 'profiling', False):
+            return function(*args, **kwargs)
+        profile = cProfile.Profile()
+        self._local.profiling = True
+        try:
+            return profile.runcall(function, *args, **kwargs)
+        finally:
+            self._local.profiling = False
+            with self._lock:
+                if self._stats is None:
+                    self._stats = pstats.Stats(profile)
+                else:
+                    self._stats.add(profile)
+
+    def report(self, limit:int=50) -> str:
+        """This function returns the collected profile, sorted by cumulative time.
+
+        Args:
+            limit (int, optional): Number of functions to report. Defaults to 50.
+
+        Returns:
+            str: The pstats report.
+        """
+        report = io.StringIO()
+        with self._lock:
+            if self._stats is None:
+                return "The profiler has not been started!!\n"
+            self._stats.stream = report
+            self._stats.sort_stats('cumulative').print_stats(limit)
+        return report.getvalue()
+
+###################################################################################################
+#                                                                                                 #
+#                                            FUNCTIONS                                            #
+#                                                                                                 #
+###################################################################################################
+
+def escape(value) -> str:
+    """This function escapes a label value as required by the Prometheus text format.
+
+    Args:
+        value: The label value.
+
+    Returns:
+        str: The value with its backslashes, double quotes and line feeds escaped.
+    """
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+# Registry and profiler shared by the whole process
+METRICS = Metrics()
+PROFILER = Profiler()
+
+# Callback being run, copied along with the context to the threads rendering its figures
+_current = contextvars.ContextVar('callback', default=None)
+
+def instrument(callback:str):
+    """This function decorates a callback so that its time (phase 'total') and
+    the time of the phases run within it are recorded, and so that it can be
+    profiled by PROFILER.
+
+    Args:
+        callback (str): Name of the callback.
+
+    Returns:
+        callable: The decorator.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            token = _current.set(callback)
+            start = time.perf_counter()
+            try:
+                return PROFILER.run(function, *args, **kwargs)
+            finally:
+                METRICS.observe('callback_seconds', (('callback', callback), ('phase', 'total')), time.perf_counter() - start)
+                _current.reset(token)
+        return wrapper
+    return decorator
+
+@contextlib.contextmanager
+def phase(name:str):
+    """This function times a phase of the callback being run. Nothing is
+    recorded when it is not run within an instrumented callback.
+
+    Args:
+        name (str): Name of the phase (e.g. 'slice', 'figure' or 'serialize').
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        callback = _current.get()
+        if callback is not None:
+            METRICS.observe('callback_seconds', (('callback', callback), ('phase', name)), time.perf_counter() - start)
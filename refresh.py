@@ -0,0 +1,235 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - Dataset refresh                                        #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+import os
+import threading
+
+from cube import DataCube, cached_cube, load_cube, store_cube
+from data import appended_to, cache_meta, file_fingerprint, read_data, stream_data
+from geo import GeoCache
+from rollup import Rollups
+
+###################################################################################################
+#                                                                                                 #
+#                                            CONSTANTS                                            #
+#                                                                                                 #
+###################################################################################################
+
+# Seconds between two checks of the data file
+DEFAULT_REFRESH_INTERVAL = 60
+
+###################################################################################################
+#                                                                                                 #
+#                                             CLASSES                                             #
+#                                                                                                 #
+###################################################################################################
+
+class Dataset:
+    """Version of the data served by the callbacks. It is never modified: a new
+    version is built when the data file changes and swapped in as a whole, so a
+    callback working with a version keeps it until it returns.
+
+    Args:
+        cube (DataCube): The cube of the data.
+        geo_cache (GeoCache): The map geometry of its countries.
+        fingerprint (dict): The fingerprint of the data file it was built from.
+        rollups (Rollups, optional): The projections of the cube drawn by the charts. Defaults to None (built).
+    """
+
+    def __init__(self, cube:DataCube, geo_cache:GeoCache, fingerprint:dict, rollups:Rollups=None):
+        self.cube = cube
+        self.rollups = rollups if rollups is not None else Rollups(cube)
+        self.geo_cache = geo_cache
+        self.fingerprint = fingerprint
+        self.version = fingerprint['sha256'][:16]
+        self.years = cube.levels['TIME_PERIOD']
+        self.bmi_values = cube.levels['bmi']
+
+
+class DatasetRefresher:
+    """Holder of the current Dataset, refreshed by a background thread that
+    polls the data file.
+
+    The size and modification time of the file are checked first and its content
+    is only hashed when they differ. When new lines were only appended to the file
+    (e.g. a new TIME_PERIOD) just those lines are parsed and added to the current
+    cube, otherwise the whole file is read again. In shared mode the new cube is
+    stored within the cache of the data file, so the other workers load it
+    instead of building it.
+
+    In background mode the first version is loaded by a thread of each process
+    instead of within the constructor, so that the process can serve requests
+    (e.g. readiness checks) meanwhile: current blocks until it is loaded. A
+    failed load raises its error from current and is tried again by the next
+    call to ensure_loading (e.g. the next request or poll).
+
+    Args:
+        data_file (str): The path to our data source file.
+        geojson (dict): The map geometry (see geo.load_geojson).
+        shared (bool, optional): Whether the cubes are shared between processes (see load_cube). Defaults to True.
+        interval (float, optional): Seconds between two checks, 0 disables them. Defaults to DEFAULT_REFRESH_INTERVAL.
+        on_swap (callable, optional): Function called with each new Dataset once swapped in. Defaults to None.
+        background (bool, optional): Whether the first version is loaded in the background. Defaults to False.
+        geo_caches (dict, optional): Map geometry by set of countries, shared with other refreshers. Defaults to None.
+    """
+
+    def __init__(self, data_file:str, geojson:dict, shared:bool=True, interval:float=DEFAULT_REFRESH_INTERVAL, on_swap=None,
+                 background:bool=False, geo_caches:dict=None):
+        self.data_file = data_file
+        self.geojson = geojson
+        self.shared = shared
+        self.interval = interval
+        self.on_swap = on_swap
+        self.background = background
+        self.swaps = 0
+        self.geo_caches = geo_caches if geo_caches is not None else {}
+
+        self._current = None
+        self._error = None
+        self._loaded = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._loader_pid = None
+        self._stopped = threading.Event()
+
+        if background:
+            self.ensure_loading()
+        else:
+            self._load()
+
+    @property
+    def current(self) -> Dataset:
+        """Dataset: The version of the data being served, waiting for the first one to be loaded."""
+        self._loaded.wait()
+        error = self._error
+        if error is not None:
+            # Tried again in the background, the error is raised until it is loaded
+            self.ensure_loading()
+            raise error
+        return self._current
+
+    @current.setter
+    def current(self, dataset:Dataset):
+        self._current = dataset
+
+    def ready(self) -> bool:
+        """This function returns whether the first version of the data is loaded.
+
+        Returns:
+            bool: Whether the data can be served.
+        """
+        return self._loaded.is_set() and self._error is None
+
+    def ensure_loading(self):
+        """This function starts loading the first version of the data in the
+        background if it is not loaded yet (or its last load failed) and no
+        thread of the current process is loading it (a thread of the gunicorn
+        master does not survive the fork)."""
+        if not self.background or self.ready() or self._loader_pid == os.getpid():
+            return
+        with self._lock:
+            if not self.ready() and self._loader_pid != os.getpid():
+                self._loader_pid = os.getpid()
+                threading.Thread(target=self._load, name='dataset-loader', daemon=True).start()
+
+    def _load(self):
+        try:
+            cube = load_cube(self.data_file, shared=self.shared)
+            meta = cache_meta(self.data_file) if self.shared else None
+            self.current = self._dataset(cube, meta['fingerprint'] if meta is not None else file_fingerprint(self.data_file))
+            self._error = None
+        except Exception as error:
+            # Raised again by current, in the constructor when not in background mode
+            self._error = error
+            # A transient failure (e.g. the file being replaced) must not stick until a restart
+            self._loader_pid = None
+            raise
+        finally:
+            self._loaded.set()
+
+    def _dataset(self, cube:DataCube, fingerprint:dict) -> Dataset:
+        locations = frozenset(cube.levels['alpha3'])
+        if locations not in self.geo_caches:
+            self.geo_caches[locations] = GeoCache(self.geojson, locations)
+        return Dataset(cube, self.geo_caches[locations], fingerprint)
+
+    def ensure_running(self):
+        """This function starts the polling thread of the current process (threads
+        do not survive the fork of the gunicorn workers) if it is not running yet,
+        as well as the background load of the data (see ensure_loading)."""
+        self.ensure_loading()
+        if self.interval <= 0 or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._poll, name='dataset-refresher', daemon=True).start()
+
+    def close(self):
+        """This function stops the polling thread of the current process, the
+        current version is still served to the callbacks holding it."""
+        self._stopped.set()
+
+    def _poll(self):
+        while not self._stopped.wait(self.interval):
+            if not self.ready():
+                # The first version is still being loaded or its load failed
+                self.ensure_loading()
+                continue
+            try:
+                self.refresh()
+            except (OSError, ValueError):
+                # The current version keeps being served until the file can be read
+                pass
+
+    def refresh(self) -> bool:
+        """This function swaps in a new Dataset if the data file changed.
+
+        Returns:
+            bool: Whether a new version was swapped in.
+        """
+        current = self.current
+        stat = os.stat(self.data_file)
+        if (stat.st_size, stat.st_mtime_ns) == (current.fingerprint['size'], current.fingerprint['mtime']):
+            return False
+
+        fingerprint = file_fingerprint(self.data_file)
+        if fingerprint['sha256'] == current.fingerprint['sha256']:
+            # Same content with a new modification time (e.g. copied or touched)
+            self.current = Dataset(current.cube, current.geo_cache, fingerprint, current.rollups)
+            return False
+
+        self.current = self._dataset(self._build(current, fingerprint), fingerprint)
+        self.swaps += 1
+        if self.on_swap is not None:
+            self.on_swap(self.current)
+        return True
+
+    def _build(self, current:Dataset, fingerprint:dict) -> DataCube:
+        if self.shared:
+            cube = cached_cube(self.data_file)
+            if cube is not None:
+                # Already built by another process
+                return cube
+
+        if appended_to(self.data_file, current.fingerprint):
+            cube = current.cube.extend(stream_data(self.data_file, start=current.fingerprint['size'], end=fingerprint['size']))
+        else:
+            cube = DataCube(read_data(self.data_file, cache=False))
+
+        if self.shared:
+            try:
+                cube = store_cube(cube, self.data_file, fingerprint)
+            except OSError:
+                # The cache is an optimization, the cube is still usable without it
+                pass
+        return cube
@@ -0,0 +1,256 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - Dataset registry                                       #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+import collections
+import threading
+
+from data import check_schema
+from refresh import DEFAULT_REFRESH_INTERVAL, Dataset, DatasetRefresher
+
+###################################################################################################
+#                                                                                                 #
+#                                            CONSTANTS                                            #
+#                                                                                                 #
+###################################################################################################
+
+# Default bound of the memory taken by the datasets loaded
+DEFAULT_MAX_BYTES = 512 * 2 ** 20
+
+###################################################################################################
+#                                                                                                 #
+#                                            FUNCTIONS                                            #
+#                                                                                                 #
+###################################################################################################
+
+def parse_sources(text:str) -> tuple:
+    """This function parses the datasets served by the app, given as
+    'name=path' entries separated by commas. An entry may end with the bound of
+    the memory its dataset may take, as 'name=path:max_bytes'.
+
+    Args:
+        text (str): The datasets (e.g. 'education=hlth_ehis_bm1e_linear.csv,income=hlth_ehis_bm1i_linear.csv:67108864').
+
+    Raises:
+        ValueError: Raised if an entry is not a 'name=path' pair or a name is repeated.
+
+    Returns:
+        tuple: The paths to the data files, by name, and the bounds of the datasets given one, by name.
+    """
+    sources = {}
+    budgets = {}
+    for entry in text.split(','):
+        name, separator, path = entry.strip().partition('=')
+        if not separator or not name.strip() or not path.strip():
+            raise ValueError("The dataset '{:s}' is not a 'name=path' pair!!".format(entry))
+        if name.strip() in sources:
+            raise ValueError("The dataset '{:s}' is given twice!!".format(name.strip()))
+        prefix, separator, budget = path.strip().rpartition(':')
+        if separator and prefix and budget.isdigit():
+            path = prefix
+            budgets[name.strip()] = int(budget)
+        sources[name.strip()] = path.strip()
+    return sources, budgets
+
+def dataset_bytes(dataset:Dataset) -> int:
+    """This function estimates the memory taken by a version of the data: its
+    cube and its projections (the levels and the map geometry are shared).
+
+    Args:
+        dataset (Dataset): The version of the data.
+
+    Returns:
+        int: The size of its arrays in bytes.
+    """
+    arrays = [dataset.cube.values, dataset.rollups.totals, *dataset.rollups.breakdowns.values()]
+    return sum(array.nbytes for array in arrays)
+
+###################################################################################################
+#                                                                                                 #
+#                                             CLASSES                                             #
+#                                                                                                 #
+###################################################################################################
+
+class DatasetRegistry:
+    """Datasets served by the app, by name (e.g. several BMI indicators or
+    releases of them), each one held by its own DatasetRefresher.
+
+    Each source has the schema of one of the BMI indicators of data.INDICATORS
+    (e.g. the education extract hlth_ehis_bm1e or the income one hlth_ehis_bm1i),
+    found from its columns: its own dimensions and translation dictionaries.
+    Each source is checked when registered (see data.check_schema), except the
+    ones that can not be read yet, which fail when loaded instead.
+
+    The default dataset is loaded at once (in the background in background
+    mode) and the other ones when first requested. Their cubes share the levels
+    of the dimensions they have in common (see cube.shared_levels) and their
+    map geometry. A dataset given a budget makes room for it before being
+    loaded, and is refused (and unloaded, but the default one) while it takes
+    more. Once the datasets loaded take
+    more than max_bytes, the least recently used ones (but the default one) are
+    evicted, to be loaded again when requested.
+
+    Args:
+        sources (dict): The paths to the data files, by name.
+        geojson (dict): The map geometry (see geo.load_geojson).
+        default (str, optional): Name of the dataset served when none is requested. Defaults to None (the first one).
+        max_bytes (int, optional): Bound of the memory taken by the datasets loaded. Defaults to DEFAULT_MAX_BYTES.
+        budgets (dict, optional): Bound of the memory taken by each dataset, by name. Defaults to None (no bounds).
+        shared (bool, optional): Whether the cubes are shared between processes (see load_cube). Defaults to True.
+        interval (float, optional): Seconds between two checks of each data file, 0 disables them. Defaults to DEFAULT_REFRESH_INTERVAL.
+        on_swap (callable, optional): Function called with each new Dataset once swapped in. Defaults to None.
+        background (bool, optional): Whether the default dataset is loaded in the background. Defaults to False.
+
+    Raises:
+        ValueError: Raised if no dataset is given, the default one or a budget is not registered or a data file is not shaped as a BMI indicator.
+    """
+
+    def __init__(self, sources:dict, geojson:dict, default:str=None, max_bytes:int=DEFAULT_MAX_BYTES, budgets:dict=None,
+                 shared:bool=True, interval:float=DEFAULT_REFRESH_INTERVAL, on_swap=None, background:bool=False):
+        if not sources:
+            raise ValueError("No dataset was given!!")
+        self.sources = dict(sources)
+        self.names = list(self.sources)
+        self.default = default if default is not None else self.names[0]
+        if self.default not in self.sources:
+            raise ValueError("The default dataset '{:s}' is not registered!!".format(self.default))
+        self.budgets = dict(budgets or {})
+        for name in self.budgets:
+            if name not in self.sources:
+                raise ValueError("The dataset '{:s}' given a budget is not registered!!".format(name))
+        self.schemas = {}
+        for name, path in self.sources.items():
+            try:
+                self.schemas[name] = check_schema(path)
+            except OSError:
+                # Not there yet (e.g. being written), its load fails and is tried again when requested
+                self.schemas[name] = None
+        self.geojson = geojson
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self.interval = interval
+        self.on_swap = on_swap
+        self.loads = 0
+        self.evictions = 0
+
+        self._geo_caches = {}
+        self._lock = threading.Lock()
+        self._refreshers = collections.OrderedDict()
+        self._refreshers[self.default] = self._refresher(self.default, background)
+
+    def _refresher(self, name:str, background:bool) -> DatasetRefresher:
+        self.loads += 1
+        return DatasetRefresher(self.sources[name], self.geojson, shared=self.shared, interval=self.interval,
+                                on_swap=self.on_swap, background=background, geo_caches=self._geo_caches)
+
+    def get(self, name:str=None) -> Dataset:
+        """This function returns the version being served of a dataset, loading
+        it (and evicting the coldest ones if needed) if it is not loaded yet.
+
+        Args:
+            name (str, optional): Name of the dataset. Defaults to None (the default one).
+
+        Raises:
+            ValueError: Raised if the dataset is not registered or takes more than its budget.
+
+        Returns:
+            Dataset: The version of the data being served.
+        """
+        name = self.default if name is None else name
+        if name not in self.sources:
+            raise ValueError("The dataset '{:s}' is not registered!!".format(name))
+
+        with self._lock:
+            cold = name not in self._refreshers
+        if cold and name in self.budgets:
+            # Room made for its budget before it is loaded
+            self._evict(name, self.budgets[name])
+
+        with self._lock:
+            refresher = self._refreshers.get(name)
+            loaded = refresher is None
+            if loaded:
+                # Loaded by a thread of its own, so that the other datasets are served meanwhile
+                refresher = self._refreshers[name] = self._refresher(name, True)
+            self._refreshers.move_to_end(name)
+
+        try:
+            dataset = refresher.current
+            if name in self.budgets and dataset_bytes(dataset) > self.budgets[name]:
+                raise ValueError("The dataset '{:s}' takes {:d} bytes, more than its budget of {:d}!!".format(
+                    name, dataset_bytes(dataset), self.budgets[name]))
+        except Exception:
+            # Loaded again by the next request (e.g. once the file is fixed)
+            with self._lock:
+                if name != self.default and self._refreshers.get(name) is refresher:
+                    self._refreshers.pop(name).close()
+            raise
+        if loaded:
+            self._evict(name)
+        return dataset
+
+    def _evict(self, keep:str, reserved:int=0):
+        with self._lock:
+            sizes = {name: dataset_bytes(refresher.current) for name, refresher in self._refreshers.items() if refresher.ready()}
+            total = sum(sizes.values()) + reserved
+            for name in list(self._refreshers):
+                if total <= self.max_bytes:
+                    break
+                if name in (self.default, keep) or name not in sizes:
+                    continue
+                # The callbacks still holding its version keep it until they return
+                self._refreshers.pop(name).close()
+                total -= sizes[name]
+                self.evictions += 1
+
+    def ready(self) -> bool:
+        """This function returns whether the default dataset is loaded.
+
+        Returns:
+            bool: Whether the data can be served.
+        """
+        return self._refreshers[self.default].ready()
+
+    def ensure_running(self):
+        """This function starts the polling threads of the datasets loaded by the
+        current process (see DatasetRefresher.ensure_running)."""
+        with self._lock:
+            refreshers = list(self._refreshers.values())
+        for refresher in refreshers:
+            refresher.ensure_running()
+
+    def stats(self) -> dict:
+        """This function returns the state of the registry.
+
+        Returns:
+            dict: The datasets loaded, their schema, version, size and budget, and the counters of the registry.
+        """
+        with self._lock:
+            refreshers = dict(self._refreshers)
+        datasets = {}
+        for name in self.names:
+            refresher = refreshers.get(name)
+            loaded = refresher is not None and refresher.ready()
+            schema = refresher.current.cube.schema if loaded else self.schemas[name]
+            datasets[name] = {
+                'loaded': loaded,
+                'schema': schema.name if schema is not None else None,
+                'version': refresher.current.version if loaded else None,
+                'bytes': dataset_bytes(refresher.current) if loaded else 0,
+                'max_bytes': self.budgets.get(name),
+            }
+        return {
+            'datasets': datasets,
+            'bytes': sum(dataset['bytes'] for dataset in datasets.values()),
+            'max_bytes': self.max_bytes,
+            'loads': self.loads,
+            'evictions': self.evictions,
+        }
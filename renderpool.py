@@ -0,0 +1,162 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - Render pool                                            #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+import concurrent.futures
+import contextvars
+import os
+import threading
+
+from metrics import PROFILER
+
+###################################################################################################
+#                                                                                                 #
+#                                            CONSTANTS                                            #
+#                                                                                                 #
+###################################################################################################
+
+# Default number of figures built at once by a process
+DEFAULT_THREADS = 2
+
+# Default number of requests served at once by a gunicorn worker (GUNICORN_THREADS)
+DEFAULT_REQUEST_THREADS = 8
+
+# Request threads of a worker left for the requests not building figures (layout, assets, /metrics...)
+FREE_REQUEST_THREADS = 2
+
+# Default seconds a callback waits for its figure
+DEFAULT_TIMEOUT = 10.0
+
+###################################################################################################
+#                                                                                                 #
+#                                            FUNCTIONS                                            #
+#                                                                                                 #
+###################################################################################################
+
+def default_queue(request_threads:int=DEFAULT_REQUEST_THREADS, threads:int=DEFAULT_THREADS) -> int:
+    """This function sizes the queue of a pool so that its figures, built and
+    waiting, stay below the request threads of the worker: otherwise the slots
+    never run out and the excess waits in the backlog of gunicorn instead of
+    being rejected.
+
+    Args:
+        request_threads (int, optional): Requests served at once by the worker. Defaults to DEFAULT_REQUEST_THREADS.
+        threads (int, optional): Figures built at once. Defaults to DEFAULT_THREADS.
+
+    Returns:
+        int: Figures waiting for a thread.
+    """
+    return max(request_threads - threads - FREE_REQUEST_THREADS, 0)
+
+# Default number of figures waiting for a thread before new ones are rejected
+DEFAULT_QUEUE = default_queue()
+
+###################################################################################################
+#                                                                                                 #
+#                                             CLASSES                                             #
+#                                                                                                 #
+###################################################################################################
+
+class OverloadedError(RuntimeError):
+    """Raised when a figure can not be built in time because there are too many
+    of them being built or waiting."""
+
+
+class RenderPool:
+    """Bounded pool of threads building the figures of the callbacks.
+
+    At most threads figures are built at once and at most queue more wait for a
+    thread; any other one is rejected at once (OverloadedError) instead of
+    piling up behind them, which keeps the latency of the accepted requests
+    bounded under bursts. The callback waiting for its figure gives up after
+    timeout seconds too.
+
+    Args:
+        threads (int, optional): Figures built at once, 0 builds them within the callback. Defaults to DEFAULT_THREADS.
+        queue (int, optional): Figures waiting for a thread. Defaults to DEFAULT_QUEUE.
+        timeout (float, optional): Seconds a callback waits for its figure. Defaults to DEFAULT_TIMEOUT.
+    """
+
+    def __init__(self, threads:int=DEFAULT_THREADS, queue:int=DEFAULT_QUEUE, timeout:float=DEFAULT_TIMEOUT):
+        self.threads = threads
+        self.queue = queue
+        self.timeout = timeout
+        self.rejected = 0
+        self.timeouts = 0
+        self._slots = threading.BoundedSemaphore(threads + queue)
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _pool(self) -> concurrent.futures.ThreadPoolExecutor:
+        # Threads do not survive the fork of the gunicorn workers, each one starts its own pool
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = concurrent.futures.ThreadPoolExecutor(self.threads, thread_name_prefix='render')
+                    self._slots = threading.BoundedSemaphore(self.threads + self.queue)
+                    self._pending = 0
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _release(self, future:concurrent.futures.Future):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def pending(self) -> int:
+        """This function returns the number of figures being built or waiting."""
+        return self._pending
+
+    def run(self, build):
+        """This function builds a figure within the pool.
+
+        Args:
+            build (callable): Function without arguments returning the figure.
+
+        Raises:
+            OverloadedError: Raised if the pool is full or the figure is not built in time
+
+        Returns:
+            dict: The figure.
+        """
+        if self.threads <= 0:
+            return build()
+
+        executor = self._pool()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise OverloadedError("There are too many figures being built!!")
+        with self._lock:
+            self._pending += 1
+
+        # The context carries the callback being run to the thread (see metrics.phase), which is
+        # profiled on its own since cProfile only sees the thread it runs in
+        future = executor.submit(contextvars.copy_context().run, PROFILER.run, build)
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            raise OverloadedError("The figure could not be built in time!!")
+
+    def stats(self) -> dict:
+        """This function returns the counters of the pool.
+
+        Returns:
+            dict: Rejected and timed out figures, and figures being built or waiting.
+        """
+        with self._lock:
+            return {'rejected': self.rejected, 'timeouts': self.timeouts, 'pending': self._pending}
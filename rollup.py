@@ -0,0 +1,138 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - Chart rollups                                          #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+import numpy as np
+
+from cube import TOTAL, DataCube
+
+###################################################################################################
+#                                                                                                 #
+#                                             CLASSES                                             #
+#                                                                                                 #
+###################################################################################################
+
+class Rollups:
+    """Projections of the cube drawn by the map and the charts, materialized
+    once per version of the data so that the callbacks only have to select the
+    countries dragged over the map.
+
+    Every projection keeps the other columns at 'Total' and has the countries
+    as its last axis, in the order of the cube:
+
+    - totals: by BMI level and year (map, trend and wind rose).
+    - breakdowns[column]: by BMI level, column level (but 'Total') and year (histograms), for
+      each column broken down by the schema of the data (see data.Schema).
+
+    Args:
+        cube (DataCube): Our data.
+    """
+
+    def __init__(self, cube:DataCube):
+        self.cube = cube
+        self.countries = cube.countries
+        self.totals = project(cube, ('bmi', 'TIME_PERIOD', 'alpha3'))
+        self.breakdowns = {column: project(cube, ('bmi', column, 'TIME_PERIOD', 'alpha3'), column) for column in cube.schema.breakdowns}
+
+    def _position(self, dimension:str, level) -> int:
+        return self.cube.positions[dimension].get(level)
+
+    def selection(self, sel_countries) -> np.ndarray:
+        """This function returns the positions of the selected countries (see DataCube.index)."""
+        return self.cube.index('alpha3', sel_countries)
+
+    def map_totals(self, bmi:str, year:int) -> tuple:
+        """This function returns the countries with a value for a BMI level and a year.
+
+        Args:
+            bmi (str): The BMI level.
+            year (int): The year.
+
+        Returns:
+            tuple: The alpha3 codes and their values.
+        """
+        bmi_position, year_position = self._position('bmi', bmi), self._position('TIME_PERIOD', year)
+        if bmi_position is None or year_position is None:
+            return self.cube.levels['alpha3'][:0], np.empty(0)
+        values = self.totals[bmi_position, year_position]
+        drawn = ~np.isnan(values)
+        return self.cube.levels['alpha3'][drawn], values[drawn]
+
+    def by_level(self, column:str, bmi:str, year:int, positions:np.ndarray) -> tuple:
+        """This function returns the values of the selected countries by level of a column.
+
+        Returns:
+            tuple: The values (level x country) and the levels.
+        """
+        levels = np.array(self.cube.breakdown(column), dtype=object)
+        bmi_position, year_position = self._position('bmi', bmi), self._position('TIME_PERIOD', year)
+        if bmi_position is None or year_position is None:
+            return np.empty((0, len(positions))), levels[:0]
+        return self.breakdowns[column][bmi_position, :, year_position][:, positions], levels
+
+    def trend(self, bmi:str, positions:np.ndarray) -> tuple:
+        """This function returns the values of the selected countries by year.
+
+        Returns:
+            tuple: The values (country x year) and the years.
+        """
+        years = self.cube.levels['TIME_PERIOD']
+        bmi_position = self._position('bmi', bmi)
+        if bmi_position is None:
+            return np.empty((0, len(years))), years
+        return self.totals[bmi_position][:, positions].T, years
+
+    def snapshot(self, year:int, positions:np.ndarray) -> tuple:
+        """This function returns the values of the selected countries by BMI level.
+
+        Returns:
+            tuple: The values (BMI level x country) and the BMI levels.
+        """
+        levels = self.cube.levels['bmi']
+        year_position = self._position('TIME_PERIOD', year)
+        if year_position is None:
+            return np.empty((0, len(positions))), levels[:0]
+        return self.totals[:, year_position][:, positions], levels
+
+###################################################################################################
+#                                                                                                 #
+#                                            FUNCTIONS                                            #
+#                                                                                                 #
+###################################################################################################
+
+def project(cube:DataCube, axes:tuple, breakdown:str=None) -> np.ndarray:
+    """This function materializes a projection of the cube, keeping the given
+    dimensions and the other ones at 'Total'.
+
+    Args:
+        cube (DataCube): Our data.
+        axes (tuple): The dimensions kept, in the order of the axes of the projection.
+        breakdown (str, optional): A kept dimension whose 'Total' level is dropped. Defaults to None.
+
+    Returns:
+        np.ndarray: A contiguous array, NaN where there is no observation.
+    """
+    dimensions = cube.dimensions
+    indexes = []
+    for dimension in dimensions:
+        if dimension == breakdown:
+            indexes.append(cube.index(dimension, cube.breakdown(dimension)))
+        else:
+            indexes.append(cube.index(dimension, None if dimension in axes else TOTAL))
+    shape = [len(indexes[dimensions.index(dimension)]) for dimension in axes]
+
+    if any(len(index) == 0 for dimension, index in zip(dimensions, indexes) if dimension not in axes):
+        # The data has no 'Total' level for some dimension
+        return np.full(shape, np.nan)
+
+    values = cube.values[np.ix_(*indexes)].reshape([len(index) for dimension, index in zip(dimensions, indexes) if dimension in axes])
+    kept = [dimension for dimension in dimensions if dimension in axes]
+    return np.ascontiguousarray(values.transpose([kept.index(dimension) for dimension in axes]))
@@ -0,0 +1,58 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - Performance tests                                      #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+"""Performance regression gate: runs benchmarks/bench_suite.py against its JSON
+baseline and fails when a case got slower or uses more memory than allowed. The
+first run stores the baseline. It takes minutes, so it only runs with
+PERF_TESTS=1 (e.g. in CI); PERF_SCALES sets the scales of the synthetic data,
+PERF_REPEAT the runs of each case, PERF_THRESHOLD the allowed increase and
+PERF_BASELINE the path to the baseline."""
+
+import os
+import pathlib
+import subprocess
+import sys
+
+import pytest
+
+###################################################################################################
+#                                                                                                 #
+#                                            CONSTANTS                                            #
+#                                                                                                 #
+###################################################################################################
+
+SUITE = pathlib.Path(__file__).resolve().parent.parent / 'benchmarks' / 'bench_suite.py'
+
+# Scales run by default: the cases of the smallest one (1) take a few milliseconds, too noisy to
+# gate on, and the largest one (100) takes most of the time of the suite
+DEFAULT_SCALES = '10'
+
+# Runs of each case, its best one is compared
+DEFAULT_REPEAT = '5'
+
+# Allowed increase over the baseline, looser than the one of the suite for shared CI machines
+DEFAULT_THRESHOLD = '0.5'
+
+###################################################################################################
+#                                                                                                 #
+#                                            FUNCTIONS                                            #
+#                                                                                                 #
+###################################################################################################
+
+@pytest.mark.skipif(os.environ.get('PERF_TESTS', '0') != '1', reason="PERF_TESTS=1 enables the performance tests")
+def test_no_regression():
+    command = [sys.executable, str(SUITE), '--scales', *os.environ.get('PERF_SCALES', DEFAULT_SCALES).split(),
+               '--repeat', os.environ.get('PERF_REPEAT', DEFAULT_REPEAT), '--threshold', os.environ.get('PERF_THRESHOLD', DEFAULT_THRESHOLD)]
+    if os.environ.get('PERF_BASELINE'):
+        command += ['--baseline', os.environ['PERF_BASELINE']]
+    result = subprocess.run(command, capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout + result.stderr
@@ -0,0 +1,115 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - Registry tests                                         #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+"""Checks that one registry serves datasets of several BMI indicators, each one
+with the dimensions and translations of its own schema, that the dimensions
+they have in common are shared and that the budget of each dataset bounds it."""
+
+import os
+import pathlib
+import sys
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent / 'benchmarks'))
+
+from data import INCOME_TRANSLATION, check_schema
+from figures import client_store, render_selected_data
+from registry import DatasetRegistry, dataset_bytes, parse_sources
+from synthetic import make_raw, write_csv
+
+###################################################################################################
+#                                                                                                 #
+#                                            CONSTANTS                                            #
+#                                                                                                 #
+###################################################################################################
+
+# Map geometry without any country, the tests do not draw the map
+GEOJSON = {'type': 'FeatureCollection', 'features': []}
+
+###################################################################################################
+#                                                                                                 #
+#                                            FUNCTIONS                                            #
+#                                                                                                 #
+###################################################################################################
+
+@pytest.fixture
+def sources(tmp_path):
+    return {
+        'education': write_csv(os.path.join(tmp_path, 'hlth_ehis_bm1e_linear.csv'), seed=1),
+        'income': write_csv(os.path.join(tmp_path, 'hlth_ehis_bm1i_linear.csv'), seed=2, indicator='hlth_ehis_bm1i'),
+    }
+
+def test_parse_sources():
+    sources, budgets = parse_sources('education=bm1e.csv, income=/data/bm1i.csv:1024')
+    assert sources == {'education': 'bm1e.csv', 'income': '/data/bm1i.csv'}
+    assert budgets == {'income': 1024}
+
+def test_parse_repeated_sources():
+    with pytest.raises(ValueError):
+        parse_sources('education=bm1e.csv,education=bm1i.csv')
+
+def test_schemas(sources):
+    registry = DatasetRegistry(sources, GEOJSON, shared=False, interval=0)
+    education, income = registry.get('education'), registry.get('income')
+
+    assert education.cube.schema.name == 'hlth_ehis_bm1e'
+    assert income.cube.schema.name == 'hlth_ehis_bm1i'
+    assert 'quant_inc' in income.cube.dimensions and 'isced11' not in income.cube.dimensions
+    assert set(income.cube.breakdown('quant_inc')) == set(INCOME_TRANSLATION.values()) - {'Total'}
+
+    # The dimensions found in both datasets share their levels
+    for dimension in ('bmi', 'sex', 'age', 'alpha3', 'TIME_PERIOD'):
+        assert income.cube.levels[dimension] is education.cube.levels[dimension]
+    assert income.cube.countries is education.cube.countries
+
+def test_income_charts(sources):
+    income = DatasetRegistry(sources, GEOJSON, default='income', shared=False, interval=0).get()
+    codes = set(income.cube.levels['alpha3'])
+    figure = render_selected_data(income.rollups, codes, 3, 2014, 'Normal')
+    assert {trace['name'] for trace in figure['data']} == set(income.cube.breakdown('quant_inc'))
+    assert 'by income' in figure['layout']['yaxis']['title']['text']
+
+    store = client_store(income.cube)
+    assert store['charts'][3] == 'quant_inc' and store['labels']['quant_inc'] == 'income'
+
+def test_unknown_schema(tmp_path):
+    path = os.path.join(tmp_path, 'unknown.csv')
+    make_raw().rename(columns={'isced11': 'unknown'}).to_csv(path, index=False)
+    with pytest.raises(ValueError):
+        check_schema(path)
+
+def test_budget(sources):
+    probe = DatasetRegistry(sources, GEOJSON, shared=False, interval=0)
+    size = dataset_bytes(probe.get('income'))
+
+    registry = DatasetRegistry(sources, GEOJSON, budgets={'income': size - 1}, shared=False, interval=0)
+    with pytest.raises(ValueError):
+        registry.get('income')
+    assert not registry.stats()['datasets']['income']['loaded']
+
+    registry = DatasetRegistry(sources, GEOJSON, budgets={'income': size}, shared=False, interval=0)
+    assert registry.get('income').cube.schema.name == 'hlth_ehis_bm1i'
+    assert registry.stats()['datasets']['income']['max_bytes'] == size
+
+def test_budget_evicts_cold_datasets(sources, tmp_path):
+    sources = dict(sources, other=write_csv(os.path.join(tmp_path, 'other.csv'), seed=3))
+    probe = DatasetRegistry(sources, GEOJSON, shared=False, interval=0)
+    size = dataset_bytes(probe.get())
+
+    # Room for the default dataset and one more: the budget of 'other' evicts 'income' before it is loaded
+    registry = DatasetRegistry(sources, GEOJSON, max_bytes=2 * size, budgets={'other': size}, shared=False, interval=0)
+    registry.get('income')
+    registry.get('other')
+    loaded = {name for name, dataset in registry.stats()['datasets'].items() if dataset['loaded']}
+    assert loaded == {'education', 'other'}
@@ -0,0 +1,135 @@
+###################################################################################################
+#                                                                                                 #
+# Visualización de datos                                                                          #
+# A9: Creación de la visualización y entrega del proyecto (Práctica II)                           #
+#                                                                                                 #
+# Titulo: Fit or Fat? (Europe's Edition) - Rollup tests                                           #
+# Autor: Rubén Moya Vázquez <rmoyav@uoc.edu>                                                      #
+# Fecha: 13/06/2021                                                                               #
+# Versión: 1.0.0                                                                                  #
+#                                                                                                 #
+###################################################################################################
+
+"""Checks that the map and the charts built from the rollups draw the same data
+as the boolean-mask filters of the original callbacks over full_data, for every
+chart, including unknown locations and missing years or BMI levels."""
+
+import pathlib
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent / 'benchmarks'))
+
+from cube import DataCube
+from figures import UNKNOWN_CHART, render_map, render_selected_data
+from geo import GeoCache
+from rollup import Rollups
+from synthetic import CHARTS, make_formatted
+
+###################################################################################################
+#                                                                                                 #
+#                                            CONSTANTS                                            #
+#                                                                                                 #
+###################################################################################################
+
+# Country of the synthetic data without any value for GAP_YEAR
+GAP_COUNTRY = 'C0001'
+GAP_YEAR = 2015
+
+# BMI level of the synthetic data without any value for GAP_YEAR
+GAP_BMI = 'Obese'
+
+# Country of the synthetic data without any value by sex
+NO_SEX_COUNTRY = 'C0002'
+
+SELECTIONS = {
+    'some': ['C0000', GAP_COUNTRY, NO_SEX_COUNTRY, 'C0004', 'XXX'],
+    'all': ['C{:04d}'.format(country) for country in range(6)],
+    'unknown': ['XXX', 'ESP'],
+}
+
+YEARS = [2014, GAP_YEAR, 1999]
+
+BMIS = ['Normal', GAP_BMI, 'Unknown']
+
+###################################################################################################
+#                                                                                                 #
+#                                            FUNCTIONS                                            #
+#                                                                                                 #
+###################################################################################################
+
+@pytest.fixture(scope='module')
+def full_data():
+    data = make_formatted(countries=6, years=3, seed=1)
+    gaps = (((data.alpha3 == GAP_COUNTRY) & (data.TIME_PERIOD == GAP_YEAR))
+            | ((data.bmi == GAP_BMI) & (data.TIME_PERIOD == GAP_YEAR))
+            | ((data.alpha3 == NO_SEX_COUNTRY) & (data.sex != 'Total')))
+    return data[~gaps].reset_index(drop=True)
+
+@pytest.fixture(scope='module')
+def rollups(full_data):
+    return Rollups(DataCube(full_data))
+
+def filter_map(full_data, bmi, year) -> dict:
+    """Values of the map, as filtered by the original display_map."""
+    totals = full_data[(full_data.age == 'Total') & (full_data.sex == 'Total') & (full_data.isced11 == 'Total') & (full_data.bmi == bmi) & (full_data.TIME_PERIOD == year)]
+    return dict(zip(totals.alpha3.astype(str), totals.OBS_VALUE))
+
+def filter_chart(full_data, sel_countries, chart_dropdown, year, bmi) -> tuple:
+    """Points of each trace and number of countries of a chart, as filtered by
+    the original display_selected_data."""
+    filtered = full_data[(full_data.bmi == bmi) & full_data.alpha3.isin(sel_countries)]
+    if chart_dropdown == 1:
+        filtered = filtered[(filtered.TIME_PERIOD == year) & (filtered.isced11 == 'Total') & (filtered.age == 'Total') & (filtered.sex != 'Total')]
+        color, x, y = 'sex', 'OBS_VALUE', 'country'
+    elif chart_dropdown == 2:
+        filtered = filtered[(filtered.TIME_PERIOD == year) & (filtered.sex == 'Total') & (filtered.isced11 == 'Total') & (filtered.age != 'Total')]
+        color, x, y = 'age', 'OBS_VALUE', 'country'
+    elif chart_dropdown == 3:
+        filtered = filtered[(filtered.TIME_PERIOD == year) & (filtered.sex == 'Total') & (filtered.age == 'Total') & (filtered.isced11 != 'Total')]
+        color, x, y = 'isced11', 'OBS_VALUE', 'country'
+    elif chart_dropdown == 4:
+        filtered = filtered[(filtered.age == 'Total') & (filtered.sex == 'Total') & (filtered.isced11 == 'Total')]
+        color, x, y = 'country', 'TIME_PERIOD', 'OBS_VALUE'
+    else:
+        filtered = full_data[(full_data.TIME_PERIOD == year) & (full_data.sex == 'Total') & (full_data.age == 'Total') & (full_data.isced11 == 'Total')]
+        filtered = filtered[filtered.alpha3.isin(sel_countries)]
+        color, x, y = 'bmi', 'OBS_VALUE', 'country'
+
+    traces = {
+        str(name): sorted(zip(group[x].astype(object), group[y].astype(object)))
+        for name, group in filtered.groupby(color, observed=True)
+    }
+    return traces, len(filtered.country.unique())
+
+def drawn_chart(figure:dict) -> tuple:
+    """Points of each trace and number of countries of a chart built by render_selected_data."""
+    traces = {}
+    for trace in figure['data']:
+        x, y = ('r', 'theta') if 'r' in trace else ('x', 'y')
+        traces[str(trace['name'])] = sorted(zip(np.asarray(trace[x]).tolist(), np.asarray(trace[y]).tolist()))
+    title = figure['layout']['title']['text']
+    return traces, int(title[len('<b>'):title.index('</b>')])
+
+@pytest.mark.parametrize('bmi', BMIS)
+@pytest.mark.parametrize('year', YEARS)
+def test_map(full_data, rollups, bmi, year):
+    figure = render_map(rollups, GeoCache({'type': 'FeatureCollection', 'features': []}, []), bmi, year)
+    trace = figure['data'][0]
+    drawn = dict(zip(np.asarray(trace['locations']).tolist(), np.asarray(trace['z']).tolist()))
+    assert drawn == filter_map(full_data, bmi, year)
+
+@pytest.mark.parametrize('selection', list(SELECTIONS))
+@pytest.mark.parametrize('bmi', BMIS)
+@pytest.mark.parametrize('year', YEARS)
+@pytest.mark.parametrize('chart_dropdown', list(CHARTS))
+def test_selected_data(full_data, rollups, chart_dropdown, year, bmi, selection):
+    sel_countries = SELECTIONS[selection]
+    figure = render_selected_data(rollups, set(sel_countries), chart_dropdown, year, bmi)
+    assert drawn_chart(figure) == filter_chart(full_data, sel_countries, chart_dropdown, year, bmi)
+
+def test_unknown_chart(rollups):
+    assert render_selected_data(rollups, set(SELECTIONS['all']), 0, 2014, 'Normal') is UNKNOWN_CHART